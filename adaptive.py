@@ -0,0 +1,114 @@
+# adaptive.py
+#
+# Adaptive word selection: pick words heavy in the letters and lengths a
+# player tends to lose on. The player's side is the loss-count vector that
+# log_game keeps in user_features; the word side is a letter / length matrix
+# built once per word bank, so a pick is one small matrix-vector product.
+# Picks also lean towards globally easy or hard words by the game's difficulty
+# setting, from the word_stats loss rates (analytics.word_difficulty).
+
+import random
+import threading
+import time
+
+import numpy as np
+
+import analytics
+import storage
+
+# How sharply selection favours weak spots: weights are exp(score / TEMPERATURE),
+# where a score is a loss-rate excess (0.1 = 10 points above the player's average).
+TEMPERATURE = 0.05
+# Weight of a word's smoothed global loss rate, minus the bank's mean, in its
+# score per difficulty setting: Easy leans to words most players win.
+DIFFICULTY_BIAS = {"Easy": -0.5, "Medium": 0.0, "Hard": 0.5}
+DIFFICULTY_TTL_SEC = 60.0  # how long a bank's loss rates are reused before re-reading word_stats
+
+
+class WordMatrix:
+    """Precomputed features of a word bank: distinct-letter rows and length slots."""
+
+    def __init__(self, words: tuple):
+        self.words = words
+        self.index = {w: i for i, w in enumerate(words)}
+        letters = np.zeros((len(words), len(storage.LETTERS)), dtype=np.float32)
+        for i, word in enumerate(words):
+            for c in set(word):
+                if c in storage.LETTERS:
+                    letters[i, storage.LETTERS.index(c)] = 1
+        # Rows average over the word's letters, so long words are not favoured.
+        self.letters = letters / np.maximum(letters.sum(axis=1, keepdims=True), 1)
+        self.lengths = np.minimum([len(w) for w in words], storage.MAX_WORD_LENGTH).astype(np.intp)
+        self._difficulty = None  # (read at, centred loss rates), see difficulty()
+
+    def difficulty(self) -> np.ndarray:
+        """
+        Each word's smoothed global loss rate minus the bank's mean, re-read
+        from word_stats at most every DIFFICULTY_TTL_SEC rather than per pick.
+        """
+        cached = self._difficulty
+        if cached is None or time.monotonic() - cached[0] > DIFFICULTY_TTL_SEC:
+            rates = analytics.word_difficulty(list(self.words)).to_numpy(dtype=np.float32)
+            cached = self._difficulty = (time.monotonic(), rates - rates.mean() if len(rates) else rates)
+        return cached[1]
+
+
+_matrices: dict = {}  # key -> WordMatrix, see word_matrix()
+_lock = threading.Lock()
+
+
+def word_matrix(key, words) -> WordMatrix:
+    """
+    The WordMatrix of a fixed word list (a built-in category), built on the
+    first call for `key`. `words` is a callable returning the list, so later
+    calls cost a dict lookup rather than a pass over the bank.
+    """
+    matrix = _matrices.get(key)
+    if matrix is None:
+        with _lock:
+            matrix = _matrices.get(key)
+            if matrix is None:
+                matrix = _matrices[key] = WordMatrix(tuple(words()))
+    return matrix
+
+
+def weaknesses(features: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-letter and per-length loss rate minus the player's overall loss rate,
+    smoothed with one pseudo-win and one pseudo-loss so unseen letters score 0.
+    """
+    f = features.astype(np.float64)
+    s = storage.USER_FEATURE_SLICES
+    plays = f[s["length_plays"]].sum()
+    overall = f[s["length_losses"]].sum() / plays if plays else 0.5
+    letters = (f[s["letter_losses"]] + overall) / (f[s["letter_plays"]] + 1) - overall
+    lengths = (f[s["length_losses"]] + overall) / (f[s["length_plays"]] + 1) - overall
+    return letters, lengths
+
+
+def pick_word(features: np.ndarray, matrix: WordMatrix, exclude=(), rng=random, difficulty: str = "Medium") -> str:
+    """
+    Draw a word of `matrix` with probability rising with how much the
+    player loses on its letters and length, shifted towards globally easier
+    or harder words by DIFFICULTY_BIAS[difficulty]. Words in `exclude` are
+    skipped unless nothing else is left.
+    """
+    letters, lengths = weaknesses(features)
+    # float32 throughout: the matrix product is memory-bound on large banks.
+    scores = matrix.letters @ letters.astype(np.float32)
+    scores += lengths.astype(np.float32)[matrix.lengths]
+    bias = DIFFICULTY_BIAS.get(difficulty, 0.0)
+    if bias:
+        scores += np.float32(bias) * matrix.difficulty()
+    weights = np.exp((scores - scores.max()) / TEMPERATURE)
+    excluded = set()
+    for word in exclude:
+        i = matrix.index.get(word)
+        if i is not None and len(matrix.words) > len(excluded) + 1:
+            weights[i] = 0
+            excluded.add(i)
+    cumulative = np.cumsum(weights)
+    if cumulative[-1] <= 0:
+        # Every weight left underflowed: draw uniformly among the words not excluded.
+        return matrix.words[rng.choice([i for i in range(len(matrix.words)) if i not in excluded])]
+    return matrix.words[int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right"))]
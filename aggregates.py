@@ -0,0 +1,190 @@
+# aggregates.py
+#
+# Aggregations behind the Analytics and Leaderboard pages. PandasBackend loads
+# games into DataFrames (the original path); DuckDBBackend runs the same
+# aggregations as vectorized SQL directly over hangman_scores.db. get_backend()
+# picks one from HANGMAN_ANALYTICS_BACKEND ("auto", "duckdb" or "pandas").
+
+import os
+import threading
+
+import pandas as pd
+
+import storage
+from analytics import load_games_df
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+BACKEND = os.environ.get("HANGMAN_ANALYTICS_BACKEND", "auto")
+
+LEADERBOARD_COLUMNS = ["id", "username", "won", "wrong_guesses", "attempts_used", "duration_sec"]
+
+
+def recommend_difficulty(games: int, win_rate: float):
+    """Suggested difficulty for a player with `games` played at `win_rate` %."""
+    if games < 10:
+        return None
+    if win_rate >= 70:
+        return "Hard"
+    elif win_rate >= 40:
+        return "Medium"
+    else:
+        return "Easy"
+
+
+class PandasBackend:
+    """Aggregations over DataFrames from load_games_df (memoized per instance)."""
+
+    name = "pandas"
+
+    def __init__(self):
+        self._frames = {}
+
+    def games(self, username=None, columns=None) -> pd.DataFrame:
+        key = (username, tuple(columns) if columns else None)
+        if key not in self._frames:
+            self._frames[key] = load_games_df(username=username, columns=columns)
+        return self._frames[key]
+
+    def leaderboard(self) -> pd.DataFrame:
+        """
+        Per-player games, wins, perfects, averages and win rate, indexed by
+        username. Lifetime totals from the player_stats rollup, so games in
+        the cold tier still count.
+        """
+        rows = storage.fetch_player_totals()
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows, columns=storage.PLAYER_TOTALS_COLUMNS).set_index("username")
+
+    def category_stats(self, username) -> pd.DataFrame:
+        df = self.games(username)
+        if df.empty or "category" not in df.columns:
+            return pd.DataFrame(columns=["category", "win_rate", "wrong", "duration"])
+        out = df.groupby("category", observed=True).agg(
+            win_rate=("won", "mean"),
+            wrong=("wrong_guesses", "mean"),
+            duration=("duration_sec", "mean"),
+        )
+        out["win_rate"] = out["win_rate"] * 100
+        return out.reset_index()
+
+    def length_win_rate(self, username) -> pd.DataFrame:
+        length_perf = self.games(username).groupby("word_length").won.mean().reset_index()
+        length_perf["Win Rate"] = length_perf["won"] * 100
+        return length_perf
+
+    def difficulty_recommendation(self, username):
+        df = self.games(username)
+        if df.empty:
+            return None
+        return recommend_difficulty(len(df), df["won"].mean() * 100)
+
+
+class DuckDBBackend(PandasBackend):
+    """Same aggregations as SQL in an embedded DuckDB with the SQLite file attached."""
+
+    name = "duckdb"
+
+    def __init__(self, conn):
+        super().__init__()
+        self._conn = conn
+
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        # A cursor per call: DuckDB connections must not be shared across threads.
+        with self._conn.cursor() as cur:
+            return cur.execute(sql, params).df()
+
+    def leaderboard(self) -> pd.DataFrame:
+        out = self._query(
+            """
+            SELECT
+                p.name AS username,
+                s.games,
+                s.wins,
+                s.perfects,
+                s.attempts_sum / NULLIF(s.attempts_games, 0) AS avg_attempts,
+                s.duration_sum / NULLIF(s.duration_games, 0) AS avg_duration,
+                s.wins * 100.0 / s.games AS win_rate
+            FROM h.player_stats s
+            JOIN h.players p ON p.id = s.player_id
+            ORDER BY p.name
+            """
+        )
+        return out.set_index("username") if not out.empty else pd.DataFrame()
+
+    def category_stats(self, username) -> pd.DataFrame:
+        return self._query(
+            """
+            SELECT
+                c.name AS category,
+                AVG(g.won) * 100 AS win_rate,
+                AVG(g.wrong_guesses) AS wrong,
+                AVG(g.duration_sec) AS duration
+            FROM h.games g
+            JOIN h.categories c ON c.id = g.category_id
+            WHERE g.player_id = (SELECT id FROM h.players WHERE name = ?)
+            GROUP BY c.name
+            ORDER BY c.name
+            """,
+            (username,),
+        )
+
+    def length_win_rate(self, username) -> pd.DataFrame:
+        return self._query(
+            """
+            SELECT
+                COALESCE(w.length, 0) AS word_length,
+                AVG(g.won) AS won,
+                AVG(g.won) * 100 AS "Win Rate"
+            FROM h.games g
+            LEFT JOIN h.words w ON w.id = g.word_id
+            WHERE g.player_id = (SELECT id FROM h.players WHERE name = ?)
+            GROUP BY 1
+            ORDER BY 1
+            """,
+            (username,),
+        )
+
+    def difficulty_recommendation(self, username):
+        with self._conn.cursor() as cur:
+            games, win_rate = cur.execute(
+                """
+                SELECT COUNT(*), AVG(g.won) * 100 FROM h.games g
+                WHERE g.player_id = (SELECT id FROM h.players WHERE name = ?)
+                """,
+                (username,),
+            ).fetchone()
+        return recommend_difficulty(games, win_rate or 0)
+
+
+# One DuckDB instance per process; `unavailable_reason` explains a fallback.
+_lock = threading.Lock()
+_duckdb_conn = None
+unavailable_reason = None if duckdb is not None else "duckdb is not installed"
+
+
+def _connect_duckdb():
+    global _duckdb_conn, unavailable_reason
+    with _lock:
+        if _duckdb_conn is None and unavailable_reason is None:
+            try:
+                conn = duckdb.connect()
+                path = str(storage.DB_PATH).replace("'", "''")
+                conn.execute(f"ATTACH '{path}' AS h (TYPE sqlite, READ_ONLY)")
+                _duckdb_conn = conn
+            except Exception as exc:  # e.g. the sqlite extension cannot be installed
+                unavailable_reason = f"cannot attach the SQLite file: {exc}".splitlines()[0]
+        return _duckdb_conn
+
+
+def get_backend() -> PandasBackend:
+    """A fresh backend for this rerun (DuckDB when configured and usable)."""
+    if BACKEND in ("auto", "duckdb"):
+        conn = _connect_duckdb()
+        if conn is not None:
+            return DuckDBBackend(conn)
+    return PandasBackend()
@@ -0,0 +1,245 @@
+# analytics.py
+
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import archive
+import storage
+
+# Upper bound on points sent to the browser for a single line chart.
+CHART_POINT_BUDGET = int(os.environ.get("HANGMAN_CHART_POINTS", "500"))
+
+
+def _decode(ids: pd.Series, dictionary) -> tuple[np.ndarray, list]:
+    """
+    Map lookup-table ids to positional codes for pd.Categorical.from_codes.
+
+    Missing ids (NULL) become -1, i.e. NaN in the categorical.
+    """
+    dict_ids = np.array([entry[0] for entry in dictionary], dtype=np.int64)
+    values = [entry[1] for entry in dictionary]
+    lookup = np.full((dict_ids.max() + 1) if len(dict_ids) else 1, -1, dtype=np.int64)
+    lookup[dict_ids] = np.arange(len(dict_ids))
+    raw = ids.fillna(0).to_numpy(dtype=np.int64)
+    return lookup[raw], values
+
+
+def _compact(series: pd.Series, dtype: str) -> pd.Series:
+    """Cast to a small numpy dtype, or its nullable pandas twin if NULLs are present."""
+    if series.isna().any():
+        return series.astype(dtype.capitalize() if dtype.startswith("int") else dtype)
+    return series.astype(dtype)
+
+
+def _from_sqlite(username=None, start_ms=None, end_ms=None, after_id=None, include_cold=False) -> pd.DataFrame:
+    rows, dictionaries = storage.fetch_games_encoded(
+        username, start_ms, end_ms, after_id=after_id, include_cold=include_cold
+    )
+    if not rows:
+        return pd.DataFrame()
+    raw = pd.DataFrame.from_records(rows, columns=storage.ENCODED_COLUMNS)
+
+    player_codes, players = _decode(raw["player_id"], dictionaries["players"])
+    word_codes, words = _decode(raw["word_id"], dictionaries["words"])
+    category_codes, categories = _decode(raw["category_id"], dictionaries["categories"])
+    lengths = np.array([entry[2] for entry in dictionaries["words"]] + [0], dtype=np.int64)
+
+    return pd.DataFrame(
+        {
+            "id": raw["id"].astype("int64"),
+            "username": pd.Categorical.from_codes(player_codes, categories=players),
+            "word": pd.Categorical.from_codes(word_codes, categories=words),
+            # -1 (no word) indexes the trailing 0.
+            "word_length": lengths[word_codes].astype("int16"),
+            "category": pd.Categorical.from_codes(category_codes, categories=categories),
+            "won": raw["won"].astype("int8"),
+            "attempts_used": _compact(raw["attempts_used"], "int16"),
+            "wrong_guesses": _compact(raw["wrong_guesses"], "int8"),
+            "max_lives": _compact(raw["max_lives"], "int8"),
+            "remaining_lives": _compact(raw["remaining_lives"], "int8"),
+            "duration_sec": raw["duration_sec"].astype("float32"),
+            "timestamp": pd.to_datetime(raw["timestamp"], unit="ms"),
+        }
+    )
+
+
+# Dtypes of the numeric columns produced by _from_sqlite.
+NUMERIC_DTYPES = {
+    "id": "int64",
+    "word_length": "int16",
+    "won": "int8",
+    "attempts_used": "int16",
+    "wrong_guesses": "int8",
+    "max_lives": "int8",
+    "remaining_lives": "int8",
+    "duration_sec": "float32",
+}
+
+
+def _from_archive(username=None, start_ms=None, end_ms=None, columns=None, include_cold=False) -> pd.DataFrame:
+    """Parquet archive plus the SQLite games not compacted yet (both tiers with `include_cold`)."""
+    cold = archive.read_games(username=username, start_ms=start_ms, end_ms=end_ms, columns=columns)
+    hot = _from_sqlite(username, start_ms, end_ms, after_id=archive.watermark(), include_cold=include_cold)
+    if not hot.empty:
+        cold = pd.concat([cold, hot[list(cold.columns)]], ignore_index=True)
+    if cold.empty:
+        return pd.DataFrame()
+
+    for col in cold.columns:
+        if col in NUMERIC_DTYPES:
+            cold[col] = _compact(cold[col], NUMERIC_DTYPES[col])
+        elif col in ("username", "word", "category") and not isinstance(cold[col].dtype, pd.CategoricalDtype):
+            cold[col] = cold[col].astype("category")
+    if "timestamp" in cold.columns:
+        cold = cold.sort_values("timestamp", kind="stable", ignore_index=True)
+    return cold
+
+
+def _from_federation(username=None, start_ms=None, end_ms=None) -> pd.DataFrame:
+    """Hot games of every node (storage.fetch_games_federated), with `uuid` and `node` columns."""
+    rows = storage.fetch_games_federated(username, start_ms, end_ms)
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame.from_records(rows, columns=storage.FEDERATED_COLUMNS)
+    for col in ("username", "word", "category", "node"):
+        df[col] = df[col].astype("category")
+    for col, dtype in NUMERIC_DTYPES.items():
+        df[col] = _compact(df[col], dtype)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    df["uuid"] = [str(uuid.UUID(bytes=g)) if g else None for g in df["uuid"].tolist()]
+    return df
+
+
+def load_games_df(username=None, start_ms=None, end_ms=None, columns=None, include_cold=False,
+                  federated=False) -> pd.DataFrame:
+    """
+    Games as a DataFrame, oldest first.
+
+    `username`, `word` and `category` are pandas categoricals built straight
+    from the stored integer codes, so no per-row Python strings are created.
+    Numeric columns use the smallest dtype that fits (int8 `won`, lives and
+    wrong guesses, int16 attempts and word length, float32 duration).
+
+    When a Parquet archive exists, scans across players read compacted games
+    from it with `columns` and the date filters pushed down, and only the
+    newer games come from SQLite. Single-player reads stay on SQLite, whose
+    (player, timestamp) index beats scanning every date partition. `columns`
+    may be ignored (all columns returned).
+
+    SQLite reads cover hot games only unless `include_cold` (see
+    storage.move_cold_games). The Parquet archive holds both tiers, so it is
+    only used when that is the set asked for: with `include_cold`, or while
+    there is no cold tier. Its tail past the watermark is then read from
+    both tiers too, so games moved cold since the last compaction count.
+
+    `federated` reads the hot games of this node and every configured shard
+    instead (HANGMAN_SHARDS), adding each game's `uuid` and `node`;
+    ids are only unique within a node.
+    """
+    if federated:
+        return _from_federation(username, start_ms, end_ms)
+    if username is None and archive.available() and (include_cold or not storage.cold_db_path().exists()):
+        return _from_archive(username, start_ms, end_ms, columns, include_cold=include_cold)
+    return _from_sqlite(username, start_ms, end_ms, include_cold=include_cold)
+
+
+def letter_heatmap(user_df: pd.DataFrame, progress=None) -> pd.DataFrame:
+    """
+    Letter frequency table:
+    how often each letter appears in words from games you won vs lost.
+
+    Games are first counted per (word, outcome), so the Python loop runs once
+    per distinct word rather than once per game. `progress(fraction)` is
+    called along the way when given.
+    """
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    stats = np.zeros((len(letters), 2), dtype=np.int64)
+    if user_df.empty:
+        return pd.DataFrame(stats, index=list(letters), columns=["won", "lost"])
+
+    counts = user_df.groupby(["word", "won"], observed=True).size()
+    total = max(1, len(counts))
+    for i, ((word, won), n) in enumerate(counts.items()):
+        col = 0 if won == 1 else 1
+        for letter in {c for c in str(word).lower() if c in letters}:
+            stats[letters.index(letter), col] += n
+        if progress and i % 1000 == 0:
+            progress(i / total)
+
+    return pd.DataFrame(stats, index=list(letters), columns=["won", "lost"])
+
+
+def word_difficulty(words: list[str], prior_plays: int = 5) -> pd.Series:
+    """
+    Smoothed loss rate (0-1) per word, for weighting word selection.
+
+    Each word's record is blended with `prior_plays` pseudo-games at the
+    average loss rate of the given words, so unplayed or rarely played words
+    sit near the average instead of at 0 or 1. Reads word_stats only.
+    """
+    stats = storage.fetch_word_stats(words)
+    plays = pd.Series({w: stats[w][0] if w in stats else 0 for w in words}, dtype="float64")
+    losses = pd.Series({w: stats[w][0] - stats[w][1] if w in stats else 0 for w in words}, dtype="float64")
+    prior = losses.sum() / plays.sum() if plays.sum() else 0.5
+    return (losses + prior * prior_plays) / (plays + prior_plays)
+
+
+def hourly_win_rate(username: str) -> pd.DataFrame:
+    """Win rate by UTC hour of day, read from the hourly rollup."""
+    tod = pd.DataFrame(storage.fetch_hourly_rollup(username), columns=["hour", "games", "wins"])
+    tod["Win Rate"] = tod["wins"] / tod["games"] * 100
+    return tod
+
+
+def win_rate_timeline(username: str) -> pd.DataFrame:
+    """
+    Cumulative win rate at the end of each day the player played, read from
+    the daily rollup; `game_number` is the number of games played so far.
+    """
+    daily = pd.DataFrame(storage.fetch_daily_rollup(username), columns=["day", "games", "wins"])
+    game_number = daily["games"].cumsum()
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(daily["day"] * storage.MS_PER_DAY, unit="ms"),
+            "game_number": game_number,
+            "cumulative_win_rate": daily["wins"].cumsum() / game_number * 100,
+        }
+    )
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep
+    the visual shape of the (x, y) line. Always keeps the first and last point.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges for the n - 2 interior points.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex.
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int = CHART_POINT_BUDGET) -> pd.DataFrame:
+    """Rows of `df` chosen by LTTB on (x, y), at most `max_points` of them."""
+    if len(df) <= max_points:
+        return df
+    return df.iloc[lttb_indices(df[x].to_numpy(), df[y].to_numpy(), max_points)]
@@ -9,8 +9,10 @@ This file is a modified version of your app. Changes:
 
 from pathlib import Path
 import random
+import sqlite3
 import time
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 from collections import Counter
 
 import streamlit as st
@@ -19,6 +21,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 import storage
+import adaptive
+import aggregates
+import approx
+import jobs
+import analytics
+from analytics import load_games_df
+import metrics
+import events
+import profiler
+import sessions
+import transfer
+import wordbank
+import wordmeta
 
 # --------------------------
 # ASCII Art from hangman_art.py 
@@ -131,7 +146,24 @@ WORD_HINTS = {
 # App configuration
 # --------------------------
 st.set_page_config(page_title="Hangman Analytics Arcade", page_icon="🎯", layout="wide")
+
+# A rerun that ended early through st.rerun() never reached the stop below.
+_stale_profile = st.session_state.pop("_active_profile", None)
+if _stale_profile is not None:
+    _stale_profile.stop()
+# ?profile=N budgets belong to the session that armed them.
+_profile_owner = st.session_state.setdefault("_profile_owner", uuid.uuid4().hex)
+_profile_request = st.query_params.get("profile")
+if _profile_request and _profile_request != st.session_state.get("_profile_armed"):
+    st.session_state._profile_armed = _profile_request
+    profiler.arm(int(_profile_request) if _profile_request.isdigit() else 1,
+                 memory=st.query_params.get("profile_memory") == "1", owner=_profile_owner)
+st.session_state._active_profile = profiler.maybe_start(_profile_owner)
+
+rerun_timer = metrics.RerunTimer()
 storage.init_db()
+DEBUG_METRICS = metrics.DEBUG_ENV or st.query_params.get("debug") == "metrics"
+rerun_timer.lap("init")
 
 # --------------------------
 # SVG Icons
@@ -358,6 +390,7 @@ table th {
 """
 
 st.markdown(APP_CSS, unsafe_allow_html=True)
+rerun_timer.lap("css")
 
 # --------------------------
 # Difficulty configuration
@@ -374,7 +407,7 @@ DIFFICULTY_CONFIG = {
 def _has_win_streak(games, streak_len=3) -> bool:
     if not games:
         return False
-    sorted_games = sorted(games, key=lambda g: g.get("timestamp", ""))
+    sorted_games = sorted(games, key=lambda g: g.get("timestamp", 0))
     current = 0
     best = 0
     for g in sorted_games:
@@ -406,36 +439,10 @@ def format_seconds(sec: float) -> str:
     s = int(sec % 60)
     return f"{m:02d}:{s:02d}"
 
-def load_games_df():
-    df = pd.DataFrame(storage.fetch_all_games())
-    if df.empty:
-        return df
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    if "word_length" not in df.columns:
-        df["word_length"] = df["word"].astype(str).str.len()
-    return df
-
-def category_stats(df: pd.DataFrame) -> pd.DataFrame:
-    if "category" not in df.columns:
-        return pd.DataFrame(columns=["category", "win_rate", "wrong", "duration"])
-    out = df.groupby("category").agg(
-        win_rate=("won", "mean"),
-        wrong=("wrong_guesses", "mean"),
-        duration=("duration_sec", "mean"),
-    )
-    out["win_rate"] = out["win_rate"] * 100
-    return out.reset_index()
-
-def difficulty_recommendation(user_df: pd.DataFrame):
-    if len(user_df) < 10:
-        return None
-    wr = user_df["won"].mean() * 100
-    if wr >= 70:
-        return "Hard"
-    elif wr >= 40:
-        return "Medium"
-    else:
-        return "Easy"
+def date_to_ms(d) -> int:
+    """Midnight (UTC) of a date as epoch milliseconds."""
+    return int(pd.Timestamp(d).value // 1_000_000)
+
 def apply_green_theme(fig):
     """Give a bright-green theme to a Plotly figure."""
     fig.update_layout(
@@ -456,42 +463,40 @@ def apply_green_theme(fig):
     )
     return fig
 
-def letter_heatmap(user_df: pd.DataFrame) -> pd.DataFrame:
+def render_pending(job, title: str, chart: bool = True):
+    """Progress bar (+ placeholder chart) for a job still running in the pool."""
+    st.progress(job.progress(), text=f"Computing {title.lower()}...")
+    if not chart:
+        return
+    placeholder = go.Figure()
+    placeholder.update_layout(title=title, height=300)
+    st.plotly_chart(apply_green_theme(placeholder), use_container_width=True)
+
+def render_failed(job, title: str):
+    """Error in place of a chart whose job failed; the next rerun submits it again."""
+    jobs.evict(job)
+    st.error(f"Could not compute {title.lower()}: {job.error()}")
+
+def render_job(job, title: str, render, chart: bool = True):
     """
-    Letter frequency table:
-    how often each letter appears in words from games you won vs lost.
+    render(result) once a pool job finishes. Until then only a fragment holding
+    the placeholder reruns, every POLL_INTERVAL_SEC; when the job is done it
+    reruns the page once, which draws the result and stops the polling.
     """
-    letters = list("abcdefghijklmnopqrstuvwxyz")
-    stats = {l: {"won": 0, "lost": 0} for l in letters}
-
-    for _, row in user_df.iterrows():
-        word = str(row.get("word", "")).lower()
-        if not word:
-            continue
-        unique_letters = {c for c in word if c.isalpha()}
-        col = "won" if row.get("won", 0) == 1 else "lost"
-        for l in unique_letters:
-            if l in stats:
-                stats[l][col] += 1
-
-    hm = pd.DataFrame(stats).T
-    hm = hm.sort_index()
-    return hm
-
-def get_hint(word: str) -> str:
-    w = word.lower()
-    if w in WORD_HINTS:
-        return WORD_HINTS[w]
-    vowels = set("aeiou")
-    vowel_count = sum(1 for c in w if c in vowels)
-    first = w[0].upper()
-    last = w[-1].upper()
-    hints = [
-        f"Starts with {first}",
-        f"Ends with {last}",
-        f"Contains {vowel_count} vowel(s)",
-    ]
-    return random.choice(hints)
+    if job.done():
+        if job.error() is not None:
+            render_failed(job, title)
+        else:
+            render(job.result())
+        return
+
+    @st.fragment(run_every=jobs.POLL_INTERVAL_SEC)
+    def poll():
+        if job.done():
+            st.rerun()
+        render_pending(job, title, chart)
+
+    poll()
 
 def get_all_words():
     all_words = []
@@ -509,6 +514,16 @@ except Exception:
         ALL_WORDS.extend(w.lower() for w in words)
 ALL_WORDS = list(dict.fromkeys(ALL_WORDS))
 
+# A pack category named like a built-in one is listed as "Name (pack)" instead.
+wordbank.reserve(["All Categories", *WORD_CATEGORIES])
+
+# Every built-in word, described in each word-bank snapshot's metadata table.
+# Registered by the first rerun only: the lists are fixed for the process.
+if not wordbank.has_builtin_words():
+    wordbank.set_builtin_words(
+        dict.fromkeys([*ALL_WORDS, *(w.lower() for ws in WORD_CATEGORIES.values() for w in ws)]), WORD_HINTS
+    )
+
 # --------------------------
 # Session state
 # --------------------------
@@ -533,7 +548,14 @@ def init_session_state():
         current_streak=0,
         best_streak=0,
         word_queue=[],
+        word_queue_seed=0,
+        word_queue_category="",
         last_word="",
+        adaptive_words=False,
+        word_bank=None,
+        word_meta=None,
+        hint="",
+        game_uuid="",
     )
     for k, v in defaults.items():
         if k not in st.session_state:
@@ -541,6 +563,46 @@ def init_session_state():
 
 init_session_state()
 
+
+def category_words(category: str) -> list[str]:
+    """Built-in words of a category ("All Categories" or unknown: every word), deduplicated."""
+    if category == "All Categories":
+        base_words = ALL_WORDS
+    else:
+        base_words = WORD_CATEGORIES.get(category, ALL_WORDS)
+    return list(dict.fromkeys(w.lower() for w in base_words))
+
+
+def restore_session(saved: dict):
+    """Apply a game loaded from the session store to st.session_state."""
+    seed = saved.pop("word_queue_seed")
+    left = saved.pop("word_queue_left")
+    queue = sessions.shuffled(category_words(saved["word_queue_category"]), seed) if seed else []
+    saved["word_queue"] = queue[:left]
+    saved["word_queue_seed"] = seed
+    for key, value in saved.items():
+        st.session_state[key] = value
+    st.session_state.word_bank = wordbank.current()
+    if saved["secret_word"]:
+        st.session_state.word_meta = wordmeta.WordMeta(saved["secret_word"], saved["hint"] or None)
+
+
+# --------------------------
+# External session store (opt-in: HANGMAN_SESSION_STORE)
+# --------------------------
+session_store = sessions.get_store()
+if session_store is not None and "_session_token" not in st.session_state:
+    # First run of this browser session: the URL token finds a game saved by
+    # any replica (or before a restart).
+    token = st.query_params.get("session") or sessions.new_token()
+    st.query_params["session"] = token
+    st.session_state._session_token = token
+    saved = session_store.load(token)
+    if saved:
+        restore_session(saved)
+
+rerun_timer.lap("session_state")
+
 def get_difficulty_config():
     diff = st.session_state.get("difficulty", "Medium")
     if isinstance(diff, str):
@@ -576,29 +638,53 @@ def start_new_game(difficulty=None, category=None):
     st.session_state.result_logged = False
     st.session_state.start_time = time.time()
 
-    if st.session_state.word_category == "All Categories":
-        base_words = ALL_WORDS
+    base_words = category_words(st.session_state.word_category)
+
+    # Word-pack categories come from the newest word-bank snapshot; the game
+    # keeps that snapshot even if a newer one is swapped in meanwhile.
+    bank = wordbank.current()
+    st.session_state.word_bank = bank
+    meta = None
+    if st.session_state.word_category not in WORD_CATEGORIES and st.session_state.word_category in bank.categories:
+        meta = bank.draw(st.session_state.word_category, exclude=[st.session_state.get("last_word")])
+        secret = meta.word
+    elif st.session_state.adaptive_words and st.session_state.username:
+        # Favour the letters and word lengths this player loses on, and words
+        # that most players find easy / hard on Easy / Hard.
+        features = storage.fetch_user_features(st.session_state.username)
+        resolved_category = st.session_state.word_category
+        matrix = adaptive.word_matrix(resolved_category, lambda: category_words(resolved_category))
+        secret = adaptive.pick_word(
+            features, matrix, exclude=[st.session_state.get("last_word")], difficulty=st.session_state.difficulty
+        )
     else:
-        base_words = WORD_CATEGORIES.get(st.session_state.word_category, ALL_WORDS)
-    base_words = list(dict.fromkeys(w.lower() for w in base_words))
+        if not st.session_state.word_queue:
+            # Seeded, so the session store can save the queue as (seed, words left).
+            seed = random.getrandbits(32)
+            queue = sessions.shuffled(base_words, seed)
+            last = st.session_state.get("last_word")
+            if last in queue and len(queue) > 1 and queue[-1] == last:
+                seed = random.getrandbits(32)
+                queue = sessions.shuffled(base_words, seed)
+            st.session_state.word_queue = queue
+            st.session_state.word_queue_seed = seed
+            st.session_state.word_queue_category = st.session_state.word_category
 
-    if not st.session_state.word_queue:
-        queue = base_words[:]
-        random.shuffle(queue)
-        last = st.session_state.get("last_word")
-        if last in queue and len(queue) > 1 and queue[-1] == last:
-            random.shuffle(queue)
-        st.session_state.word_queue = queue
-
-    secret = st.session_state.word_queue.pop()
-    last = st.session_state.get("last_word")
-    if last and secret == last and st.session_state.word_queue:
         secret = st.session_state.word_queue.pop()
+        last = st.session_state.get("last_word")
+        if last and secret == last and st.session_state.word_queue:
+            secret = st.session_state.word_queue.pop()
 
     st.session_state.secret_word = secret.lower()
+    # Metadata comes from the tables built with the word-bank snapshot; the
+    # hint is chosen now so every rerun of this game shows the same one.
+    st.session_state.word_meta = meta or bank.word_meta(st.session_state.secret_word)
+    st.session_state.hint = st.session_state.word_meta.pick_hint()
     st.session_state.last_word = st.session_state.secret_word
     st.session_state.display_word = ["_"] * len(st.session_state.secret_word)
     st.session_state.game_active = True
+    st.session_state.game_uuid = str(uuid.uuid4())
+    events.record(events.START, st.session_state)
 
 def process_guess(letter: str):
     if not letter or not letter.isalpha() or len(letter) != 1:
@@ -613,7 +699,8 @@ def process_guess(letter: str):
     st.session_state.guessed_letters.add(letter)
     st.session_state.attempts += 1
 
-    if letter in st.session_state.secret_word:
+    hit = letter in st.session_state.secret_word
+    if hit:
         for i, ch in enumerate(st.session_state.secret_word):
             if ch == letter:
                 st.session_state.display_word[i] = letter
@@ -622,6 +709,7 @@ def process_guess(letter: str):
         st.session_state.wrong_letters.add(letter)
         st.session_state.remaining_lives -= 1
         st.error(f"Incorrect — {letter.upper()} is not in the word. Lives remaining: {st.session_state.remaining_lives}")
+    events.record(events.GUESS, st.session_state, letter, hit)
 
     if "_" not in st.session_state.display_word:
         st.session_state.game_over = True
@@ -647,17 +735,25 @@ def log_result_if_needed():
     if st.session_state.start_time:
         duration = time.time() - st.session_state.start_time
 
-    storage.log_game(
-        username=st.session_state.username,
-        word=st.session_state.secret_word,
-        category=st.session_state.word_category,
-        won=st.session_state.game_won,
-        attempts_used=st.session_state.attempts,
-        wrong_guesses=len(st.session_state.wrong_letters),
-        max_lives=st.session_state.max_lives,
-        remaining_lives=st.session_state.remaining_lives,
-        duration_sec=duration,
-    )
+    # Keyed by the game's UUID, so a rerun racing this one or a retry after
+    # an error cannot store the game twice.
+    try:
+        storage.log_game(
+            username=st.session_state.username,
+            word=st.session_state.secret_word,
+            category=st.session_state.word_category,
+            won=st.session_state.game_won,
+            attempts_used=st.session_state.attempts,
+            wrong_guesses=len(st.session_state.wrong_letters),
+            max_lives=st.session_state.max_lives,
+            remaining_lives=st.session_state.remaining_lives,
+            duration_sec=duration,
+            game_uuid=st.session_state.game_uuid or None,
+        )
+    except sqlite3.Error as exc:
+        # result_logged stays False, so the next rerun tries again.
+        st.warning(f"Could not save this game's result yet ({exc}); it will be retried.")
+        return
     st.session_state.result_logged = True
     
 # --------------------------
@@ -676,23 +772,32 @@ with st.sidebar:
     username = st.text_input("Enter username", value=st.session_state.username, placeholder="Your name...")
     if username != st.session_state.username:
         st.session_state.username = username
+    rerun_timer.lap("sidebar.header")
 
     st.markdown("### Player Stats")
-    games_df = load_games_df()
+    # Lifetime totals from the rollup, so games moved to the cold tier still count;
+    # with shards configured, games played on the other nodes count too.
+    totals = (
+        storage.fetch_player_totals(st.session_state.username, federated=bool(storage.shard_paths()))
+        if st.session_state.username
+        else []
+    )
 
-    if not games_df.empty and st.session_state.username:
-        user_df_sidebar = games_df[games_df["username"] == st.session_state.username]
+    if totals:
         col1, col2, col3 = st.columns(3)
-        total_games = len(user_df_sidebar)
-        wins = int(user_df_sidebar["won"].sum()) if not user_df_sidebar.empty else 0
-        win_rate = (wins / total_games * 100) if total_games > 0 else 0
+        _, total_games, wins, _, _, _, win_rate = totals[0]
         col1.metric("Games", total_games)
         col2.metric("Wins", wins)
         col3.metric("Win %", f"{win_rate:.0f}%")
+        ranks = approx.percentile_for(st.session_state.username)
+        labels = {"win_rate": "win rate", "avg_attempts": "fewest attempts", "avg_duration": "speed"}
+        if ranks:
+            st.caption(" · ".join(f"Top {ranks[m]:.0f}% by {label}" for m, label in labels.items() if ranks.get(m)))
         st.markdown(f"**Current Streak:** {st.session_state.current_streak}")
         st.markdown(f"**Best Streak:** {st.session_state.best_streak}")
     else:
         st.info("Play some games to see your stats.")
+    rerun_timer.lap("sidebar.stats")
 
     st.markdown("---")
     st.markdown("Game Settings")
@@ -705,12 +810,21 @@ with st.sidebar:
 
     category = st.selectbox(
         "Word Category",
-        ["All Categories"] + list(WORD_CATEGORIES.keys()),
+        ["All Categories"]
+        + list(WORD_CATEGORIES.keys())
+        + list(wordbank.current().categories),
         index=0,
     )
 
+    st.toggle(
+        "Adaptive words",
+        key="adaptive_words",
+        help="Pick words with the letters and lengths you lose on most; on Easy / Hard, also words most players find easy / hard.",
+    )
+
     if st.button("Start New Game with Settings", use_container_width=True):
         start_new_game(diff, category)
+    rerun_timer.lap("sidebar.settings")
 
     st.markdown("---")
     st.markdown("Achievements")
@@ -725,9 +839,16 @@ with st.sidebar:
                 st.caption(desc)
         except Exception:
             st.markdown("○ **{title}**")
+    rerun_timer.lap("sidebar.achievements")
 
     st.markdown("---")
-    page = st.radio("Navigate", ["Play", "Analytics", "Leaderboard", "Data Export"])
+    pages = ["Play", "Analytics", "Leaderboard", "Hardest Words", "Data Export", "Data Import"]
+    if DEBUG_METRICS or profiler.list_profiles():
+        pages.append("Profiles")
+    page = st.radio("Navigate", pages)
+
+    debug_panel = st.empty() if DEBUG_METRICS else None
+    rerun_timer.lap("sidebar.nav")
 
 # --------------------------
 # Main header
@@ -748,6 +869,7 @@ if page == "Play":
                 start_new_game()
         else:
             if st.button("Give Up & Start New", use_container_width=True):
+                events.record(events.GIVE_UP, st.session_state)
                 st.session_state.game_over = True
                 st.session_state.game_won = False
                 st.session_state.display_word = list(st.session_state.secret_word)
@@ -801,12 +923,13 @@ if page == "Play":
                         if st.session_state.remaining_lives > hint_cost:
                             st.session_state.remaining_lives -= hint_cost
                             st.session_state.hint_shown = True
+                            events.record(events.HINT, st.session_state)
                             st.rerun()
                         else:
                             st.error("Not enough lives for a hint.")
                 else:
                     st.markdown(
-                        f"<div class='hint-box'>{get_hint(st.session_state.secret_word)}</div>",
+                        f"<div class='hint-box'>{st.session_state.hint}</div>",
                         unsafe_allow_html=True,
                     )
 
@@ -851,15 +974,17 @@ if page == "Play":
 elif page == "Analytics":
     st.markdown("Player Analytics Dashboard")
 
-    df = load_games_df()
-
-    if df.empty:
-        st.info("No games played yet. Start playing to see analytics.")
-    elif not st.session_state.username:
+    if not st.session_state.username:
         st.warning("Enter a username in the sidebar to view personal analytics.")
     else:
-        user_df = df[df["username"] == st.session_state.username]
+        agg = aggregates.get_backend()
+        user_df = agg.games(st.session_state.username)
 
+        if storage.cold_db_path().exists():
+            st.caption(
+                "Charts cover recent games; older ones are archived in the cold tier. "
+                "The sidebar totals and the leaderboard still include them."
+            )
         if user_df.empty:
             st.info("You haven't played any games yet. Start playing!")
         else:
@@ -874,7 +999,7 @@ elif page == "Analytics":
             col1.metric("Total Games", total_games)
 
             # Difficulty suggestion after 10+ games
-            suggested = difficulty_recommendation(user_df)
+            suggested = agg.difficulty_recommendation(st.session_state.username)
             if suggested:
                 st.info(
                     f"We recommend trying **{suggested} difficulty** based on your performance."
@@ -904,8 +1029,7 @@ elif page == "Analytics":
 
             # ===== Word length performance =====
             with chart_col2:
-                length_perf = user_df.groupby("word_length").won.mean().reset_index()
-                length_perf["Win Rate"] = length_perf["won"] * 100
+                length_perf = agg.length_win_rate(st.session_state.username)
                 fig2 = px.bar(
                     length_perf,
                     x="word_length",
@@ -921,11 +1045,17 @@ elif page == "Analytics":
 
             # ===== Letter heatmap =====
             st.markdown("### Letter Usage Heatmap")
-            hm = letter_heatmap(user_df)
+            heatmap_job = jobs.submit(
+                jobs.letter_heatmap_job,
+                str(storage.DB_PATH),
+                st.session_state.username,
+                storage.latest_game_id(st.session_state.username),
+            )
 
-            if hm[["won", "lost"]].values.sum() == 0:
-                st.info("Not enough data yet to build a letter heatmap.")
-            else:
+            def render_heatmap(hm):
+                if hm[["won", "lost"]].values.sum() == 0:
+                    st.info("Not enough data yet to build a letter heatmap.")
+                    return
                 fig_hm = px.imshow(
                     hm[["won", "lost"]].T,
                     labels=dict(x="Letter", y="Outcome", color="Count"),
@@ -937,13 +1067,13 @@ elif page == "Analytics":
                 fig_hm = apply_green_theme(fig_hm)
                 st.plotly_chart(fig_hm, use_container_width=True)
 
+            render_job(heatmap_job, "Letter Usage Heatmap", render_heatmap)
+
             st.markdown("---")
 
             # ===== Time-of-day performance =====
             st.markdown("### Performance by Time of Day")
-            user_df["hour"] = user_df["timestamp"].dt.hour
-            tod = user_df.groupby("hour").won.mean().reset_index()
-            tod["Win Rate"] = tod["won"] * 100
+            tod = analytics.hourly_win_rate(st.session_state.username)
             fig_time = px.line(
                 tod, x="hour", y="Win Rate", title="Win Rate by Hour"
             )
@@ -956,7 +1086,7 @@ elif page == "Analytics":
             # ===== Category difficulty =====
             st.markdown("### Category Difficulty Comparison")
             if "category" in user_df.columns:
-                cat = category_stats(user_df)
+                cat = agg.category_stats(st.session_state.username)
                 if not cat.empty:
                     fig_cat = px.bar(
                         cat,
@@ -970,6 +1100,45 @@ elif page == "Analytics":
 
             st.markdown("---")
 
+            # ===== Per-guess event log =====
+            st.markdown("### Guess Effectiveness")
+            user_events = events.load(st.session_state.username)
+            if not (user_events["kind"] == events.GUESS).any():
+                st.info("No guesses recorded yet.")
+            else:
+                eff = events.letter_effectiveness(user_events)
+                eff = eff[eff["guesses"] > 0].reset_index()
+                eff["Hit Rate"] = eff["hit_rate"] * 100
+                fig_eff = px.bar(
+                    eff,
+                    x="letter",
+                    y="Hit Rate",
+                    color="mean_guess_number",
+                    color_continuous_scale="Greens",
+                    hover_data=["guesses", "mean_think_sec"],
+                    title="Hit Rate by Guessed Letter (colour: average guess number)",
+                )
+                fig_eff = apply_green_theme(fig_eff)
+                st.plotly_chart(fig_eff, use_container_width=True)
+
+                recent_games = events.games(user_events).head(20)
+                names = storage.word_names(recent_games["word"])
+                replay_labels = [
+                    f"{names.get(word, '?').upper()} — {datetime.fromtimestamp(start / 1000):%Y-%m-%d %H:%M}"
+                    for word, start in zip(recent_games["word"], recent_games["start"])
+                ]
+                choice = st.selectbox(
+                    "Replay a recent game", range(len(replay_labels)), format_func=replay_labels.__getitem__
+                )
+                st.dataframe(
+                    events.replay(
+                        user_events, recent_games["game"][choice], names.get(recent_games["word"][choice], "")
+                    ),
+                    use_container_width=True,
+                )
+
+            st.markdown("---")
+
             # ===== Achievement progress =====
             st.markdown("### Achievement Progress")
             ach_names, ach_value = [], []
@@ -993,20 +1162,22 @@ elif page == "Analytics":
             st.plotly_chart(fig_ach, use_container_width=True)
 
             # ===== Win-rate progress over time =====
-            timeline = user_df.sort_values("timestamp").copy()
-            timeline["game_number"] = range(1, len(timeline) + 1)
-            timeline["cumulative_wins"] = timeline["won"].cumsum()
-            timeline["cumulative_win_rate"] = (
-                timeline["cumulative_wins"] / timeline["game_number"]
-            ) * 100
+            # One point per day played (daily rollup), so the x axis is the date.
+            timeline = analytics.downsample(
+                analytics.win_rate_timeline(st.session_state.username),
+                "date",
+                "cumulative_win_rate",
+            )
 
             fig3 = px.line(
                 timeline,
-                x="game_number",
+                x="date",
                 y="cumulative_win_rate",
+                hover_data=["game_number"],
                 title="Win Rate Progress Over Time",
                 labels={
-                    "game_number": "Game Number",
+                    "date": "Date",
+                    "game_number": "Games Played",
                     "cumulative_win_rate": "Win Rate (%)",
                 },
             )
@@ -1055,26 +1226,44 @@ elif page == "Analytics":
 elif page == "Leaderboard":
     st.markdown("Global Leaderboard")
 
-    df = load_games_df()
+    federated = bool(storage.shard_paths()) and st.toggle(
+        "All nodes (federated)", value=True, key="federated_leaderboard"
+    )
+    approximate = not federated and st.toggle("Approximate (sampled)", value=approx.ENABLED, key="approx_leaderboard")
+    if federated:
+        # This node's rollups plus the shards' games not stored here: games copied across nodes count once.
+        rows = storage.fetch_player_totals(federated=True)
+        leaderboard = pd.DataFrame(rows, columns=storage.PLAYER_TOTALS_COLUMNS).set_index("username")
+        st.caption(f"Across {len(storage.federated_nodes())} node databases.")
+    elif approximate:
+        sketches = approx.Sketches()
+        leaderboard = sketches.leaderboard()
+        st.caption(
+            f"Estimated from a sample of {len(sketches.sample):,} of {sketches.seen:,} games; "
+            "± is a 95% confidence interval."
+        )
+    else:
+        # One row per player from the player_stats rollup: cheap enough for the script thread.
+        leaderboard = aggregates.get_backend().leaderboard()
 
-    if df.empty:
+    if leaderboard.empty:
         st.info("No games recorded yet.")
     else:
-        stats = df.copy()
-        stats["perfect"] = ((stats["won"] == 1) & (stats["wrong_guesses"] == 0)).astype(int)
-
-        leaderboard = stats.groupby("username").agg(
-            games=("id", "count"),
-            wins=("won", "sum"),
-            perfects=("perfect", "sum"),
-            avg_attempts=("attempts_used", "mean"),
-            avg_duration=("duration_sec", "mean"),
-        )
-        leaderboard["win_rate"] = (leaderboard["wins"] / leaderboard["games"]) * 100
+        if not federated:
+            # Elo ratings are per node and do not add up, so federated boards rank by win rate alone.
+            ratings = pd.DataFrame(storage.fetch_rating_leaderboard(), columns=["username", "rating", "rated_games"])
+            leaderboard = leaderboard.assign(
+                rating=ratings.set_index("username")["rating"].reindex(leaderboard.index.astype(str)).to_numpy()
+            )
 
-        min_games = st.slider("Minimum games to show", 1, max(1, int(leaderboard["games"].max())), 1)
+        col_s1, col_s2 = st.columns([3, 1])
+        with col_s1:
+            min_games = st.slider("Minimum games to show", 1, max(1, int(leaderboard["games"].max())), 1)
+        with col_s2:
+            rank_by = st.selectbox("Rank by", ["Win Rate"] if federated else ["Rating", "Win Rate"])
+        sort_key = "rating" if rank_by == "Rating" else "win_rate"
         filtered = leaderboard[leaderboard["games"] >= min_games].sort_values(
-            ["win_rate", "games"], ascending=[False, False]
+            [sort_key, "games"], ascending=[False, False]
         )
 
         st.markdown("Top 3 Players")
@@ -1088,7 +1277,8 @@ elif page == "Leaderboard":
                     st.markdown(
                         f"<div class='{medals[i]}'>"
                         f"<strong>{player['username']}</strong><br>"
-                        f"Win Rate: {player['win_rate']:.1f}%<br>"
+                        + (f"Rating: {player['rating']:.0f}<br>" if "rating" in player else "")
+                        + f"Win Rate: {player['win_rate']:.1f}%<br>"
                         f"Games: {int(player['games'])}"
                         f"</div>",
                         unsafe_allow_html=True,
@@ -1097,40 +1287,117 @@ elif page == "Leaderboard":
         st.markdown("---")
         st.markdown("Full Rankings")
 
-        display_lb = filtered.copy()
-        display_lb["avg_duration"] = display_lb["avg_duration"].apply(format_seconds)
-        display_lb = display_lb.reset_index()
-        display_lb = display_lb[
-            ["username", "games", "wins", "win_rate", "perfects", "avg_attempts", "avg_duration"]
-        ]
-        display_lb.columns = ["Player", "Games", "Wins", "Win Rate %", "Perfect Wins", "Avg Attempts", "Avg Time"]
+        columns = {
+            "username": "Player",
+            "rating": "Rating",
+            "games": "Games",
+            "wins": "Wins",
+            "win_rate": "Win Rate %",
+            "win_rate_margin": "± Win Rate",
+            "perfects": "Perfect Wins",
+            "avg_attempts": "Avg Attempts",
+            "avg_duration": "Avg Time",
+        }
+        # Only the shown columns are taken from `filtered`; Avg Time is formatted by the Styler.
+        display_lb = (
+            filtered[[c for c in columns if c in filtered.columns]].reset_index().rename(columns=columns)
+        )
 
         st.dataframe(
             display_lb.style.format(
-                {
-                    "Win Rate %": "{:.1f}",
-                    "Avg Attempts": "{:.1f}",
-                }
+                {col: "{:.0f}" for col in ("Rating",) if col in display_lb.columns}
+                | {col: "{:.1f}" for col in ("Win Rate %", "± Win Rate", "Avg Attempts") if col in display_lb.columns}
+                | {col: format_seconds for col in ("Avg Time",) if col in display_lb.columns}
             ),
             use_container_width=True,
         )
 
+# --------------------------
+# HARDEST WORDS PAGE
+# --------------------------
+elif page == "Hardest Words":
+    st.markdown("Hardest Words")
+
+    col_h1, col_h2 = st.columns(2)
+    with col_h1:
+        min_plays = st.slider("Minimum plays", 1, 50, 3)
+    with col_h2:
+        top_n = st.slider("Words to show", 5, 100, 20)
+
+    hardest = pd.DataFrame(
+        storage.fetch_hardest_words(limit=top_n, min_plays=min_plays), columns=storage.WORD_STATS_COLUMNS
+    )
+    if hardest.empty:
+        st.info("No word has been played that often yet.")
+    else:
+        hardest["Loss Rate"] = (1 - hardest["wins"] / hardest["plays"]) * 100
+        fig_words = px.bar(
+            hardest,
+            x="word",
+            y="Loss Rate",
+            color="Loss Rate",
+            color_continuous_scale="Greens",
+            title="Loss Rate by Word",
+        )
+        fig_words = apply_green_theme(fig_words)
+        st.plotly_chart(fig_words, use_container_width=True)
+
+        hardest["mean_duration"] = hardest["mean_duration"].apply(
+            lambda sec: format_seconds(sec) if pd.notna(sec) else "-"
+        )
+        hardest = hardest[["word", "plays", "wins", "Loss Rate", "mean_wrong", "mean_duration", "rating"]]
+        hardest.columns = ["Word", "Plays", "Wins", "Loss Rate %", "Avg Wrong", "Avg Time", "Rating"]
+        st.dataframe(
+            hardest.style.format({"Loss Rate %": "{:.1f}", "Avg Wrong": "{:.1f}", "Rating": "{:.0f}"}),
+            use_container_width=True,
+        )
+
 # --------------------------
 # DATA EXPORT PAGE
 # --------------------------
 elif page == "Data Export":
     st.markdown("Export Your Data")
 
-    df = load_games_df()
+    federated = bool(storage.shard_paths()) and st.toggle(
+        "Games of all nodes (federated)", value=False, key="export_federated"
+    )
+    approximate = not federated and st.toggle("Approximate summary (sampled)", value=approx.ENABLED, key="approx_export")
+    include_cold = not federated and storage.cold_db_path().exists() and st.toggle(
+        "Include archived games (cold tier)", value=False, key="export_include_cold"
+    )
+    if approximate:
+        # The summary comes from the sketches; games are only loaded for the export itself.
+        sketches = approx.Sketches()
+        summary = [sketches.total_games(), sketches.unique_players(), sketches.total_wins()]
+        has_games = sketches.seen > 0
+        df = None
+    else:
+        df = load_games_df(include_cold=include_cold, federated=federated)
+        summary = [len(df), df["username"].nunique(), int(df["won"].sum())] if not df.empty else []
+        has_games = not df.empty
 
-    if df.empty:
+    if not has_games:
         st.info("No data to export yet.")
     else:
         st.markdown("Database Summary")
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Games", len(df))
-        col2.metric("Unique Players", df["username"].nunique())
-        col3.metric("Total Wins", int(df["won"].sum()))
+        for col, label, value in zip((col1, col2, col3), ("Total Games", "Unique Players", "Total Wins"), summary):
+            col.metric(label, str(value))
+        if approximate:
+            st.caption("≈ values are estimated from sketches; ± is a 95% confidence interval.")
+            trend = sketches.win_rate_over_time()
+            fig_trend = px.line(
+                trend,
+                x="period",
+                y="win_rate",
+                error_y="win_rate_margin",
+                hover_data=["games"],
+                markers=True,
+                title="Global Win Rate by Week (sampled)",
+                labels={"period": "Week", "win_rate": "Win Rate (%)", "games": "Games (est.)"},
+            )
+            fig_trend.update_traces(line_color="#7affbf")
+            st.plotly_chart(apply_green_theme(fig_trend), use_container_width=True)
 
         st.markdown("---")
 
@@ -1140,56 +1407,210 @@ elif page == "Data Export":
         with col_f1:
             selected_players = st.multiselect(
                 "Select Players",
-                options=["All"] + sorted(df["username"].unique().tolist()),
+                options=["All"] + storage.player_names(federated=federated),
                 default=["All"],
             )
 
         with col_f2:
-            min_date = df["timestamp"].min() if not df.empty else datetime.now()
-            max_date = df["timestamp"].max() if not df.empty else datetime.now()
+            min_ms, max_ms = storage.games_time_range(include_cold=include_cold, federated=federated)
+            # Both None when every game is in the cold tier (approximate summary only).
+            min_date = pd.to_datetime(min_ms if min_ms is not None else storage.now_ms(), unit="ms")
+            max_date = pd.to_datetime(max_ms if max_ms is not None else storage.now_ms(), unit="ms")
             date_range = st.date_input(
                 "Date Range",
                 value=(min_date.date(), max_date.date()),
                 max_value=datetime.now(),
             )
 
-        filtered_df = df.copy()
-        if "All" not in selected_players:
-            filtered_df = filtered_df[filtered_df["username"].isin(selected_players)]
-
         if len(date_range) == 2:
-            filtered_df = filtered_df[
-                (filtered_df["timestamp"] >= pd.Timestamp(date_range[0]))
-                & (filtered_df["timestamp"] <= pd.Timestamp(date_range[1]))
-            ]
+            # Range filter runs in SQL on the timestamp index; end date is inclusive.
+            start_ms, end_ms = date_to_ms(date_range[0]), date_to_ms(date_range[1] + timedelta(days=1))
+        else:
+            start_ms = end_ms = None
+        players = None if "All" in selected_players else selected_players
 
-        st.markdown(f"Filtered records: {len(filtered_df)}")
+        def load_filtered() -> pd.DataFrame:
+            if start_ms is None and df is not None:
+                games = df
+            else:
+                games = load_games_df(start_ms=start_ms, end_ms=end_ms, include_cold=include_cold, federated=federated)
+            if games.empty:
+                games = pd.DataFrame(columns=storage.NAMED_COLUMNS).astype({"timestamp": "datetime64[ns]"})
+            return games if players is None else games[games["username"].isin(players)]
+
+        if approximate:
+            # Constant time: the count comes from the sample, games are only read for a download.
+            filtered_df = None
+            st.markdown(f"Filtered records: {sketches.games_matching(players, start_ms, end_ms)}")
+            st.caption("Approximate mode skips the preview; Prepare Export reads the matching games.")
+        else:
+            filtered_df = load_filtered()
+            st.markdown(f"Filtered records: {len(filtered_df)}")
 
-        st.markdown("Data Preview")
-        preview = filtered_df.head(20).copy()
-        preview["timestamp"] = preview["timestamp"].dt.strftime("%Y-%m-%d %H:%M")
-        st.dataframe(preview, use_container_width=True)
+            st.markdown("Data Preview")
+            preview = filtered_df.head(20).copy()
+            preview["timestamp"] = preview["timestamp"].dt.strftime("%Y-%m-%d %H:%M")
+            st.dataframe(preview, use_container_width=True)
 
         st.markdown("---")
-        csv = filtered_df.to_csv(index=False)
 
-        col_e1, col_e2 = st.columns(2)
+        def export_df() -> pd.DataFrame:
+            games = filtered_df if filtered_df is not None else load_filtered()
+            # With game UUIDs, so Data Import on another instance skips games it already has
+            # (federated reads carry them already, ids being per node).
+            return games if federated else transfer.with_uuids(games)
+
+        # Files are built on request, not on every rerun, and kept until the filters change.
+        formats = {
+            "CSV": (".csv", "text/csv", transfer.to_csv),
+            "JSONL": (".jsonl", "application/jsonl", transfer.to_jsonl),
+        }
+        if transfer.pq is not None:
+            formats["Parquet"] = (".parquet", "application/vnd.apache.parquet", transfer.to_parquet)
+
+        col_e1, col_e2, col_e3, col_e4 = st.columns(4)
         with col_e1:
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name=f"hangman_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                use_container_width=True,
-            )
+            export_format = st.selectbox("Format", list(formats), label_visibility="collapsed")
+        suffix, mime, serialize = formats[export_format]
+        export_key = (export_format, tuple(players or ()), start_ms, end_ms, include_cold, federated)
 
         with col_e2:
+            if st.button("Prepare Export", use_container_width=True):
+                export_name = f"hangman_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}"
+                with st.spinner(f"Building {export_format}..."):
+                    st.session_state.export_file = (export_key, export_name, serialize(export_df()))
+
+        with col_e3:
+            prepared = st.session_state.get("export_file")
+            if prepared is not None and prepared[0] == export_key:
+                st.download_button(
+                    label=f"Download {export_format}",
+                    data=prepared[2],
+                    file_name=prepared[1],
+                    mime=mime,
+                    use_container_width=True,
+                )
+
+        with col_e4:
             if st.button("Refresh Data", use_container_width=True):
                 st.rerun()
 
+# --------------------------
+# DATA IMPORT PAGE
+# --------------------------
+elif page == "Data Import":
+    st.markdown("Import Game Data")
+    st.caption(
+        "CSV, JSONL or Parquet files from Data Export (here or on another instance). "
+        "Games already stored are skipped, so importing a file twice is safe."
+    )
+    uploads = st.file_uploader(
+        "Exported files", type=[suffix.lstrip(".") for suffix in transfer.FORMATS], accept_multiple_files=True
+    )
+    if uploads and st.button("Import", use_container_width=True):
+        for upload in uploads:
+            start = time.perf_counter()
+            try:
+                with st.spinner(f"Importing {upload.name}..."):
+                    result = transfer.import_file(upload, upload.name)
+            except (ValueError, RuntimeError, sqlite3.Error) as exc:
+                st.error(f"{upload.name}: {exc}")
+                continue
+            st.success(
+                f"{upload.name}: imported {result['inserted']:,} of {result['read']:,} games "
+                f"({result['duplicates']:,} already stored) in {time.perf_counter() - start:.2f}s"
+            )
+
+    # Full rebuilds of the derived tables (as in manage.py), run in the job pool.
+    st.markdown("Rebuild Derived Tables")
+    rebuild_jobs = st.session_state.setdefault("rebuild_jobs", {})
+    for col, name in zip(st.columns(len(jobs.REBUILDS)), jobs.REBUILDS):
+        if col.button(f"Rebuild {name}", use_container_width=True):
+            rebuild_jobs[name] = jobs.submit(jobs.rebuild_job, str(storage.DB_PATH), name, storage.latest_game_id())
+    for name, job in list(rebuild_jobs.items()):
+        if job.done():
+            del rebuild_jobs[name]  # reported below, once
+        render_job(job, f"Rebuild of {name}", lambda _, name=name: st.success(f"Rebuilt {name}."), chart=False)
+
+# --------------------------
+# PROFILES PAGE
+# --------------------------
+elif page == "Profiles":
+    st.markdown("Rerun Profiles")
+    st.caption(
+        f"Directory: {profiler.PROFILE_DIR} | Reruns left to profile: {profiler.remaining(_profile_owner)} | "
+        "Arm with ?profile=N for this session (&profile_memory=1 for tracemalloc) or "
+        "HANGMAN_PROFILE_RERUNS=N for the next N reruns of any session"
+    )
+
+    profiles = profiler.list_profiles()
+    if not profiles:
+        st.info("No profiles recorded yet.")
+    else:
+        col_p1, col_p2 = st.columns([3, 1])
+        with col_p1:
+            selected = st.selectbox("Profile", profiles, format_func=lambda p: p.name)
+        with col_p2:
+            sort_key = st.selectbox("Sort by", ["cumulative", "tottime", "ncalls"])
+
+        top = pd.DataFrame(profiler.top_functions(selected, sort=sort_key))
+        st.dataframe(
+            top.style.format({"tottime": "{:.4f}", "cumtime": "{:.4f}"}),
+            use_container_width=True,
+        )
+
+        mem_path = selected.with_suffix(".mem.txt")
+        if mem_path.exists():
+            st.markdown("Top Allocations")
+            st.code(mem_path.read_text(), language=None)
+
+rerun_timer.lap("page." + page.lower().replace(" ", "_"))
+
 # Auto-log results
 if st.session_state.game_over and not st.session_state.result_logged:
-    try:
-        log_result_if_needed()
-    except Exception:
-        pass
+    log_result_if_needed()
+rerun_timer.lap("autolog")
+
+if session_store is not None:
+    st.session_state._session_record = session_store.save(
+        st.session_state._session_token, st.session_state, previous=st.session_state.get("_session_record")
+    )
+    rerun_timer.lap("session_store")
+rerun_timer.finish()
+
+# --------------------------
+# Debug timings (opt-in: HANGMAN_DEBUG_METRICS=1 or ?debug=metrics)
+# --------------------------
+if debug_panel is not None:
+    with debug_panel.container():
+        st.markdown("Debug Timings")
+        st.caption(f"This rerun: {sum(t for _, t in rerun_timer.laps) * 1000:.1f} ms")
+        st.caption(
+            f"Analytics backend: {aggregates.get_backend().name}"
+            + (f" ({aggregates.unavailable_reason})" if aggregates.unavailable_reason else "")
+        )
+        bank = wordbank.current()
+        st.caption(
+            f"Word bank: v{bank.version}, {bank.words:,} pack words, "
+            f"{bank.mapped_bytes / 2**20:.1f} MiB mapped + {bank.meta_bytes / 2**10:.0f} KiB metadata"
+            + (f" (watcher: {wordbank.last_error})" if wordbank.last_error else "")
+        )
+        st.dataframe(pd.DataFrame(wordbank.history()), use_container_width=True)
+        st.caption(
+            f"Event log: {events.pending()} buffered"
+            + (f" (last flush failed: {events.last_error})" if events.last_error else "")
+        )
+        st.dataframe(
+            pd.DataFrame(
+                [(name, t * 1000) for name, t in rerun_timer.laps],
+                columns=["Section", "ms"],
+            ),
+            use_container_width=True,
+        )
+        st.dataframe(pd.DataFrame(metrics.snapshot()), use_container_width=True)
+
+metrics.maybe_export()
+
+_profile = st.session_state.pop("_active_profile", None)
+if _profile is not None:
+    _profile.stop()
@@ -0,0 +1,190 @@
+# approx.py
+#
+# Approximate global stats from the constant-size sketches storage keeps on
+# write: a reservoir sample of RESERVOIR_SIZE games and a HyperLogLog of
+# player names. Reads cost the same for a thousand games or a billion, and
+# every estimate carries a 95% confidence interval. HANGMAN_APPROXIMATE=1
+# turns approximate mode on by default for the Leaderboard and Data Export pages.
+# percentile_for() ranks a player against everyone from the quantile buckets.
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+ENABLED = os.environ.get("HANGMAN_APPROXIMATE", "0") == "1"
+
+Z_95 = 1.96
+
+
+class Estimate:
+    """A point estimate with a 95% interval; `exact` when no sampling was involved."""
+
+    def __init__(self, value: float, low: float | None = None, high: float | None = None):
+        self.value = value
+        self.low = value if low is None else low
+        self.high = value if high is None else high
+
+    @property
+    def exact(self) -> bool:
+        return self.low == self.high == self.value
+
+    @property
+    def margin(self) -> float:
+        return (self.high - self.low) / 2
+
+    def __str__(self) -> str:
+        if self.exact:
+            return f"{self.value:,.0f}"
+        return f"≈{self.value:,.0f} ± {self.margin:,.0f}"
+
+
+def hll_estimate(registers: dict, precision: int = storage.HLL_PRECISION) -> float:
+    """HyperLogLog cardinality from {register: rank}, with linear counting for small sets."""
+    m = 1 << precision
+    alpha = 0.7213 / (1 + 1.079 / m)
+    ranks = np.zeros(m)
+    if registers:
+        ranks[list(registers)] = list(registers.values())
+    estimate = alpha * m * m / np.power(2.0, -ranks).sum()
+    zeros = m - len(registers)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return float(estimate)
+
+
+# Whether a larger value is better, per storage.PERCENTILE_METRICS entry.
+HIGHER_IS_BETTER = {"win_rate": True, "avg_attempts": False, "avg_duration": False}
+
+
+def percentile_for(username: str) -> dict:
+    """
+    {metric: top percent} for a player, e.g. {"win_rate": 12.0, ...} for
+    "top 12% by win rate": the share of the other ranked players doing
+    better. Cost depends on the number of sketch buckets, not players; the
+    others in the player's own bucket count as half better. Empty until
+    the player has storage.PERCENTILE_MIN_GAMES games.
+    """
+    ranks = {}
+    for metric, (value, below, same, total) in storage.fetch_percentile_counts(username).items():
+        # The player is one of the `same` players of their own bucket.
+        same, total = max(same - 1, 0), max(total - 1, 0)
+        better = total - below - same if HIGHER_IS_BETTER[metric] else below
+        ranks[metric] = max(1.0, (better + same / 2) / total * 100) if total else 1.0
+    return ranks
+
+
+def _proportion_interval(p: float, k: int, n: int) -> float:
+    """95% half-width of a proportion from a k-of-n sample without replacement."""
+    if k == 0:
+        return 0.0
+    fpc = (n - k) / (n - 1) if n > 1 else 0.0
+    return Z_95 * math.sqrt(p * (1 - p) / k * fpc)
+
+
+def _sample_frame(sample) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(sample, columns=["username", *storage.SAMPLE_COLUMNS[2:]])
+    df["username"] = df["username"].astype("category")
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    return df
+
+
+class Sketches:
+    """One read of the stored sketches, answering every approximate query."""
+
+    def __init__(self):
+        self.seen, sample, self.registers = storage.fetch_sketches()
+        self.sample = _sample_frame(sample)
+
+    @property
+    def scale(self) -> float:
+        """Games represented by each sampled game."""
+        return self.seen / len(self.sample) if len(self.sample) else 0.0
+
+    def total_games(self) -> Estimate:
+        return Estimate(self.seen)
+
+    def unique_players(self) -> Estimate:
+        estimate = hll_estimate(self.registers)
+        margin = Z_95 * 1.04 / math.sqrt(1 << storage.HLL_PRECISION) * estimate
+        return Estimate(estimate, estimate - margin, estimate + margin)
+
+    def total_wins(self) -> Estimate:
+        k = len(self.sample)
+        if k == self.seen:
+            return Estimate(int(self.sample["won"].sum()))
+        p = self.sample["won"].mean()
+        margin = _proportion_interval(p, k, self.seen)
+        return Estimate(p * self.seen, max(0.0, p - margin) * self.seen, min(1.0, p + margin) * self.seen)
+
+    def leaderboard(self) -> pd.DataFrame:
+        """
+        aggregates.leaderboard() columns estimated from the sample, plus
+        `win_rate_margin` (95% half-width, percentage points). Players with
+        few games may be missing from the sample altogether.
+        """
+        df = self.sample
+        if df.empty:
+            return pd.DataFrame()
+        leaderboard = df.groupby("username", observed=True).agg(
+            sampled=("won", "size"),
+            wins=("won", "sum"),
+            avg_attempts=("attempts_used", "mean"),
+            avg_duration=("duration_sec", "mean"),
+        )
+        perfect = (df["won"] == 1) & (df["wrong_guesses"] == 0)
+        perfects = perfect.groupby(df["username"], observed=True).sum()
+        sampled = leaderboard.pop("sampled")
+        p = leaderboard["wins"] / sampled
+        fpc = (self.seen - len(df)) / (self.seen - 1) if self.seen > 1 else 0.0
+
+        leaderboard.insert(0, "games", (sampled * self.scale).round().astype("int64"))
+        leaderboard["wins"] = (leaderboard["wins"] * self.scale).round().astype("int64")
+        leaderboard.insert(2, "perfects", (perfects * self.scale).round().astype("int64"))
+        leaderboard["win_rate"] = p * 100
+        leaderboard["win_rate_margin"] = Z_95 * np.sqrt(p * (1 - p) / sampled * fpc) * 100
+        return leaderboard
+
+    def games_matching(self, players=None, start_ms: int | None = None, end_ms: int | None = None) -> Estimate:
+        """Games by `players` (everyone if None) in [start_ms, end_ms), estimated from the sample."""
+        df = self.sample
+        k = len(df)
+        if k == 0:
+            return Estimate(0)
+        mask = np.ones(k, dtype=bool)
+        if players is not None:
+            mask &= df["username"].isin(players).to_numpy()
+        if start_ms is not None:
+            mask &= (df["timestamp"] >= pd.to_datetime(start_ms, unit="ms")).to_numpy()
+        if end_ms is not None:
+            mask &= (df["timestamp"] < pd.to_datetime(end_ms, unit="ms")).to_numpy()
+        hits = int(mask.sum())
+        if k == self.seen:
+            return Estimate(hits)
+        p = hits / k
+        margin = _proportion_interval(p, k, self.seen)
+        return Estimate(p * self.seen, max(0.0, p - margin) * self.seen, min(1.0, p + margin) * self.seen)
+
+    def win_rate_over_time(self, freq: str = "W") -> pd.DataFrame:
+        """
+        Global win rate per period (pandas `freq`) from the sample: `period`
+        start, estimated `games`, `win_rate` and `win_rate_margin` (95%
+        half-width, percentage points).
+        """
+        df = self.sample
+        if df.empty:
+            return pd.DataFrame(columns=["period", "games", "win_rate", "win_rate_margin"])
+        grouped = df.groupby(df["timestamp"].dt.to_period(freq).dt.start_time)["won"].agg(["size", "mean"])
+        fpc = (self.seen - len(df)) / (self.seen - 1) if self.seen > 1 else 0.0
+        p = grouped["mean"]
+        return pd.DataFrame(
+            {
+                "period": grouped.index,
+                "games": (grouped["size"] * self.scale).round().astype("int64"),
+                "win_rate": p * 100,
+                "win_rate_margin": Z_95 * np.sqrt(p * (1 - p) / grouped["size"] * fpc) * 100,
+            }
+        ).reset_index(drop=True)
@@ -0,0 +1,141 @@
+# archive.py
+#
+# Columnar copy of finished games for analytics. SQLite stays the hot write
+# log; compact() periodically appends games past the watermark to
+# date-partitioned Parquet files and read_games() scans them with column and
+# predicate pushdown. Requires the optional `pyarrow` package.
+
+import datetime
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+import storage
+
+ARCHIVE_DIR = Path(os.environ.get("HANGMAN_ARCHIVE_DIR", Path(__file__).with_name("archive")))
+
+# Id of the last game copied into the archive. Files starting with "_" are
+# ignored by the dataset reader.
+WATERMARK_FILE = "_compacted_through"
+
+if pa is not None:
+    SCHEMA = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("username", pa.string()),
+            ("word", pa.string()),
+            ("word_length", pa.int16()),
+            ("category", pa.string()),
+            ("won", pa.int8()),
+            ("attempts_used", pa.int16()),
+            ("wrong_guesses", pa.int8()),
+            ("max_lives", pa.int8()),
+            ("remaining_lives", pa.int8()),
+            ("duration_sec", pa.float32()),
+            ("timestamp", pa.timestamp("ms")),
+            ("date", pa.string()),
+        ]
+    )
+    PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def available(directory: Path | None = None) -> bool:
+    """True when pyarrow is installed and the archive has been compacted at least once."""
+    return pa is not None and (Path(directory or ARCHIVE_DIR) / WATERMARK_FILE).exists()
+
+
+def watermark(directory: Path | None = None) -> int:
+    path = Path(directory or ARCHIVE_DIR) / WATERMARK_FILE
+    return int(path.read_text()) if path.exists() else 0
+
+
+def _day(ms: int) -> str:
+    return datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def _batches(after_id: int, through_id: int, progress: dict):
+    for chunk in storage.iter_games(after_id=after_id, through_id=through_id):
+        columns = list(zip(*chunk))
+        arrays = [pa.array(values, type=SCHEMA.field(i).type) for i, values in enumerate(columns)]
+        arrays.append(pa.array([_day(ms) for ms in columns[-1]], type=pa.string()))
+        progress["last_id"] = columns[0][-1]
+        progress["rows"] += len(chunk)
+        yield pa.RecordBatch.from_arrays(arrays, schema=SCHEMA)
+
+
+def compact(directory: Path | None = None, until_ms: int | None = None) -> int:
+    """
+    Append games past the watermark and older than `until_ms` (default:
+    start of the current UTC day) to date=YYYY-MM-DD partitions. Returns the
+    number of games written.
+
+    Games are copied by contiguous id range, so the watermark stays exact
+    even if ids and timestamps are not in the same order.
+    """
+    if pa is None:
+        raise RuntimeError("The Parquet archive needs the optional 'pyarrow' package.")
+    directory = Path(directory or ARCHIVE_DIR)
+    if until_ms is None:
+        until_ms = storage.now_ms() // storage.MS_PER_DAY * storage.MS_PER_DAY
+
+    start = watermark(directory)
+    through_id = storage.last_id_before(until_ms, after_id=start)
+    if through_id <= start:
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / WATERMARK_FILE).write_text(str(start))
+        return 0
+
+    progress = {"last_id": start, "rows": 0}
+    ds.write_dataset(
+        _batches(start, through_id, progress),
+        directory,
+        schema=SCHEMA,
+        format="parquet",
+        partitioning=PARTITIONING,
+        # Unique per run; a retried run after a crash overwrites its own files.
+        basename_template=f"part-{start + 1}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / (WATERMARK_FILE + ".tmp")
+    tmp.write_text(str(progress["last_id"]))
+    tmp.replace(directory / WATERMARK_FILE)
+    return progress["rows"]
+
+
+def read_games(
+    directory: Path | None = None,
+    username: str | None = None,
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Archived games matching the filters; only `columns` are read, and the
+    date partitions outside [start_ms, end_ms) are never opened.
+    """
+    dataset = ds.dataset(directory or ARCHIVE_DIR, format="parquet", partitioning=PARTITIONING, schema=SCHEMA)
+    filters = []
+    if username is not None:
+        filters.append(pc.field("username") == username)
+    if start_ms is not None:
+        filters.append(pc.field("date") >= _day(start_ms))
+        filters.append(pc.field("timestamp") >= pa.scalar(start_ms, type=pa.timestamp("ms")))
+    if end_ms is not None:
+        filters.append(pc.field("date") <= _day(end_ms))
+        filters.append(pc.field("timestamp") < pa.scalar(end_ms, type=pa.timestamp("ms")))
+
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+    table = dataset.to_table(columns=columns or list(storage.NAMED_COLUMNS), filter=expression)
+    return table.to_pandas(strings_to_categorical=True)
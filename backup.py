@@ -0,0 +1,158 @@
+# backup.py
+#
+# Online snapshots of the live database (and the cold tier, when there is
+# one). sqlite3's backup API copies the file STEP_PAGES pages at a time and
+# snapshot() sleeps between steps; the source is only read-locked while a
+# step runs, so a writer waits for at most one step instead of a whole file
+# copy. Each copy is integrity-checked, gzip-compressed and written with a
+# sha256sum-compatible checksum file; prune() keeps the newest KEEP per file.
+
+import datetime
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+import metrics
+import storage
+
+BACKUP_DIR = Path(os.environ.get("HANGMAN_BACKUP_DIR", Path(__file__).with_name("backups")))
+KEEP = int(os.environ.get("HANGMAN_BACKUP_KEEP", "7"))  # snapshots kept per database file
+STEP_PAGES = 256  # pages copied per step, i.e. per read lock on the source
+STEP_SLEEP_SEC = 0.05  # pause between steps, when writers get the file to themselves
+# A write through another connection restarts the copy; each restart retries
+# with 4x the pages per step, and after MAX_RESTARTS the copy is one step.
+MAX_RESTARTS = 3
+
+SUFFIX = ".db.gz"
+CHECKSUM_SUFFIX = ".sha256"
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _copy(source: Path, target: Path, pages: int, sleep: float, report: dict):
+    """Back `source` up into `target`, timing each step (the time writers may be held up)."""
+    last = {"remaining": None, "time": time.perf_counter()}
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        step = now - last["time"]
+        metrics.observe("backup.step", step)
+        report["steps"] += 1
+        report["locked_sec"] += step
+        report["longest_step_sec"] = max(report["longest_step_sec"], step)
+        report["pages"] = total
+        if last["remaining"] is not None and remaining > last["remaining"]:
+            raise _Restarted()
+        last["remaining"] = remaining
+        if remaining:
+            time.sleep(sleep)
+        last["time"] = time.perf_counter()
+
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+        src.backup(dst, pages=pages, progress=progress)
+
+
+def _compress(path: Path, out: Path) -> str:
+    """gzip `path` into `out` (via a temporary name) and return the sha256 of `out`."""
+    digest = hashlib.sha256()
+    tmp = out.with_name(out.name + ".tmp")
+    with open(path, "rb") as f, open(tmp, "wb") as raw:
+        with gzip.GzipFile(filename=path.name, mode="wb", fileobj=raw, mtime=0) as gz:
+            shutil.copyfileobj(f, gz, 1 << 20)
+    with open(tmp, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    tmp.replace(out)
+    return digest.hexdigest()
+
+
+def snapshot(source: Path | None = None, directory: Path | None = None,
+             pages: int = STEP_PAGES, sleep: float = STEP_SLEEP_SEC) -> dict:
+    """
+    Write a compressed, checksummed snapshot of `source` (default: the live
+    database) to `directory` and return a report: the snapshot path, pages,
+    steps, restarts, total and longest time the source was read-locked, and
+    sizes before and after compression.
+    """
+    source = Path(source or storage.DB_PATH)
+    directory = Path(directory or BACKUP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    out = directory / f"{source.stem}-{stamp}{SUFFIX}"
+    copy = directory / f".{out.name}.db"
+
+    report = {"source": str(source), "path": str(out), "pages": 0, "steps": 0, "restarts": 0,
+              "locked_sec": 0.0, "longest_step_sec": 0.0, "single_step": False}
+    start = time.perf_counter()
+    try:
+        while True:
+            single_step = report["restarts"] >= MAX_RESTARTS
+            try:
+                _copy(source, copy, -1 if single_step else pages, sleep, report)
+                break
+            except _Restarted:
+                report["restarts"] += 1
+                pages *= 4
+        report["single_step"] = single_step
+        with closing(sqlite3.connect(copy)) as conn:
+            check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"snapshot of {source} failed quick_check: {check}")
+        report["bytes"] = copy.stat().st_size
+        checksum = _compress(copy, out)
+    finally:
+        copy.unlink(missing_ok=True)
+
+    # sha256sum -c format, so a snapshot can be verified without this module.
+    (directory / (out.name + CHECKSUM_SUFFIX)).write_text(f"{checksum}  {out.name}\n")
+    report.update(sha256=checksum, compressed_bytes=out.stat().st_size, seconds=time.perf_counter() - start)
+    metrics.observe("backup.snapshot", report["seconds"])
+    return report
+
+
+def snapshots(directory: Path | None = None, stem: str | None = None) -> list[Path]:
+    """Snapshot files in `directory` (only those of `stem` if given), oldest first."""
+    pattern = f"{stem}-*{SUFFIX}" if stem else f"*{SUFFIX}"
+    return sorted(Path(directory or BACKUP_DIR).glob(pattern))
+
+
+def verify(path) -> bool:
+    """True when the snapshot still matches its checksum file."""
+    path = Path(path)
+    checksum_file = path.with_name(path.name + CHECKSUM_SUFFIX)
+    if not checksum_file.exists():
+        return False
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return checksum_file.read_text().split()[0] == digest.hexdigest()
+
+
+def prune(stem: str, directory: Path | None = None, keep: int = KEEP) -> list[Path]:
+    """Delete all but the newest `keep` snapshots of `stem`; returns the deleted files."""
+    old = snapshots(directory, stem)[:-keep] if keep > 0 else []
+    for path in old:
+        path.unlink(missing_ok=True)
+        path.with_name(path.name + CHECKSUM_SUFFIX).unlink(missing_ok=True)
+    return old
+
+
+def run(directory: Path | None = None, keep: int = KEEP, **options) -> list[dict]:
+    """Snapshot the live database and the cold tier (if it exists), then apply retention."""
+    sources = [Path(storage.DB_PATH)]
+    if storage.cold_db_path().exists():
+        sources.append(storage.cold_db_path())
+    reports = []
+    for source in sources:
+        report = snapshot(source, directory, **options)
+        report["pruned"] = len(prune(source.stem, directory, keep))
+        reports.append(report)
+    return reports
@@ -0,0 +1,482 @@
+"""
+Storage and analytics benchmarks.
+
+Run one benchmark per invocation, e.g.:
+
+    python bench.py dictionary --rows 1000000
+
+Every benchmark works on throwaway databases in a temporary directory and
+never touches hangman_scores.db.
+"""
+
+import argparse
+import pickle
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+import adaptive
+import aggregates
+import analytics
+import approx
+import archive
+import backup
+import events
+import sessions
+import storage
+import transfer
+from hangman_words import word_list
+
+CATEGORIES = ["Programming", "Technology", "Science", "General", "All Categories"]
+
+
+@contextmanager
+def stopwatch(label: str, results: dict):
+    start = time.perf_counter()
+    yield
+    results[label] = time.perf_counter() - start
+
+
+def synthetic_games(rows: int, players: int = 5000, seed: int = 7):
+    """Yield (username, word, category, won, attempts, wrong, max_lives, remaining, duration, ts_ms)."""
+    rng = random.Random(seed)
+    start_ms = storage.now_ms() - 365 * 86_400_000
+    for i in range(rows):
+        max_lives = rng.choice((4, 6, 8))
+        wrong = rng.randint(0, max_lives)
+        won = int(wrong < max_lives)
+        yield (
+            f"player{rng.randrange(players)}",
+            rng.choice(word_list),
+            rng.choice(CATEGORIES),
+            won,
+            wrong + rng.randint(3, 10),
+            wrong,
+            max_lives,
+            max_lives - wrong,
+            rng.uniform(5, 300),
+            start_ms + i * 30_000,
+        )
+
+
+@contextmanager
+def temp_database(directory: Path, name: str):
+    """Point storage at a fresh database file for the duration of the block."""
+    previous = storage.DB_PATH
+    storage.DB_PATH = directory / name
+    try:
+        storage.init_db()
+        yield storage.DB_PATH
+    finally:
+        storage.DB_PATH = previous
+
+
+def populate(rows: int):
+    """Bulk-insert synthetic games into the current storage.DB_PATH."""
+    with closing(sqlite3.connect(storage.DB_PATH)) as conn:
+        ids = {}
+
+        def lookup(table, column, value, **extra):
+            key = (table, value)
+            if key not in ids:
+                ids[key] = storage._lookup_id(conn, table, column, value, **extra)
+            return ids[key]
+
+        conn.executemany(
+            """
+            INSERT INTO games (
+                player_id, word_id, category_id, won,
+                attempts_used, wrong_guesses,
+                max_lives, remaining_lives, duration_sec, timestamp
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    lookup("players", "name", g[0]),
+                    lookup("words", "word", g[1], length=len(g[1])),
+                    lookup("categories", "name", g[2]),
+                    *g[3:],
+                )
+                for g in synthetic_games(rows)
+            ),
+        )
+        conn.commit()
+
+
+def leaderboard(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby("username", observed=True).agg(
+        games=("id", "count"),
+        wins=("won", "sum"),
+        avg_attempts=("attempts_used", "mean"),
+        avg_duration=("duration_sec", "mean"),
+    )
+
+
+def bench_dictionary(args, workdir: Path):
+    """Plain-string games table vs dictionary-encoded layout."""
+    results = {}
+
+    plain = workdir / "plain.db"
+    with closing(sqlite3.connect(plain)) as conn:
+        conn.execute(
+            """
+            CREATE TABLE games (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT, word TEXT, word_length INTEGER NOT NULL,
+                category TEXT, won INTEGER NOT NULL,
+                attempts_used INTEGER, wrong_guesses INTEGER,
+                max_lives INTEGER, remaining_lives INTEGER,
+                duration_sec REAL, timestamp INTEGER NOT NULL
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO games (username, word, word_length, category, won, attempts_used, wrong_guesses,"
+            " max_lives, remaining_lives, duration_sec, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((g[0], g[1], len(g[1]), *g[2:]) for g in synthetic_games(args.rows)),
+        )
+        conn.execute("CREATE INDEX idx_games_username_timestamp ON games (username, timestamp)")
+        conn.commit()
+        with stopwatch("plain load", results):
+            conn.row_factory = sqlite3.Row
+            plain_df = pd.DataFrame([dict(r) for r in conn.execute("SELECT * FROM games ORDER BY timestamp")])
+            plain_df["timestamp"] = pd.to_datetime(plain_df["timestamp"], unit="ms")
+    with stopwatch("plain groupby", results):
+        leaderboard(plain_df)
+
+    with temp_database(workdir, "encoded.db") as encoded:
+        populate(args.rows)
+        with stopwatch("encoded load", results):
+            encoded_df = analytics.load_games_df()
+        with stopwatch("encoded groupby", results):
+            leaderboard(encoded_df)
+
+    print(f"rows: {args.rows:,}")
+    print(f"db size      plain {plain.stat().st_size / 2**20:8.1f} MiB   encoded {encoded.stat().st_size / 2**20:8.1f} MiB")
+    print(f"frame memory plain {plain_df.memory_usage(deep=True).sum() / 2**20:8.1f} MiB   "
+          f"encoded {encoded_df.memory_usage(deep=True).sum() / 2**20:8.1f} MiB")
+    for label, seconds in results.items():
+        print(f"{label:<16} {seconds * 1000:10.1f} ms")
+
+
+def bench_memory(args, workdir: Path):
+    """Per-session DataFrame footprint: default dtypes vs load_games_df."""
+    with temp_database(workdir, "memory.db"):
+        populate(args.rows)
+        compact = analytics.load_games_df()
+
+    # What the loader used to produce: int64 / float64 / object columns.
+    default = compact.astype(
+        {
+            col: "object" if isinstance(dtype, pd.CategoricalDtype) else "float64" if dtype.kind == "f" else "int64"
+            for col, dtype in compact.dtypes.items()
+            if col != "timestamp"
+        }
+    )
+    before = default.memory_usage(deep=True, index=False)
+    after = compact.memory_usage(deep=True, index=False)
+
+    print(f"rows: {args.rows:,}")
+    print(f"{'column':<16} {'default':>12} {'compact':>12}  dtype")
+    for col in compact.columns:
+        print(f"{col:<16} {before[col] / 2**20:9.1f} MiB {after[col] / 2**20:9.1f} MiB  {compact[col].dtype}")
+    print(f"{'total':<16} {before.sum() / 2**20:9.1f} MiB {after.sum() / 2**20:9.1f} MiB")
+
+
+def bench_archive(args, workdir: Path):
+    """Full SQLite load vs Parquet archive scans with column / predicate pushdown."""
+    archive.ARCHIVE_DIR = workdir / "archive"
+    results = {}
+    with temp_database(workdir, "archive.db"):
+        populate(args.rows)
+        with stopwatch("compact", results):
+            archive.compact(archive.ARCHIVE_DIR)
+
+        start_ms, end_ms = storage.games_time_range()
+        month_ms = end_ms - 30 * storage.MS_PER_DAY
+        columns = ["id", "username", "won", "wrong_guesses", "attempts_used", "duration_sec"]
+
+        with stopwatch("sqlite full load", results):
+            analytics._from_sqlite()
+        with stopwatch("sqlite one player", results):
+            analytics._from_sqlite(username="player42")
+        with stopwatch("parquet leaderboard cols", results):
+            analytics._from_archive(columns=columns)
+        with stopwatch("parquet one player", results):
+            analytics._from_archive(username="player42")
+        with stopwatch("parquet last 30 days", results):
+            analytics._from_archive(start_ms=month_ms)
+
+    size = sum(p.stat().st_size for p in archive.ARCHIVE_DIR.rglob("*.parquet"))
+    print(f"rows: {args.rows:,}   archive size: {size / 2**20:.1f} MiB")
+    for label, seconds in results.items():
+        print(f"{label:<26} {seconds * 1000:10.1f} ms")
+
+
+def _duckdb_for_bench():
+    """
+    A DuckDB connection exposing the games tables as `h`: the SQLite file
+    attached when the sqlite extension is available, otherwise native copies
+    of the tables (labelled as such in the output).
+    """
+    import duckdb
+
+    aggregates._duckdb_conn, aggregates.unavailable_reason = None, None
+    conn = aggregates._connect_duckdb()
+    if conn is not None:
+        return conn, "attached sqlite"
+    conn = duckdb.connect()
+    conn.execute("ATTACH ':memory:' AS h")
+    with closing(sqlite3.connect(storage.DB_PATH)) as src:
+        for table in ("games", "players", "words", "categories", "player_stats"):
+            frame = pd.read_sql_query(f"SELECT * FROM {table}", src)
+            conn.register("frame", frame)
+            conn.execute(f"CREATE TABLE h.{table} AS SELECT * FROM frame")
+            conn.unregister("frame")
+    return conn, f"native copy; {aggregates.unavailable_reason}"
+
+
+def bench_duckdb(args, workdir: Path):
+    """pandas vs DuckDB for the leaderboard and per-player aggregations."""
+    with temp_database(workdir, "duckdb.db"):
+        populate(args.rows)
+        storage.rebuild_sketches()  # fills player_stats, which the leaderboard reads
+        conn, mode = _duckdb_for_bench()
+        player = "player42"
+        backends = [aggregates.PandasBackend, lambda: aggregates.DuckDBBackend(conn)]
+        results, outputs = {}, {}
+        for make in backends:
+            backend = make()
+            with stopwatch(f"{backend.name:<7} leaderboard", results):
+                outputs[backend.name, "leaderboard"] = backend.leaderboard()
+            backend = make()
+            with stopwatch(f"{backend.name:<7} per-player (3 aggs)", results):
+                outputs[backend.name, "category"] = backend.category_stats(player)
+                outputs[backend.name, "length"] = backend.length_win_rate(player)
+                backend.difficulty_recommendation(player)
+
+    pd.testing.assert_frame_equal(
+        outputs["pandas", "leaderboard"][["games", "wins", "perfects"]].astype("int64").set_axis(
+            outputs["pandas", "leaderboard"].index.astype(str)
+        ).sort_index(),
+        outputs["duckdb", "leaderboard"][["games", "wins", "perfects"]].astype("int64").sort_index(),
+        check_names=False,
+        check_index_type=False,
+    )
+    print(f"rows: {args.rows:,}   duckdb source: {mode}   (results match)")
+    for label, seconds in results.items():
+        print(f"{label:<28} {seconds * 1000:10.1f} ms")
+
+
+def bench_approx(args, workdir: Path):
+    """Exact Data Export summary / leaderboard vs the reservoir sample and HyperLogLog."""
+    results = {}
+    with temp_database(workdir, "approx.db"):
+        populate(args.rows)
+        with stopwatch("rebuild sketches", results):
+            storage.rebuild_sketches()
+
+        with stopwatch("exact summary + leaderboard", results):
+            df = analytics.load_games_df(columns=aggregates.LEADERBOARD_COLUMNS)
+            exact = [len(df), df["username"].nunique(), int(df["won"].sum())]
+            leaderboard(df)
+        with stopwatch("approx summary + leaderboard", results):
+            sketches = approx.Sketches()
+            estimates = [sketches.total_games(), sketches.unique_players(), sketches.total_wins()]
+            sketches.leaderboard()
+
+    print(f"rows: {args.rows:,}   sample: {len(sketches.sample):,}")
+    for label, value, estimate in zip(("total games", "unique players", "total wins"), exact, estimates):
+        inside = estimate.low <= value <= estimate.high
+        print(f"{label:<16} exact {value:>12,}   approx {str(estimate):>22}   {'in' if inside else 'OUTSIDE'} 95% CI")
+    for label, seconds in results.items():
+        print(f"{label:<30} {seconds * 1000:10.1f} ms")
+
+
+def bench_adaptive(args, workdir: Path):
+    """Adaptive word picks on the bundled bank and on synthetic banks of --rows words."""
+    rng = random.Random(7)
+    with temp_database(workdir, "adaptive.db"):
+        populate(min(args.rows, 100_000))
+        storage.rebuild_rollups()  # populate() skips the write hooks that keep user_features
+        features = storage.fetch_user_features("player42")
+
+    banks = {"bundled": word_list, "synthetic": [
+        "".join(rng.choice(storage.LETTERS) for _ in range(rng.randint(3, 15))) for _ in range(args.rows)
+    ]}
+    for name, words in banks.items():
+        results = {}
+        with stopwatch("build matrix", results):
+            matrix = adaptive.WordMatrix(tuple(words))
+        picks = 200
+        with stopwatch("pick", results):
+            for _ in range(picks):
+                adaptive.pick_word(features, matrix, exclude=[words[0]], rng=rng)
+        print(f"{name:<10} {len(words):>9,} words   matrix {results['build matrix'] * 1000:8.1f} ms   "
+              f"pick {results['pick'] / picks * 1000:8.3f} ms")
+
+
+def bench_events(args, workdir: Path):
+    """Event log: batched append throughput, bytes per event, full scan and per-letter effectiveness."""
+    rng = random.Random(7)
+    words = word_list[:2000]
+    rows, ts, game = [], 1_700_000_000_000, 0
+    while len(rows) < args.rows:
+        game += 1
+        word, lives = rng.choice(words), 6
+        player = f"player{rng.randrange(5000)}"
+        rows.append((game, ts, player, word, events.START, None, 0, lives))
+        for letter in rng.sample(storage.LETTERS, rng.randint(4, 14)):
+            ts += rng.randint(500, 8000)
+            hit = letter in word
+            lives -= not hit
+            rows.append((game, ts, player, word, events.GUESS, letter, hit, lives))
+    rows = rows[:args.rows]
+
+    results = {}
+    with temp_database(workdir, "events.db"):
+        with stopwatch("append", results):
+            for start in range(0, len(rows), events.BATCH_SIZE):
+                storage.append_events(rows[start:start + events.BATCH_SIZE])
+        size = (workdir / "events.db").stat().st_size
+        with stopwatch("fetch", results):
+            _, loaded = storage.fetch_events()
+        with stopwatch("fetch_player", results):
+            storage.fetch_events(rows[0][2])
+        with stopwatch("effectiveness", results):
+            events.letter_effectiveness(loaded)
+        with stopwatch("replay", results):
+            events.replay(loaded, 1, rows[0][3])
+
+    print(f"{len(rows):,} events, {size / len(rows):.1f} bytes each on disk "
+          f"(vs {storage.EVENT_DTYPE.itemsize} raw)")
+    for label in ("append", "fetch", "effectiveness"):
+        print(f"{label:<14} {results[label] * 1000:10.1f} ms   {len(rows) / results[label]:12,.0f} events/s")
+    print(f"{'fetch_player':<14} {results['fetch_player'] * 1000:10.1f} ms   (one player's batches only)")
+    print(f"{'replay':<14} {results['replay'] * 1000:10.1f} ms   (one game, scanning all events)")
+
+
+def bench_sessions(args, workdir: Path):
+    """Per-guess save / restore latency of the external session store, record vs pickled state."""
+    store = sessions.SessionStore(workdir / "sessions.db")
+    rng = random.Random(7)
+    queue = sessions.shuffled(word_list, 1234)
+    sessions_n = min(args.rows, 10_000)
+    state = dict(
+        username="player42", difficulty="Medium", word_category="All Categories", game_active=True,
+        max_lives=6, current_streak=3, best_streak=9, word_queue=queue, word_queue_seed=1234,
+        word_queue_category="All Categories", last_word=queue[1], hint="Starts with P", adaptive_words=False,
+    )
+    results = {}
+    saves = []
+    with stopwatch("save", results):
+        for i in range(sessions_n):
+            word = queue[i % len(queue)]
+            state.update(secret_word=word, guessed_letters=set(), remaining_lives=6, attempts=0, start_time=time.time())
+            for letter in rng.sample(storage.LETTERS, 8):  # one save per guess
+                state["guessed_letters"].add(letter)
+                state["attempts"] += 1
+                start = time.perf_counter()
+                store.save(f"session{i}", state)
+                saves.append(time.perf_counter() - start)
+    loads = []
+    with stopwatch("load", results):
+        for i in rng.sample(range(sessions_n), min(sessions_n, 2000)):
+            start = time.perf_counter()
+            store.load(f"session{i}")
+            loads.append(time.perf_counter() - start)
+
+    pickled = len(pickle.dumps({**state, "display_word": list(state["secret_word"])}))
+    for label, times in (("save", saves), ("load", loads)):
+        times.sort()
+        print(f"{label:<5} {len(times):>9,} ops   p50 {times[len(times) // 2] * 1000:7.3f} ms   "
+              f"p99 {times[int(len(times) * 0.99)] * 1000:7.3f} ms")
+    print(f"record {sessions.RECORD.size} bytes vs {pickled:,} bytes pickled (word queue as seed + count); "
+          f"store {(workdir / 'sessions.db').stat().st_size / 2**20:.1f} MiB for {sessions_n:,} sessions")
+
+
+def bench_backup(args, workdir: Path):
+    """Writer latency while snapshotting: one-step backup vs page steps with sleeps."""
+    with temp_database(workdir, "backup.db"):
+        populate(args.rows)
+        for label, pages in (("one step", -1), (f"{backup.STEP_PAGES} pages", backup.STEP_PAGES)):
+            stop, waits = threading.Event(), []
+
+            def writer():
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    storage.log_game("bench", "python", True, 5, 1, 6, 5, 12.0, "Programming")
+                    waits.append(time.perf_counter() - start)
+                    time.sleep(0.05)
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            report = backup.snapshot(directory=workdir / "backups", pages=pages)
+            stop.set()
+            thread.join()
+            waits.sort()
+            print(f"{label:<10} {report['seconds']:7.2f} s   {report['steps']:>5} steps   "
+                  f"{report['restarts']} restarts   source locked {report['locked_sec'] * 1000:8.1f} ms "
+                  f"(longest {report['longest_step_sec'] * 1000:6.1f} ms)   "
+                  f"writes {len(waits):>5}, p99 {waits[int(len(waits) * 0.99)] * 1000:7.1f} ms, "
+                  f"max {waits[-1] * 1000:7.1f} ms")
+        print(f"{report['bytes'] / 2**20:.1f} MiB -> {report['compressed_bytes'] / 2**20:.1f} MiB compressed")
+
+
+def bench_import(args, workdir: Path):
+    """Bulk import of Data Export files (CSV / JSONL / Parquet) into an empty and an already-loaded database."""
+    with temp_database(workdir, "source.db"):
+        populate(args.rows)
+        with closing(sqlite3.connect(storage.DB_PATH)) as conn:
+            conn.execute("UPDATE games SET uuid = randomblob(16)")  # as log_game would have
+            conn.commit()
+        exported = transfer.with_uuids(analytics.load_games_df())
+    files = {"csv": workdir / "games.csv", "jsonl": workdir / "games.jsonl"}
+    files["csv"].write_text(transfer.to_csv(exported))
+    files["jsonl"].write_text(transfer.to_jsonl(exported))
+    if transfer.pq is not None:
+        files["parquet"] = workdir / "games.parquet"
+        files["parquet"].write_bytes(transfer.to_parquet(exported))
+
+    for fmt, path in files.items():
+        with temp_database(workdir, f"import_{fmt}.db"):
+            for label in ("empty", "again"):  # the second pass finds every game already stored
+                start = time.perf_counter()
+                result = transfer.import_file(path)
+                seconds = time.perf_counter() - start
+                print(f"{fmt:<8} {label:<6} {seconds:7.2f} s   {result['read'] / seconds:12,.0f} rows/s   "
+                      f"{result['inserted']:>10,} inserted   {result['duplicates']:>10,} duplicates")
+
+
+BENCHMARKS = {
+    "adaptive": bench_adaptive,
+    "approx": bench_approx,
+    "backup": bench_backup,
+    "duckdb": bench_duckdb,
+    "events": bench_events,
+    "import": bench_import,
+    "archive": bench_archive,
+    "dictionary": bench_dictionary,
+    "memory": bench_memory,
+    "sessions": bench_sessions,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        BENCHMARKS[args.benchmark](args, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# events.py
+#
+# Per-guess event log: game starts, guesses, hint purchases and give-ups.
+# record() only appends a tuple to an in-process buffer, so the click path
+# never touches the database; a daemon thread writes the buffer as one
+# compressed batch (storage.append_events) every FLUSH_INTERVAL_SEC, or
+# sooner once BATCH_SIZE events are waiting. load() keeps each player's
+# decoded events and only reads the batches written since. The readers below
+# work on the storage.EVENT_DTYPE arrays that storage.fetch_events returns.
+
+import atexit
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import storage
+
+START, GUESS, HINT, GIVE_UP = 0, 1, 2, 3
+KIND_NAMES = {START: "start", GUESS: "guess", HINT: "hint", GIVE_UP: "give up"}
+
+FLUSH_INTERVAL_SEC = float(os.environ.get("HANGMAN_EVENT_FLUSH_SEC", "2"))
+BATCH_SIZE = 5000  # flush early once this many events are buffered
+CACHED_PLAYERS = 64  # players whose decoded events load() keeps
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()  # one writer at a time, so batches stay in order
+_wake = threading.Event()
+_buffer: list[tuple] = []
+_writer: threading.Thread | None = None
+last_error: str | None = None  # why the latest flush failed, if it did
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[tuple, tuple[int, np.ndarray]]" = OrderedDict()  # (db, player) -> (last batch id, events)
+
+
+def game_key(game_uuid: str | None) -> int:
+    """The 63-bit event-log key of a game: the top bits of its UUID (0 without one)."""
+    return uuid.UUID(game_uuid).int >> 65 if game_uuid else 0
+
+
+def record(kind: int, state, letter: str | None = None, hit: bool = False):
+    """Buffer one event for the game in `state` (st.session_state or a dict)."""
+    global _writer
+    event = (
+        game_key(state.get("game_uuid")),
+        storage.now_ms(),
+        state.get("username") or "",
+        state.get("secret_word") or "",
+        kind,
+        letter,
+        1 if hit else 0,
+        state.get("remaining_lives") or 0,
+    )
+    with _lock:
+        _buffer.append(event)
+        pending = len(_buffer)
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="event-writer", daemon=True)
+            _writer.start()
+    if pending >= BATCH_SIZE:
+        _wake.set()
+
+
+def flush() -> int:
+    """Write every buffered event now; returns how many were written."""
+    global last_error
+    with _flush_lock:
+        with _lock:
+            rows = _buffer[:]
+            del _buffer[:]
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        try:
+            written = storage.append_events(rows)
+        except Exception as exc:  # keep the events for the next attempt
+            last_error = f"{type(exc).__name__}: {exc}"
+            with _lock:
+                _buffer[:0] = rows
+            return 0
+        last_error = None
+        metrics.observe("events.flush", time.perf_counter() - start)
+        return written
+
+
+def pending() -> int:
+    with _lock:
+        return len(_buffer)
+
+
+def _write_loop():
+    while True:
+        _wake.wait(FLUSH_INTERVAL_SEC)
+        _wake.clear()
+        flush()
+
+
+atexit.register(flush)
+
+
+def load(username: str) -> np.ndarray:
+    """
+    A player's logged events, see storage.fetch_events. Buffered events are
+    not flushed here, on the script thread; the writer is only woken, and
+    they show up on a later call.
+    """
+    if pending():
+        _wake.set()
+    key = (str(storage.DB_PATH), username)
+    with _cache_lock:
+        last_batch, cached = _cache.get(key, (0, None))
+    last_batch, new = storage.fetch_events(username, after_batch=last_batch)
+    events = new if cached is None else np.concatenate([cached, new]) if len(new) else cached
+    with _cache_lock:
+        if key not in _cache or _cache[key][0] <= last_batch:  # a concurrent load may have got further
+            _cache[key] = (last_batch, events)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHED_PLAYERS:
+            _cache.popitem(last=False)
+    return events
+
+
+def games(events: np.ndarray) -> pd.DataFrame:
+    """One row per game key: word id, start / end time, events and guesses, newest first."""
+    if not len(events):
+        return pd.DataFrame(columns=["game", "word", "start", "end", "events", "guesses"])
+    df = pd.DataFrame({
+        "game": events["game"],
+        "word": events["word"],
+        "ts": events["ts"],
+        "guess": events["kind"] == GUESS,
+    })
+    out = df.groupby("game").agg(
+        word=("word", "first"), start=("ts", "min"), end=("ts", "max"), events=("ts", "size"), guesses=("guess", "sum")
+    )
+    return out.reset_index().sort_values("start", ascending=False, ignore_index=True)
+
+
+def replay(events: np.ndarray, game: int, word: str) -> pd.DataFrame:
+    """The steps of one game in order, with the board as it looked after each."""
+    steps = events[events["game"] == game]
+    steps = steps[np.argsort(steps["ts"], kind="stable")]
+    rows, revealed = [], set()
+    start = int(steps["ts"][0]) if len(steps) else 0
+    for event in steps:
+        letter = storage.LETTERS[event["letter"]] if event["letter"] != storage.NO_LETTER else ""
+        if event["kind"] == GUESS:
+            revealed.add(letter)
+        rows.append({
+            "seconds": (int(event["ts"]) - start) / 1000,
+            "event": KIND_NAMES.get(int(event["kind"]), "?"),
+            "letter": letter.upper(),
+            "hit": bool(event["hit"]) if event["kind"] == GUESS else None,
+            "lives": int(event["lives"]),
+            "board": " ".join(c.upper() if c in revealed else "_" for c in word),
+        })
+    return pd.DataFrame(rows, columns=["seconds", "event", "letter", "hit", "lives", "board"])
+
+
+def letter_effectiveness(events: np.ndarray) -> pd.DataFrame:
+    """
+    Per-letter guess stats over any number of events, without a Python loop
+    per event: guesses, hits, hit rate, the average guess number at which
+    the letter was tried and the average seconds since the previous event
+    of the same game.
+    """
+    order = np.lexsort((events["ts"], events["game"]))
+    ev = events[order]
+    n = len(ev)
+    new_game = np.ones(n, dtype=bool)
+    new_game[1:] = ev["game"][1:] != ev["game"][:-1]
+
+    # Guess number within the game: running guess count minus the count at the game's start.
+    is_guess = ev["kind"] == GUESS
+    guess_count = np.cumsum(is_guess)
+    game_start = np.maximum.accumulate(np.where(new_game, np.arange(n), 0))
+    before_game = guess_count[game_start] - is_guess[game_start]
+    guess_number = guess_count - before_game
+
+    think = np.zeros(n)
+    think[1:] = (ev["ts"][1:] - ev["ts"][:-1]) / 1000
+    timed = is_guess & ~new_game
+
+    letters = ev["letter"][is_guess].astype(np.intp)
+    size = len(storage.LETTERS)
+    guesses = np.bincount(letters, minlength=size)
+    hits = np.bincount(letters, weights=ev["hit"][is_guess], minlength=size)
+    number_sum = np.bincount(letters, weights=guess_number[is_guess], minlength=size)
+    timed_letters = ev["letter"][timed].astype(np.intp)
+    think_sum = np.bincount(timed_letters, weights=think[timed], minlength=size)
+    think_count = np.bincount(timed_letters, minlength=size)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame(
+            {
+                "guesses": guesses[:size],
+                "hits": hits[:size].astype(np.int64),
+                "hit_rate": hits[:size] / guesses[:size],
+                "mean_guess_number": number_sum[:size] / guesses[:size],
+                "mean_think_sec": think_sum[:size] / think_count[:size],
+            },
+            index=pd.Index(list(storage.LETTERS), name="letter"),
+        )
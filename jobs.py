@@ -0,0 +1,165 @@
+# jobs.py
+#
+# Heavy aggregations and rebuilds run in a process pool shared by every
+# Streamlit session, so the script thread only renders. The pool lives in a
+# separate job host process (jobs_worker.py). Identical requests (same job,
+# arguments and data version) share one Job, whether still running or
+# recently finished. HANGMAN_WORKERS=0 runs jobs inline instead.
+
+import os
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+
+WORKERS = int(os.environ.get("HANGMAN_WORKERS", "2"))
+MAX_RESULTS = 64  # finished jobs kept for other sessions asking the same thing
+POLL_INTERVAL_SEC = 0.5
+
+_lock = threading.Lock()  # guards _jobs
+_pool_lock = threading.Lock()  # guards starting the job host
+_host = None  # proxy of jobs_worker.JobHost
+_host_process: subprocess.Popen | None = None
+_jobs: "OrderedDict[tuple, Job]" = OrderedDict()
+
+
+class Job:
+    """A job in the pool (or run inline), polled through the job host until it finishes."""
+
+    def __init__(self, key: tuple, state: tuple | None = None):
+        self.key = key
+        self._state = state  # (done, progress, result, error), kept once done
+
+    def _poll(self) -> tuple:
+        if self._state is None or not self._state[0]:
+            self._state = _host.poll(self.key)
+        return self._state
+
+    def done(self) -> bool:
+        return self._poll()[0]
+
+    def result(self):
+        done, _, result, error = self._poll()
+        if error is not None:
+            raise error
+        return result
+
+    def error(self) -> BaseException | None:
+        """The exception a finished job raised, or None."""
+        return self._poll()[3]
+
+    def progress(self) -> float:
+        return self._poll()[1]
+
+
+class _HostManager(BaseManager):
+    pass
+
+
+_HostManager.register("host")
+
+
+def _pool():
+    """
+    Proxy of the job host, started on first use under its own lock, so a
+    session starting it never holds up submit / evict in other sessions.
+    The host is a separate `python -m jobs_worker` process: its workers
+    import jobs_worker as __main__, never app.py.
+    """
+    global _host, _host_process
+    if _host is None:
+        with _pool_lock:
+            if _host is None:
+                authkey = os.urandom(32)
+                # stdin stays open for the life of this process; the host exits at EOF.
+                _host_process = subprocess.Popen(
+                    [sys.executable, "-m", "jobs_worker", str(WORKERS)],
+                    cwd=Path(__file__).resolve().parent, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                )
+                _host_process.stdin.write(authkey.hex() + "\n")
+                _host_process.stdin.flush()
+                port = int(_host_process.stdout.readline())
+                manager = _HostManager(address=("127.0.0.1", port), authkey=authkey)
+                manager.connect()
+                _host = manager.host()
+    return _host
+
+
+def _forget(key: tuple):
+    if _host is not None:
+        _host.forget(key)
+
+
+def evict(job: Job):
+    """Forget a job's result, so the next identical submit runs it again."""
+    with _lock:
+        if _jobs.get(job.key) is job:
+            del _jobs[job.key]
+            _forget(job.key)
+
+
+def submit(fn, *args) -> Job:
+    """
+    Run `fn(progress, key, *args)` in the pool, or join the identical job
+    already running / recently finished. `fn` must be a function of this
+    module; `args` must be picklable and should include whatever identifies
+    the data version.
+    """
+    key = (fn.__name__, *args)
+    host = _pool() if WORKERS > 0 else None
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and not (job.done() and job.error() is not None):
+            _jobs.move_to_end(key)
+            return job
+
+        if host is None:
+            try:
+                job = Job(key, (True, 1.0, fn({}, key, *args), None))
+            except Exception as exc:
+                job = Job(key, (True, 1.0, None, exc))
+        else:
+            _forget(key)  # a failed run of the same key
+            host.submit(key, fn.__name__, args)
+            job = Job(key)
+
+        _jobs[key] = job
+        while len(_jobs) > MAX_RESULTS:
+            oldest, old = next(iter(_jobs.items()))
+            if not old.done():
+                break
+            del _jobs[oldest]
+            _forget(oldest)
+        return job
+
+
+# --------------------------
+# Job functions (run in worker processes)
+# --------------------------
+def _use_db(db_path: str):
+    import storage
+
+    storage.DB_PATH = db_path
+
+
+def letter_heatmap_job(progress, key, db_path: str, username: str, version: int):
+    import analytics
+
+    _use_db(db_path)
+    games = analytics.load_games_df(username=username, columns=["word", "won"])
+    progress[key] = 0.5
+    return analytics.letter_heatmap(games, progress=lambda f: progress.__setitem__(key, 0.5 + f / 2))
+
+
+REBUILDS = ("rollups", "sketches", "ratings")
+
+
+def rebuild_job(progress, key, db_path: str, name: str, version: int):
+    """storage.rebuild_<name>() for the Rebuild buttons; `version` is storage.latest_game_id()."""
+    import storage
+
+    _use_db(db_path)
+    getattr(storage, f"rebuild_{name}")()
+    return name
@@ -0,0 +1,82 @@
+# jobs_worker.py
+#
+# The job host: a process jobs.py starts with `python -m jobs_worker WORKERS`
+# and talks to through a multiprocessing manager on a loopback port. It owns
+# the process pool, so spawned workers re-import this module as their
+# __main__ rather than the app's (app.py under Streamlit). The host reads its
+# authkey from stdin, prints its port, and exits when stdin closes, i.e. when
+# the app process goes away.
+
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import BaseManager
+
+import jobs
+
+
+class JobHost:
+    """The pool and its jobs by key; called through a manager proxy, from many threads."""
+
+    def __init__(self, workers: int):
+        # The manager serves each connection on a thread, so avoid fork().
+        ctx = multiprocessing.get_context("spawn")
+        self._sync = ctx.Manager()
+        self._progress = self._sync.dict()  # key -> fraction done, shared with the workers
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: tuple, fn_name: str, args: tuple):
+        """Run jobs.<fn_name>(progress, key, *args) unless `key` is already running or kept."""
+        with self._lock:
+            if key in self._futures:
+                return
+            self._progress[key] = 0.0
+            future = self._executor.submit(getattr(jobs, fn_name), self._progress, key, *args)
+            future.add_done_callback(lambda _: self._progress.pop(key, None))
+            self._futures[key] = future
+
+    def poll(self, key: tuple) -> tuple:
+        """(done, progress, result, error) of a submitted job; result and error only once done."""
+        future = self._futures[key]
+        if not future.done():
+            return False, float(self._progress.get(key, 0.0)), None, None
+        exc = future.exception()
+        if exc is not None:
+            # Sent as text: the original exception need not pickle.
+            return True, 1.0, None, RuntimeError(f"{type(exc).__name__}: {exc}")
+        return True, 1.0, future.result(), None
+
+    def forget(self, key: tuple):
+        with self._lock:
+            self._futures.pop(key, None)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._sync.shutdown()
+
+
+class HostManager(BaseManager):
+    pass
+
+
+def main():
+    authkey = bytes.fromhex(sys.stdin.readline().strip())
+    host = JobHost(int(sys.argv[1]))
+    HostManager.register("host", callable=lambda: host)
+    server = HostManager(address=("127.0.0.1", 0), authkey=authkey).get_server()
+    print(server.address[1], flush=True)
+
+    def watch_parent():
+        sys.stdin.read()  # returns at EOF: the app process closed its end or exited
+        host.close()
+        server.stop_event.set()
+
+    threading.Thread(target=watch_parent, name="jobs-host-parent", daemon=True).start()
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
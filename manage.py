@@ -0,0 +1,174 @@
+"""
+Maintenance commands for hangman_scores.db.
+
+    python manage.py rebuild-rollups
+    python manage.py rebuild-sketches
+    python manage.py rebuild-ratings
+    python manage.py compact-archive [--every SECONDS]
+    python manage.py prune-sessions [--days DAYS]
+    python manage.py move-cold-games [--days DAYS] [--every SECONDS]
+    python manage.py backup [--every SECONDS] [--keep N]
+    python manage.py import-games FILE [FILE ...] [--keep-indexes]
+    python manage.py merge-shards [FILE ...]
+"""
+
+import argparse
+import time
+
+import archive
+import backup
+import sessions
+import storage
+import transfer
+
+
+def cmd_rebuild_rollups(args):
+    start = time.perf_counter()
+    storage.rebuild_rollups()
+    print(f"Rebuilt rollup tables in {time.perf_counter() - start:.2f}s")
+
+
+def cmd_rebuild_sketches(args):
+    start = time.perf_counter()
+    storage.rebuild_sketches()
+    print(f"Rebuilt game sample, player HyperLogLog and percentile buckets in {time.perf_counter() - start:.2f}s")
+
+
+def cmd_rebuild_ratings(args):
+    start = time.perf_counter()
+    storage.rebuild_ratings()
+    print(f"Replayed all games into player / word ratings in {time.perf_counter() - start:.2f}s")
+
+
+def cmd_compact_archive(args):
+    while True:
+        start = time.perf_counter()
+        rows = archive.compact()
+        print(
+            f"Archived {rows} games to {archive.ARCHIVE_DIR} "
+            f"(through id {archive.watermark()}) in {time.perf_counter() - start:.2f}s"
+        )
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+def cmd_prune_sessions(args):
+    store = sessions.get_store()
+    if store is None:
+        raise SystemExit("HANGMAN_SESSION_STORE is not set; there is no session store to prune")
+    deleted = store.prune(args.days * 86400)
+    print(f"Deleted {deleted} sessions idle for more than {args.days:g} days from {store.path}")
+
+
+def cmd_move_cold_games(args):
+    days = args.days or storage.RETENTION_DAYS
+    if not days:
+        raise SystemExit("Pass --days or set HANGMAN_RETENTION_DAYS")
+    while True:
+        start = time.perf_counter()
+        moved = storage.move_cold_games(storage.now_ms() - int(days * storage.MS_PER_DAY))
+        sizes = storage.tier_sizes()
+        print(
+            f"Moved {moved} games older than {days:g} days to {storage.cold_db_path()} "
+            f"in {time.perf_counter() - start:.2f}s; "
+            + ", ".join(f"{tier}: {s['games']:,} games, {s['bytes'] / 2**20:.1f} MiB" for tier, s in sizes.items())
+        )
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+def cmd_backup(args):
+    while True:
+        for report in backup.run(keep=args.keep):
+            print(
+                f"Backed up {report['source']} to {report['path']} in {report['seconds']:.2f}s: "
+                f"{report['bytes'] / 2**20:.1f} MiB -> {report['compressed_bytes'] / 2**20:.1f} MiB, "
+                f"{report['steps']} steps, {report['restarts']} restarts"
+                f"{' (fell back to a single step)' if report['single_step'] else ''}; "
+                f"writers blocked for at most {report['locked_sec'] * 1000:.0f} ms in total, "
+                f"{report['longest_step_sec'] * 1000:.0f} ms at once; pruned {report['pruned']} old snapshots"
+            )
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+def cmd_import_games(args):
+    for path in args.files:
+        start = time.perf_counter()
+        result = transfer.import_file(path, defer_indexes=not args.keep_indexes)
+        seconds = time.perf_counter() - start
+        print(
+            f"Imported {result['inserted']:,} of {result['read']:,} games from {path} "
+            f"({result['duplicates']:,} already stored) in {seconds:.2f}s, "
+            f"{result['read'] / max(seconds, 1e-9):,.0f} rows/s"
+        )
+
+
+def cmd_merge_shards(args):
+    paths = args.files or storage.shard_paths()
+    if not paths:
+        print("No shards given and none configured (HANGMAN_SHARDS)")
+        return
+    for result in storage.merge_shards(paths):
+        print(
+            f"Merged {result['inserted']:,} of {result['read']:,} games from {result['shard']} "
+            f"({result['duplicates']:,} already stored)"
+        )
+
+
+COMMANDS = {
+    "rebuild-rollups": (cmd_rebuild_rollups, "Recompute hourly / daily rollups and per-word stats from games"),
+    "rebuild-sketches": (cmd_rebuild_sketches, "Rebuild the approximate-mode sample, player HLL and percentile sketch"),
+    "rebuild-ratings": (cmd_rebuild_ratings, "Recompute Elo player / word ratings from every game"),
+    "compact-archive": (cmd_compact_archive, "Copy finished games into the Parquet archive"),
+    "prune-sessions": (cmd_prune_sessions, "Delete idle games from the external session store"),
+    "move-cold-games": (cmd_move_cold_games, "Move games past the retention horizon into the cold-tier database"),
+    "backup": (cmd_backup, "Write compressed, checksummed online snapshots of the database"),
+    "import-games": (cmd_import_games, "Load CSV / JSONL / Parquet files from Data Export, skipping games already stored"),
+    "merge-shards": (cmd_merge_shards, "Copy every game of other nodes' databases into this one, without duplicates"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="database file (default: hangman_scores.db next to storage.py)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (func, help_text) in COMMANDS.items():
+        sub.add_parser(name, help=help_text).set_defaults(func=func)
+    sub.choices["compact-archive"].add_argument(
+        "--every", type=float, default=0, help="keep running, compacting every N seconds"
+    )
+    sub.choices["move-cold-games"].add_argument(
+        "--days", type=float, default=0, help="retention horizon (default: HANGMAN_RETENTION_DAYS)"
+    )
+    sub.choices["move-cold-games"].add_argument(
+        "--every", type=float, default=0, help="keep running, moving games every N seconds"
+    )
+    sub.choices["backup"].add_argument(
+        "--every", type=float, default=0, help="keep running, taking a snapshot every N seconds"
+    )
+    sub.choices["backup"].add_argument(
+        "--keep", type=int, default=backup.KEEP, help="snapshots kept per database file (default HANGMAN_BACKUP_KEEP or 7)"
+    )
+    sub.choices["import-games"].add_argument("files", nargs="+", help="exported .csv, .jsonl or .parquet files")
+    sub.choices["import-games"].add_argument(
+        "--keep-indexes", action="store_true", help="keep the timestamp indexes during the insert (small imports)"
+    )
+    sub.choices["merge-shards"].add_argument(
+        "files", nargs="*", help="node databases to merge (default: HANGMAN_SHARDS)"
+    )
+    sub.choices["prune-sessions"].add_argument(
+        "--days", type=float, default=7, help="delete sessions idle for longer than this (default 7)"
+    )
+    args = parser.parse_args(argv)
+    if args.db:
+        storage.DB_PATH = args.db
+    storage.init_db()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# metrics.py
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Upper bounds (seconds) of the histogram buckets, Prometheus style.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_FILE = os.environ.get("HANGMAN_METRICS_FILE")
+EXPORT_INTERVAL_SEC = float(os.environ.get("HANGMAN_METRICS_INTERVAL", "30"))
+DEBUG_ENV = os.environ.get("HANGMAN_DEBUG_METRICS", "") not in ("", "0")
+
+
+class Histogram:
+    """Cumulative-bucket duration histogram."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        """Bucket upper bound covering the q-th observation."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts[:-1]):
+            seen += c
+            if seen >= target:
+                return BUCKETS[i]
+        return float("inf")
+
+
+# Process-wide registry shared by every Streamlit session.
+_lock = threading.Lock()
+_registry: dict[str, Histogram] = {}
+_last_export = 0.0
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        hist = _registry.get(name)
+        if hist is None:
+            hist = _registry[name] = Histogram()
+        hist.observe(seconds)
+
+
+@contextmanager
+def timed(name: str):
+    """Time a block (or a decorated function) into the `name` histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+class RerunTimer:
+    """Records the time between successive checkpoints of one script run."""
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.laps: list[tuple[str, float]] = []
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.last = now
+        self.laps.append((name, elapsed))
+        observe(f"section.{name}", elapsed)
+
+    def finish(self):
+        observe("rerun", time.perf_counter() - self.started)
+
+
+def snapshot() -> list[dict]:
+    """Summary rows (name, count, mean, p50, p95) for every histogram."""
+    with _lock:
+        items = sorted(_registry.items())
+        return [
+            {
+                "name": name,
+                "count": h.count,
+                "mean_ms": h.total / h.count * 1000 if h.count else 0.0,
+                "p50_ms": h.quantile(0.5) * 1000,
+                "p95_ms": h.quantile(0.95) * 1000,
+            }
+            for name, h in items
+        ]
+
+
+def render_prometheus() -> str:
+    """Render the registry in the Prometheus text exposition format."""
+    lines = [
+        "# HELP hangman_duration_seconds Duration of app sections and storage calls.",
+        "# TYPE hangman_duration_seconds histogram",
+    ]
+    with _lock:
+        for name, h in sorted(_registry.items()):
+            cumulative = 0
+            for bound, c in zip(BUCKETS, h.counts):
+                cumulative += c
+                lines.append(f'hangman_duration_seconds_bucket{{name="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'hangman_duration_seconds_bucket{{name="{name}",le="+Inf"}} {h.count}')
+            lines.append(f'hangman_duration_seconds_sum{{name="{name}"}} {h.total:.6f}')
+            lines.append(f'hangman_duration_seconds_count{{name="{name}"}} {h.count}')
+    return "\n".join(lines) + "\n"
+
+
+def maybe_export(path: str | None = METRICS_FILE, interval: float = EXPORT_INTERVAL_SEC) -> bool:
+    """Write the Prometheus file if `path` is set and `interval` has elapsed."""
+    global _last_export
+    if not path:
+        return False
+    now = time.monotonic()
+    with _lock:
+        if now - _last_export < interval:
+            return False
+        _last_export = now
+    target = Path(path)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    tmp.write_text(render_prometheus())
+    tmp.replace(target)
+    return True
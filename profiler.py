@@ -0,0 +1,137 @@
+# profiler.py
+
+import cProfile
+import datetime
+import os
+import pstats
+import threading
+import tracemalloc
+from pathlib import Path
+
+PROFILE_DIR = Path(os.environ.get("HANGMAN_PROFILE_DIR", Path(__file__).with_name("profiles")))
+
+# Reruns left to profile, with whether to trace memory, per owner: the
+# session that armed them via ?profile=N, or None for HANGMAN_PROFILE_RERUNS,
+# which any session's reruns use up. A budget is dropped, memory flag and
+# all, once it reaches 0.
+_lock = threading.Lock()
+# Held by the rerun being profiled: on Python 3.12+ only one profiler can be
+# active per process, so a second session's rerun is skipped, not profiled.
+_profiling = threading.Lock()
+_budgets: dict[str | None, list] = {}
+if int(os.environ.get("HANGMAN_PROFILE_RERUNS", "0") or 0) > 0:
+    _budgets[None] = [
+        int(os.environ["HANGMAN_PROFILE_RERUNS"]),
+        os.environ.get("HANGMAN_PROFILE_MEMORY", "") not in ("", "0"),
+    ]
+
+
+def arm(reruns: int, memory: bool = False, owner: str | None = None):
+    """Profile the next `reruns` reruns of `owner` (any session if None), optionally with tracemalloc."""
+    if reruns <= 0:
+        return
+    with _lock:
+        budget = _budgets.setdefault(owner, [0, False])
+        budget[0] += reruns
+        budget[1] = budget[1] or memory
+
+
+def remaining(owner: str | None = None) -> int:
+    """Reruns left that `owner`'s reruns would be profiled for."""
+    with _lock:
+        return sum(_budgets[key][0] for key in {owner, None} if key in _budgets)
+
+
+class RerunProfile:
+    """cProfile (and optional tracemalloc) capture of a single rerun."""
+
+    def __init__(self, memory: bool = False, directory: Path = PROFILE_DIR):
+        self.directory = Path(directory)
+        self.stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.memory = memory
+        self._own_tracemalloc = False
+        self._profile = cProfile.Profile()
+        self._stopped = False
+
+    def start(self):
+        """Enable profiling; the caller holds _profiling, released by stop()."""
+        self._profile.enable()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        return self
+
+    def stop(self) -> Path | None:
+        """Stop profiling and write the stat files; returns the .prof path."""
+        if self._stopped:
+            return None
+        self._stopped = True
+        self._profile.disable()
+        _profiling.release()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        prof_path = self.directory / f"rerun-{self.stamp}.prof"
+        self._profile.dump_stats(prof_path)
+        if self.memory and tracemalloc.is_tracing():
+            top = tracemalloc.take_snapshot().statistics("lineno")[:50]
+            (self.directory / f"rerun-{self.stamp}.mem.txt").write_text(
+                "\n".join(str(stat) for stat in top) + "\n"
+            )
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+        elif self.memory:
+            # Whoever was tracing when this rerun started stopped it before the snapshot.
+            (self.directory / f"rerun-{self.stamp}.mem.txt").write_text("tracemalloc stopped during the rerun\n")
+        return prof_path
+
+
+def maybe_start(owner: str | None = None) -> RerunProfile | None:
+    """
+    Start profiling this rerun if `owner`'s budget (or the shared one) allows
+    it and no other rerun is being profiled; a skipped rerun uses no budget.
+    """
+    if not _profiling.acquire(blocking=False):
+        return None
+    with _lock:
+        key = owner if owner in _budgets else None
+        budget = _budgets.get(key)
+        if budget is None:
+            _profiling.release()
+            return None
+        budget[0] -= 1
+        memory = budget[1]
+        if budget[0] <= 0:
+            del _budgets[key]
+    profile = RerunProfile(memory=memory)
+    try:
+        return profile.start()
+    except ValueError:
+        # Another profiler (a debugger, or an outside cProfile) holds the hook.
+        _profiling.release()
+        return None
+
+
+def list_profiles(directory: Path = PROFILE_DIR) -> list[Path]:
+    """Saved .prof files, newest first."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob("*.prof"), reverse=True)
+
+
+def top_functions(path: Path, limit: int = 25, sort: str = "cumulative") -> list[dict]:
+    """The `limit` most expensive functions of a .prof file."""
+    stats = pstats.Stats(str(path))
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        _, ncalls, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append(
+            {
+                "function": f"{name} ({Path(filename).name}:{line})",
+                "calls": ncalls,
+                "tottime": tottime,
+                "cumtime": cumtime,
+            }
+        )
+    return rows
@@ -0,0 +1,208 @@
+# sessions.py
+#
+# Optional external store for game state, so several app replicas can share
+# sessions and a restart does not lose a game in progress. Each session is
+# one fixed-size binary record (RECORD) keyed by the token in the page URL
+# (?session=...), in a SQLite file every replica can open. Strings (player,
+# words, category, hint) are dictionary-encoded in the same file.
+# Enabled by pointing HANGMAN_SESSION_STORE at that file.
+
+import os
+import random
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from contextlib import closing
+
+import metrics
+
+STORE_PATH = os.environ.get("HANGMAN_SESSION_STORE")
+ENABLED = bool(STORE_PATH)
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+FORMAT_VERSION = 3
+
+# version, flags, string ids (username, difficulty, category, secret word,
+# last word, hint, queue category), queue seed, queue words left, guessed
+# letters bitmask, lives left, max lives, attempts, start time, streaks,
+# game UUID (zeros before the first game).
+RECORD = struct.Struct("<BB7IIII bBHdHH16s")
+
+# Bit per boolean in the flags byte.
+FLAGS = ("game_active", "game_over", "game_won", "result_logged", "hint_shown", "adaptive_words")
+STRINGS = ("username", "difficulty", "word_category", "secret_word", "last_word", "hint", "word_queue_category")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    record BLOB NOT NULL,
+    updated_ms INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def new_token() -> str:
+    return uuid.uuid4().hex
+
+
+def letters_mask(letters) -> int:
+    return sum(1 << LETTERS.index(c) for c in letters if c in LETTERS)
+
+
+def mask_letters(mask: int) -> set:
+    return {c for i, c in enumerate(LETTERS) if mask >> i & 1}
+
+
+class SessionStore:
+    """Binary game-state records in a SQLite file shared by every replica."""
+
+    def __init__(self, path):
+        self.path = path
+        self._ids: dict[str, int] = {}
+        self._values: dict[int, str] = {}
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            # WAL lets replicas read while one of them writes.
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        # A power cut may lose the last guess or two, never corrupt the file.
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _string_id(self, conn, value) -> int:
+        """Id of a string in the store's dictionary (0 for None / empty)."""
+        if not value:
+            return 0
+        with self._lock:
+            string_id = self._ids.get(value)
+        if string_id is None:
+            conn.execute("INSERT OR IGNORE INTO strings (value) VALUES (?)", (value,))
+            string_id = conn.execute("SELECT id FROM strings WHERE value = ?", (value,)).fetchone()[0]
+            with self._lock:
+                self._ids[value] = string_id
+                self._values[string_id] = value
+        return string_id
+
+    def _string(self, conn, string_id: int) -> str:
+        if not string_id:
+            return ""
+        with self._lock:
+            value = self._values.get(string_id)
+        if value is None:
+            value = conn.execute("SELECT value FROM strings WHERE id = ?", (string_id,)).fetchone()[0]
+            with self._lock:
+                self._values[string_id] = value
+                self._ids[value] = string_id
+        return value
+
+    def encode(self, conn, state) -> bytes:
+        flags = sum(1 << i for i, name in enumerate(FLAGS) if state.get(name))
+        return RECORD.pack(
+            FORMAT_VERSION,
+            flags,
+            *(self._string_id(conn, state.get(name)) for name in STRINGS),
+            state.get("word_queue_seed") or 0,
+            len(state.get("word_queue") or ()),
+            letters_mask(state.get("guessed_letters") or ()),
+            state.get("remaining_lives") or 0,
+            state.get("max_lives") or 0,
+            state.get("attempts") or 0,
+            state.get("start_time") or 0.0,
+            state.get("current_streak") or 0,
+            state.get("best_streak") or 0,
+            uuid.UUID(state["game_uuid"]).bytes if state.get("game_uuid") else bytes(16),
+        )
+
+    def decode(self, conn, record: bytes) -> dict | None:
+        """
+        Game fields from a record; the word queue comes back as
+        word_queue_seed / word_queue_category / word_queue_left for the app
+        to rebuild. None for a record in an unknown format.
+        """
+        if len(record) != RECORD.size or record[0] != FORMAT_VERSION:
+            return None
+        fields = RECORD.unpack(record)
+        flags, strings = fields[1], fields[2:2 + len(STRINGS)]
+        seed, left, guessed, lives, max_lives, attempts, start, streak, best, game_uuid = fields[2 + len(STRINGS):]
+        state = {name: bool(flags >> i & 1) for i, name in enumerate(FLAGS)}
+        state.update((name, self._string(conn, sid)) for name, sid in zip(STRINGS, strings))
+
+        secret = state["secret_word"]
+        state["guessed_letters"] = mask_letters(guessed)
+        state["wrong_letters"] = {c for c in state["guessed_letters"] if c not in secret}
+        if state["game_over"] and not state["game_won"]:
+            state["display_word"] = list(secret)
+        else:
+            state["display_word"] = [c if c in state["guessed_letters"] else "_" for c in secret]
+        state.update(
+            word_queue_seed=seed,
+            word_queue_left=left,
+            remaining_lives=lives,
+            max_lives=max_lives,
+            attempts=attempts,
+            start_time=start or None,
+            current_streak=streak,
+            best_streak=best,
+            game_uuid=str(uuid.UUID(bytes=game_uuid)) if any(game_uuid) else "",
+        )
+        return state
+
+    @metrics.timed("sessions.save")
+    def save(self, token: str, state, previous: bytes | None = None) -> bytes:
+        """Write the session's record unless it equals `previous`; returns the record."""
+        with closing(self._connect()) as conn:
+            record = self.encode(conn, state)
+            if record != previous:
+                conn.execute(
+                    """
+                    INSERT INTO sessions (token, record, updated_ms) VALUES (?, ?, ?)
+                    ON CONFLICT (token) DO UPDATE SET record = excluded.record, updated_ms = excluded.updated_ms
+                    """,
+                    (token, record, int(time.time() * 1000)),
+                )
+            conn.commit()
+        return record
+
+    @metrics.timed("sessions.load")
+    def load(self, token: str) -> dict | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT record FROM sessions WHERE token = ?", (token,)).fetchone()
+            return self.decode(conn, row[0]) if row else None
+
+    def prune(self, older_than_sec: float) -> int:
+        """Delete sessions idle for longer than `older_than_sec`; returns how many."""
+        cutoff = int((time.time() - older_than_sec) * 1000)
+        with closing(self._connect()) as conn:
+            deleted = conn.execute("DELETE FROM sessions WHERE updated_ms < ?", (cutoff,)).rowcount
+            conn.commit()
+        return deleted
+
+
+_store_lock = threading.Lock()
+_store: SessionStore | None = None
+
+
+def get_store() -> SessionStore | None:
+    """The process-wide store, or None when HANGMAN_SESSION_STORE is unset."""
+    global _store
+    if ENABLED and _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(STORE_PATH)
+    return _store
+
+
+def shuffled(words: list[str], seed: int) -> list[str]:
+    """The word queue for `seed`: the same order on every replica."""
+    queue = list(words)
+    random.Random(seed).shuffle(queue)
+    return queue
@@ -1,37 +1,1045 @@
 # storage.py
 
+import hashlib
+import math
+import os
+import random
 import sqlite3
-from contextlib import closing
+import zlib
+from contextlib import closing, contextmanager
 from pathlib import Path
-import datetime
+import time
+import uuid
+from urllib.parse import quote
+
+import numpy as np
+
+import metrics
 
 DB_PATH = Path(__file__).with_name("hangman_scores.db")
 
+# Cold tier: games older than the retention horizon are moved out of games
+# into this database (default: <DB_PATH stem>_cold.db next to DB_PATH) by
+# move_cold_games(). Rollups keep their contributions, rebuilds read both
+# tiers, and full-history reads ATTACH it on demand.
+COLD_DB_PATH = os.environ.get("HANGMAN_COLD_DB")
+RETENTION_DAYS = float(os.environ.get("HANGMAN_RETENTION_DAYS", "0"))  # 0: keep every game hot
+
+# Federation: other nodes' databases (os.pathsep-separated paths). Federated
+# reads ATTACH them read-only next to this one and UNION ALL one query per
+# node; merge_shards() copies their games in for good.
+SHARD_PATHS = [Path(p) for p in os.environ.get("HANGMAN_SHARDS", "").split(os.pathsep) if p.strip()]
+MAX_SHARDS = 10  # SQLite's default limit on attached databases
+
+# Bumped whenever a migration is appended to MIGRATIONS (stored in PRAGMA user_version).
+SCHEMA_VERSION = 11
+
+# Usernames, words and categories are dictionary-encoded: games stores
+# integer ids into these lookup tables instead of repeating the strings.
+LOOKUPS_DDL = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS words (
+    id INTEGER PRIMARY KEY,
+    word TEXT NOT NULL UNIQUE,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+"""
+
+GAMES_DDL = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id INTEGER REFERENCES players (id),
+    word_id INTEGER REFERENCES words (id),
+    category_id INTEGER REFERENCES categories (id),
+    won INTEGER NOT NULL CHECK (won IN (0, 1)),
+    attempts_used INTEGER,
+    wrong_guesses INTEGER,
+    max_lives INTEGER,
+    remaining_lives INTEGER,
+    duration_sec REAL,
+    timestamp INTEGER NOT NULL,  -- epoch milliseconds, UTC
+    uuid BLOB  -- 16-byte game UUID from start_new_game; see log_game
+)
+"""
+
+INDEXES_DDL = """
+CREATE INDEX IF NOT EXISTS idx_games_timestamp ON games (timestamp);
+CREATE INDEX IF NOT EXISTS idx_games_player_timestamp ON games (player_id, timestamp);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_games_uuid ON games (uuid);
+"""
+
+# Pre-aggregated per-player counts, maintained by log_game and rebuilt in
+# bulk by rebuild_rollups(). `hour` is the UTC hour of day (0-23) and `day`
+# the UTC day number since the epoch.
+ROLLUPS_DDL = """
+CREATE TABLE IF NOT EXISTS rollup_user_hour (
+    player_id INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    PRIMARY KEY (player_id, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_user_day (
+    player_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    PRIMARY KEY (player_id, day)
+) WITHOUT ROWID;
+"""
+
+# Constant-size summaries for approximate global stats (see approx.py),
+# maintained by log_game and rebuilt by rebuild_sketches(): a uniform
+# reservoir sample of games plus a HyperLogLog of player names.
+SKETCHES_DDL = """
+CREATE TABLE IF NOT EXISTS sample_games (
+    slot INTEGER PRIMARY KEY,
+    game_id INTEGER NOT NULL,
+    player_id INTEGER,
+    won INTEGER NOT NULL,
+    attempts_used INTEGER,
+    wrong_guesses INTEGER,
+    duration_sec REAL,
+    timestamp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sample_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    seen INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO sample_state (id, seen) VALUES (0, 0);
+CREATE TABLE IF NOT EXISTS hll_players (
+    register INTEGER PRIMARY KEY,
+    rank INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+RESERVOIR_SIZE = 10_000
+HLL_PRECISION = 12  # 2**12 registers, ~1.6% standard error
+
+# Running per-player sums plus a bucketed quantile sketch of the players'
+# win rate, average attempts and average duration, for percentile ranks.
+# Each player sits in one bucket per metric and moves when a game changes
+# their average; buckets are bounded in number, so ranking does not scan players.
+PERCENTILES_DDL = """
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    attempts_sum INTEGER NOT NULL,
+    attempts_games INTEGER NOT NULL,
+    duration_sum REAL NOT NULL,
+    duration_games INTEGER NOT NULL,
+    perfects INTEGER NOT NULL DEFAULT 0  -- wins without a wrong guess
+);
+CREATE TABLE IF NOT EXISTS quantile_buckets (
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    players INTEGER NOT NULL,
+    PRIMARY KEY (metric, bucket)
+) WITHOUT ROWID;
+"""
+
+PERCENTILE_METRICS = ("win_rate", "avg_attempts", "avg_duration")
+PERCENTILE_MIN_GAMES = 5  # players are ranked once they have this many games
+QUANTILE_ACCURACY = 0.01  # relative bucket width for the averages
+
+# Elo-style skill: every game is a match between the player and the word.
+# A win moves the player up and the word down by the same amount, scaled by
+# how unexpected the result was given both ratings.
+RATINGS_DDL = """
+CREATE TABLE IF NOT EXISTS player_ratings (
+    player_id INTEGER PRIMARY KEY,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS word_ratings (
+    word_id INTEGER PRIMARY KEY,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_player_ratings_rating ON player_ratings (rating);
+"""
+
+# Cross-player outcome counts per word, maintained by log_game. The
+# expression index serves the "hardest words" top-N without a sort.
+WORD_STATS_DDL = """
+CREATE TABLE IF NOT EXISTS word_stats (
+    word_id INTEGER PRIMARY KEY,
+    plays INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    wrong_sum INTEGER NOT NULL,
+    wrong_games INTEGER NOT NULL,
+    duration_sum REAL NOT NULL,
+    duration_games INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_word_stats_loss_rate ON word_stats ((plays - wins) * 1.0 / plays);
+"""
+
+# Per-player loss counts by letter and word length for adaptive word
+# selection (see adaptive.py): one little-endian int32 vector per player,
+# laid out as USER_FEATURE_SLICES describes.
+USER_FEATURES_DDL = """
+CREATE TABLE IF NOT EXISTS user_features (
+    player_id INTEGER PRIMARY KEY,
+    features BLOB NOT NULL
+);
+"""
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+MAX_WORD_LENGTH = 20  # longer words share the last length slot
+USER_FEATURE_SLICES = {
+    "letter_losses": slice(0, 26),
+    "letter_plays": slice(26, 52),
+    "length_losses": slice(52, 52 + MAX_WORD_LENGTH + 1),
+    "length_plays": slice(52 + MAX_WORD_LENGTH + 1, 52 + 2 * (MAX_WORD_LENGTH + 1)),
+}
+USER_FEATURE_SIZE = 52 + 2 * (MAX_WORD_LENGTH + 1)
+FEATURE_DTYPE = np.dtype("<i4")
+
+# Per-guess event log (see events.py), append-only. Each row is a batch of
+# events stored column by column (EVENT_DTYPE field order) and
+# zlib-compressed; game keys, timestamps, players and words repeat a lot
+# within a column, so a batch compresses to a few bytes per event.
+# event_batch_players lists the players in each batch, so one player's
+# events are read from their batches only.
+EVENTS_DDL = """
+CREATE TABLE IF NOT EXISTS event_batches (
+    id INTEGER PRIMARY KEY,
+    first_ts INTEGER NOT NULL,
+    last_ts INTEGER NOT NULL,
+    events INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_event_batches_last_ts ON event_batches (last_ts);
+CREATE TABLE IF NOT EXISTS event_batch_players (
+    player_id INTEGER NOT NULL,
+    batch_id INTEGER NOT NULL,
+    PRIMARY KEY (player_id, batch_id)
+) WITHOUT ROWID;
+"""
+
+EVENT_DTYPE = np.dtype([
+    ("game", "<i8"),     # events.game_key() of the game's UUID
+    ("ts", "<i8"),       # epoch milliseconds, UTC
+    ("player", "<i4"),   # players.id, 0 for a guest
+    ("word", "<i4"),     # words.id of the secret word
+    ("kind", "u1"),      # events.START / GUESS / HINT / GIVE_UP
+    ("letter", "u1"),    # index into LETTERS, 255 when the event has none
+    ("hit", "u1"),       # the guessed letter is in the word
+    ("lives", "i1"),     # lives left after the event
+])
+NO_LETTER = 255
+
+INITIAL_RATING = 1500.0
+RATING_K = 32.0
+PROVISIONAL_K = 64.0  # while a player or word has fewer than PROVISIONAL_GAMES
+PROVISIONAL_GAMES = 10
+BASELINE_LIVES = 6  # Medium; each life fewer makes the word play RATING_PER_LIFE harder
+RATING_PER_LIFE = 50.0
+
+MS_PER_HOUR = 3_600_000
+MS_PER_DAY = 86_400_000
+
+# Columns returned by fetch_games_encoded(), in order.
+ENCODED_COLUMNS = (
+    "id", "player_id", "word_id", "category_id", "won",
+    "attempts_used", "wrong_guesses", "max_lives", "remaining_lives",
+    "duration_sec", "timestamp",
+)
+
+
+# Decoded games with their original column names.
+NAMED_COLUMNS = (
+    "id", "username", "word", "word_length", "category", "won",
+    "attempts_used", "wrong_guesses", "max_lives", "remaining_lives",
+    "duration_sec", "timestamp",
+)
+
+NAMED_SELECT = """
+SELECT
+    g.id, p.name AS username, w.word, COALESCE(w.length, 0) AS word_length,
+    c.name AS category, g.won, g.attempts_used, g.wrong_guesses,
+    g.max_lives, g.remaining_lives, g.duration_sec, g.timestamp
+FROM games g
+LEFT JOIN players p ON p.id = g.player_id
+LEFT JOIN words w ON w.id = g.word_id
+LEFT JOIN categories c ON c.id = g.category_id
+"""
+
+
+def now_ms() -> int:
+    """Current UTC time as integer epoch milliseconds."""
+    return int(time.time() * 1000)
+
+
+def _execute_statements(conn, script: str):
+    """Run a ;-separated DDL script inside the open transaction (unlike executescript)."""
+    for statement in script.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def cold_db_path() -> Path:
+    return Path(COLD_DB_PATH) if COLD_DB_PATH else Path(DB_PATH).with_name(Path(DB_PATH).stem + "_cold.db")
+
+
+def _attach_cold(conn, create: bool = False) -> bool:
+    """
+    ATTACH the cold tier as `cold` when it exists (or `create` it). Must run
+    outside a transaction; returns whether it is attached.
+    """
+    path = cold_db_path()
+    if not (create or path.exists()):
+        return False
+    conn.execute("ATTACH DATABASE ? AS cold", (str(path),))
+    conn.executescript(
+        GAMES_DDL.replace("EXISTS games", "EXISTS cold.games") + ";"
+        + INDEXES_DDL.replace("EXISTS idx_", "EXISTS cold.idx_")
+    )
+    return True
+
+
+GAME_COLUMNS = (
+    "id", "player_id", "word_id", "category_id", "won", "attempts_used", "wrong_guesses",
+    "max_lives", "remaining_lives", "duration_sec", "timestamp", "uuid",
+)
+
+
+def _all_games(conn) -> str:
+    """
+    Name of a temp view over every game, hot and cold (just games when the
+    cold tier is not attached), for rebuilds and full-history reads.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_temp_master WHERE name = 'all_games'").fetchone() is None:
+        if any(name == "cold" for _, name, _ in conn.execute("PRAGMA database_list")):
+            columns = ", ".join(GAME_COLUMNS)
+            source = f"SELECT {columns} FROM main.games UNION ALL SELECT {columns} FROM cold.games"
+        else:
+            source = "SELECT * FROM main.games"  # mid-migration games may predate GAME_COLUMNS
+        conn.execute(f"CREATE TEMP VIEW all_games AS {source}")
+    return "all_games"
+
+
+def _migrate_typed_columns(conn):
+    """
+    v1: rebuild games with integer epoch-ms timestamps and a strict 0/1 `won`.
+
+    Older files may lack `word_length` and/or `category`; both are filled in.
+    """
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(games)")}
+    word_length = "word_length" if "word_length" in cols else "COALESCE(length(word), 0)"
+    category = "category" if "category" in cols else "NULL"
+
+    conn.execute("ALTER TABLE games RENAME TO games_old")
+    conn.execute(
+        """
+        CREATE TABLE games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            word TEXT,
+            word_length INTEGER NOT NULL,
+            category TEXT,
+            won INTEGER NOT NULL CHECK (won IN (0, 1)),
+            attempts_used INTEGER,
+            wrong_guesses INTEGER,
+            max_lives INTEGER,
+            remaining_lives INTEGER,
+            duration_sec REAL,
+            timestamp INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO games (
+            id, username, word, word_length, category, won,
+            attempts_used, wrong_guesses,
+            max_lives, remaining_lives, duration_sec, timestamp
+        )
+        SELECT
+            id, username, word, {word_length}, {category},
+            CASE WHEN won IN (1, '1', 'True', 'true') THEN 1 ELSE 0 END,
+            attempts_used, wrong_guesses,
+            max_lives, remaining_lives, duration_sec,
+            CASE
+                WHEN typeof(timestamp) = 'integer' THEN timestamp
+                ELSE CAST(round((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER)
+            END
+        FROM games_old
+        """
+    )
+    conn.execute("DROP TABLE games_old")
+
+
+def _migrate_dictionary_encoding(conn):
+    """v2: move username / word / category strings into lookup tables."""
+    _execute_statements(conn, LOOKUPS_DDL)
+    conn.execute("INSERT OR IGNORE INTO players (name) SELECT DISTINCT username FROM games WHERE username IS NOT NULL")
+    conn.execute("INSERT OR IGNORE INTO words (word, length) SELECT DISTINCT word, length(word) FROM games WHERE word IS NOT NULL")
+    conn.execute("INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM games WHERE category IS NOT NULL")
+
+    conn.execute("ALTER TABLE games RENAME TO games_v1")
+    conn.execute(
+        """
+        CREATE TABLE games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id INTEGER REFERENCES players (id),
+            word_id INTEGER REFERENCES words (id),
+            category_id INTEGER REFERENCES categories (id),
+            won INTEGER NOT NULL CHECK (won IN (0, 1)),
+            attempts_used INTEGER,
+            wrong_guesses INTEGER,
+            max_lives INTEGER,
+            remaining_lives INTEGER,
+            duration_sec REAL,
+            timestamp INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO games (
+            id, player_id, word_id, category_id, won,
+            attempts_used, wrong_guesses,
+            max_lives, remaining_lives, duration_sec, timestamp
+        )
+        SELECT
+            g.id, p.id, w.id, c.id, g.won,
+            g.attempts_used, g.wrong_guesses,
+            g.max_lives, g.remaining_lives, g.duration_sec, g.timestamp
+        FROM games_v1 g
+        LEFT JOIN players p ON p.name = g.username
+        LEFT JOIN words w ON w.word = g.word
+        LEFT JOIN categories c ON c.name = g.category
+        """
+    )
+    conn.execute("DROP TABLE games_v1")
+
+
+def _migrate_rollups(conn):
+    """v3: add the hourly / daily rollup tables and fill them from games."""
+    _execute_statements(conn, ROLLUPS_DDL)
+    _rebuild_rollups(conn)
+
+
+def _migrate_sketches(conn):
+    """v4: add the reservoir sample / HyperLogLog tables and fill them from games."""
+    _execute_statements(conn, SKETCHES_DDL)
+    _rebuild_sketches(conn)
+
+
+def _migrate_percentiles(conn):
+    """v5: add player_stats / quantile_buckets and fill them from games."""
+    _execute_statements(conn, PERCENTILES_DDL)
+    _rebuild_percentiles(conn)
+
+
+def _migrate_ratings(conn):
+    """v6: add player / word ratings and replay every game into them."""
+    _execute_statements(conn, RATINGS_DDL)
+    _rebuild_ratings(conn)
+
+
+def _migrate_word_stats(conn):
+    """v7: add per-word outcome stats and fill them from games."""
+    _execute_statements(conn, WORD_STATS_DDL)
+    _rebuild_word_stats(conn)
+
+
+def _migrate_user_features(conn):
+    """v8: add per-player letter / length loss vectors and fill them from games."""
+    _execute_statements(conn, USER_FEATURES_DDL)
+    _rebuild_user_features(conn)
+
 
+def _migrate_events(conn):
+    """v9: add the per-guess event log (event_batches and their event_batch_players index)."""
+    _execute_statements(conn, EVENTS_DDL)
+
+
+# Namespace of the name-based UUIDs given to games logged without one.
+CONTENT_UUID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "hangman-arcade:games")
+
+
+def content_uuid(username, word, category, won, attempts_used, wrong_guesses, max_lives, remaining_lives,
+                 duration_sec, timestamp) -> uuid.UUID:
+    """Deterministic UUID of a game's contents, so the same row gets the same id in every copy of the data."""
+    fields = (username, word, category, int(won), attempts_used, wrong_guesses, max_lives, remaining_lives,
+              None if duration_sec is None else float(duration_sec), timestamp)
+    return uuid.uuid5(CONTENT_UUID_NAMESPACE, "|".join(map(repr, fields)))
+
+
+def _migrate_game_uuids(conn):
+    """
+    v10: add games.uuid. Existing games get content_uuid(); exact duplicate
+    rows (same contents down to the millisecond) keep distinct ids here.
+    """
+    conn.execute("ALTER TABLE games ADD COLUMN uuid BLOB")
+    seen, ids = set(), []
+    for game_id, *fields in conn.execute(f"{NAMED_SELECT} ORDER BY g.id"):
+        username, word, _, category, *rest = fields
+        game_uuid = content_uuid(username, word, category, *rest).bytes
+        if game_uuid in seen:
+            game_uuid = uuid.uuid5(CONTENT_UUID_NAMESPACE, f"{game_uuid.hex()}|{game_id}").bytes
+        seen.add(game_uuid)
+        ids.append((game_uuid, game_id))
+    conn.executemany("UPDATE games SET uuid = ? WHERE id = ?", ids)
+
+
+def _migrate_cold_tier(conn):
+    """
+    v11: lifetime per-player perfect-game counts in player_stats, so the
+    leaderboard can come from rollups once old games move to the cold tier.
+    init_db's VACUUM also switches the file to incremental auto-vacuum.
+    """
+    if "perfects" not in {row[1] for row in conn.execute("PRAGMA table_info(player_stats)")}:
+        conn.execute("ALTER TABLE player_stats ADD COLUMN perfects INTEGER NOT NULL DEFAULT 0")
+    conn.execute(
+        """
+        UPDATE player_stats SET perfects = (
+            SELECT COUNT(*) FROM games g
+            WHERE g.player_id = player_stats.player_id AND g.won = 1 AND g.wrong_guesses = 0
+        )
+        """
+    )
+
+
+MIGRATIONS = [
+    _migrate_typed_columns,
+    _migrate_dictionary_encoding,
+    _migrate_rollups,
+    _migrate_sketches,
+    _migrate_percentiles,
+    _migrate_ratings,
+    _migrate_word_stats,
+    _migrate_user_features,
+    _migrate_events,
+    _migrate_game_uuids,
+    _migrate_cold_tier,
+]
+
+
+@metrics.timed("storage.init_db")
 def init_db():
-    """Create the games table if it doesn't exist."""
+    """Create the games table if it doesn't exist and migrate older files."""
     with closing(sqlite3.connect(DB_PATH)) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        has_games = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'games'"
+        ).fetchone()
+        # Takes effect right away on a new file and with the VACUUM below
+        # on a migrated one; lets move_cold_games hand pages back gradually.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+        migrated = has_games and version < SCHEMA_VERSION
+        if migrated:
+            conn.execute("BEGIN")
+            for migrate in MIGRATIONS[version:]:
+                migrate(conn)
+            conn.commit()
+        # Only now: the cold tier and the all_games view over both tiers
+        # assume the current games schema (GAME_COLUMNS, uuid included).
+        # Files migrated above predate the cold tier, so had no cold games.
+        _attach_cold(conn)
+
+        conn.executescript(LOOKUPS_DDL + GAMES_DDL + ";" + INDEXES_DDL + ROLLUPS_DDL + SKETCHES_DDL + PERCENTILES_DDL + RATINGS_DDL + WORD_STATS_DDL + USER_FEATURES_DDL + EVENTS_DDL)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        if migrated:
+            # Rebuilt tables leave the old pages on the freelist.
+            conn.execute("VACUUM")
+
+
+def _lookup_id(conn, table: str, column: str, value, **extra):
+    """Id of `value` in a lookup table, inserting it on first use."""
+    if value is None:
+        return None
+    row = conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()
+    if row:
+        return row[0]
+    names = ", ".join([column, *extra])
+    marks = ", ".join("?" * (1 + len(extra)))
+    cur = conn.execute(f"INSERT INTO {table} ({names}) VALUES ({marks})", (value, *extra.values()))
+    return cur.lastrowid
+
+
+def _lookup_ids(conn, table: str, column: str, values) -> dict:
+    """{value: id} for many values at once, inserting the missing ones (words get their length)."""
+    values = list(values)
+    ids = {}
+    for start in range(0, len(values), 500):
+        chunk = values[start:start + 500]
+        ids.update(conn.execute(f"SELECT {column}, id FROM {table} WHERE {column} IN ({', '.join('?' * len(chunk))})", chunk))
+    for value in values:
+        if value not in ids:
+            ids[value] = _lookup_id(conn, table, column, value, **({"length": len(value)} if table == "words" else {}))
+    return ids
+
+
+def _games_source(conn, after_id: int | None) -> str:
+    """
+    What the _rebuild_* helpers read: every game, hot and cold, or with
+    `after_id` only the hot games past it, which they then merge into the
+    existing tables instead (see import_games).
+    """
+    if after_id is None:
+        return _all_games(conn)
+    return f"(SELECT * FROM main.games WHERE id > {int(after_id)})"
+
+
+def _rebuild_rollups(conn, after_id: int | None = None):
+    if after_id is None:
+        conn.execute("DELETE FROM rollup_user_hour")
+        conn.execute("DELETE FROM rollup_user_day")
+    for table, key, expression in (
+        ("rollup_user_hour", "hour", f"(timestamp / {MS_PER_HOUR}) % 24"),
+        ("rollup_user_day", "day", f"timestamp / {MS_PER_DAY}"),
+    ):
         conn.execute(
+            f"""
+            INSERT INTO {table} (player_id, {key}, games, wins)
+            SELECT player_id, {expression}, COUNT(*), SUM(won)
+            FROM {_games_source(conn, after_id)} WHERE player_id IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (player_id, {key}) DO UPDATE SET
+                games = games + excluded.games, wins = wins + excluded.wins
             """
-            CREATE TABLE IF NOT EXISTS games (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT,
-                word TEXT,
-                word_length INTEGER NOT NULL,
-                category TEXT,
-                won INTEGER,
-                attempts_used INTEGER,
-                wrong_guesses INTEGER,
-                max_lives INTEGER,
-                remaining_lives INTEGER,
-                duration_sec REAL,
-                timestamp TEXT
+        )
+
+
+def _rebuild_word_stats(conn, after_id: int | None = None):
+    if after_id is None:
+        conn.execute("DELETE FROM word_stats")
+    conn.execute(
+        f"""
+        INSERT INTO word_stats (word_id, plays, wins, wrong_sum, wrong_games, duration_sum, duration_games)
+        SELECT word_id, COUNT(*), SUM(won),
+               COALESCE(SUM(wrong_guesses), 0), COUNT(wrong_guesses),
+               COALESCE(SUM(duration_sec), 0), COUNT(duration_sec)
+        FROM {_games_source(conn, after_id)} WHERE word_id IS NOT NULL
+        GROUP BY word_id
+        ON CONFLICT (word_id) DO UPDATE SET
+            plays = plays + excluded.plays,
+            wins = wins + excluded.wins,
+            wrong_sum = wrong_sum + excluded.wrong_sum,
+            wrong_games = wrong_games + excluded.wrong_games,
+            duration_sum = duration_sum + excluded.duration_sum,
+            duration_games = duration_games + excluded.duration_games
+        """
+    )
+
+
+def user_feature_delta(word: str, won: int, games: int = 1) -> np.ndarray:
+    """What `games` plays of `word` with this outcome add to a player's feature vector."""
+    delta = np.zeros(USER_FEATURE_SIZE, dtype=FEATURE_DTYPE)
+    letters = [LETTERS.index(c) for c in set(word.lower()) if c in LETTERS]
+    length = min(len(word), MAX_WORD_LENGTH)
+    delta[USER_FEATURE_SLICES["letter_plays"].start + np.array(letters, dtype=np.int64)] = games
+    delta[USER_FEATURE_SLICES["length_plays"].start + length] = games
+    if not won:
+        delta[np.array(letters, dtype=np.int64)] = games
+        delta[USER_FEATURE_SLICES["length_losses"].start + length] = games
+    return delta
+
+
+def _rebuild_user_features(conn, after_id: int | None = None):
+    source = _games_source(conn, after_id)
+    if after_id is None:
+        conn.execute("DELETE FROM user_features")
+    vectors = {
+        player_id: np.frombuffer(features, dtype=FEATURE_DTYPE).copy()
+        for player_id, features in conn.execute(
+            f"SELECT player_id, features FROM user_features WHERE player_id IN (SELECT player_id FROM {source})"
+        )
+    }
+    rows = conn.execute(
+        f"""
+        SELECT g.player_id, w.word, g.won, COUNT(*) FROM {source} g
+        JOIN words w ON w.id = g.word_id
+        WHERE g.player_id IS NOT NULL
+        GROUP BY 1, 2, 3
+        """
+    )
+    deltas = {}  # (word, won) -> delta of one play, shared by every player of the word
+    for player_id, word, won, games in rows:
+        if player_id not in vectors:
+            vectors[player_id] = np.zeros(USER_FEATURE_SIZE, dtype=FEATURE_DTYPE)
+        delta = deltas.get((word, won))
+        if delta is None:
+            delta = deltas[(word, won)] = user_feature_delta(word, won)
+        vectors[player_id] += delta * games
+    conn.executemany(
+        "INSERT OR REPLACE INTO user_features (player_id, features) VALUES (?, ?)",
+        ((player_id, v.tobytes()) for player_id, v in vectors.items()),
+    )
+
+
+@metrics.timed("storage.rebuild_rollups")
+def rebuild_rollups():
+    """
+    Recompute every rollup table (per-player hour / day, per-word stats,
+    per-player letter / length features) from games, hot and cold.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn)
+        conn.execute("BEGIN")
+        _rebuild_rollups(conn)
+        _rebuild_word_stats(conn)
+        _rebuild_user_features(conn)
+        conn.commit()
+
+
+def _update_rollups(conn, game: dict):
+    if game["player_id"] is None:
+        return
+    conn.execute(
+        """
+        INSERT INTO rollup_user_hour (player_id, hour, games, wins) VALUES (?, ?, 1, ?)
+        ON CONFLICT (player_id, hour) DO UPDATE SET games = games + 1, wins = wins + excluded.wins
+        """,
+        (game["player_id"], (game["timestamp"] // MS_PER_HOUR) % 24, game["won"]),
+    )
+    conn.execute(
+        """
+        INSERT INTO rollup_user_day (player_id, day, games, wins) VALUES (?, ?, 1, ?)
+        ON CONFLICT (player_id, day) DO UPDATE SET games = games + 1, wins = wins + excluded.wins
+        """,
+        (game["player_id"], game["timestamp"] // MS_PER_DAY, game["won"]),
+    )
+
+
+def hll_register(name: str) -> tuple[int, int]:
+    """(register, rank) of a player name in the HLL_PRECISION HyperLogLog."""
+    x = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big")
+    rest_bits = 64 - HLL_PRECISION
+    rest = x & ((1 << rest_bits) - 1)
+    return x >> rest_bits, rest_bits - rest.bit_length() + 1
+
+
+SAMPLE_COLUMNS = ("game_id", "player_id", "won", "attempts_used", "wrong_guesses", "duration_sec", "timestamp")
+
+
+def _rebuild_sketches(conn, after_id: int | None = None):
+    source = _games_source(conn, after_id)
+    if after_id is None:
+        conn.execute("DELETE FROM sample_games")
+        conn.execute("DELETE FROM hll_players")
+        # ORDER BY random() is a uniform sample, the state reservoir sampling keeps.
+        conn.execute(
+            f"""
+            INSERT INTO sample_games (slot, {', '.join(SAMPLE_COLUMNS)})
+            SELECT row_number() OVER () - 1, {', '.join(("id", *SAMPLE_COLUMNS[1:]))}
+            FROM (SELECT * FROM {source} ORDER BY random() LIMIT ?)
+            """,
+            (RESERVOIR_SIZE,),
+        )
+        conn.execute(f"UPDATE sample_state SET seen = (SELECT COUNT(*) FROM {source})")
+    else:
+        # Algorithm R (see _update_sketches) over the new games at once; a
+        # later game taking the same slot replaces the earlier one.
+        ids = np.array([row[0] for row in conn.execute(f"SELECT id FROM {source} ORDER BY id")], dtype=np.int64)
+        seen = conn.execute("SELECT seen FROM sample_state").fetchone()[0]
+        n = np.arange(seen + 1, seen + len(ids) + 1)
+        slots = np.where(n <= RESERVOIR_SIZE, n - 1, (np.random.random(len(ids)) * n).astype(np.int64))
+        kept = slots < RESERVOIR_SIZE
+        chosen = dict(zip(ids[kept].tolist(), slots[kept].tolist()))
+        rows = conn.execute(
+            f"SELECT {', '.join(('id', *SAMPLE_COLUMNS[1:]))} FROM {source} WHERE id IN "
+            f"({', '.join(map(str, chosen))}) ORDER BY id"
+        ) if chosen else ()
+        conn.executemany(
+            f"INSERT OR REPLACE INTO sample_games (slot, {', '.join(SAMPLE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((chosen[row[0]], *row) for row in rows),
+        )
+        conn.execute("UPDATE sample_state SET seen = seen + ?", (len(ids),))
+
+    registers = {}
+    names = conn.execute(f"SELECT name FROM players WHERE id IN (SELECT DISTINCT player_id FROM {source})")
+    for (name,) in names:
+        register, rank = hll_register(name)
+        registers[register] = max(rank, registers.get(register, 0))
+    conn.executemany(
+        """
+        INSERT INTO hll_players (register, rank) VALUES (?, ?)
+        ON CONFLICT (register) DO UPDATE SET rank = max(rank, excluded.rank)
+        """,
+        registers.items(),
+    )
+
+
+_LOG_GAMMA = math.log((1 + QUANTILE_ACCURACY) / (1 - QUANTILE_ACCURACY))
+ZERO_BUCKET = -(2**31)
+
+
+def quantile_bucket(metric: str, value: float) -> int:
+    """
+    Sketch bucket of a player's metric value. Win rate uses fixed 0.5%-point
+    buckets; the averages use logarithmic buckets (DDSketch), so any value is
+    within QUANTILE_ACCURACY of its bucket's representative.
+    """
+    if metric == "win_rate":
+        return min(int(value * 2), 200)
+    if value <= 0:
+        return ZERO_BUCKET
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def player_metrics(stats) -> dict:
+    """{metric: value or None} from a player_stats (games, wins, attempts_sum, ...) tuple."""
+    if stats is None or stats[0] < PERCENTILE_MIN_GAMES:
+        return dict.fromkeys(PERCENTILE_METRICS)
+    games, wins, attempts_sum, attempts_games, duration_sum, duration_games = stats
+    return {
+        "win_rate": wins / games * 100,
+        "avg_attempts": attempts_sum / attempts_games if attempts_games else None,
+        "avg_duration": duration_sum / duration_games if duration_games else None,
+    }
+
+
+PLAYER_STATS_COLUMNS = ("games", "wins", "attempts_sum", "attempts_games", "duration_sum", "duration_games")
+
+
+def _rebuild_percentiles(conn, after_id: int | None = None):
+    if after_id is None:
+        conn.execute("DELETE FROM player_stats")
+    conn.execute("DELETE FROM quantile_buckets")
+    conn.execute(
+        f"""
+        INSERT INTO player_stats (
+            player_id, games, wins, attempts_sum, attempts_games, duration_sum, duration_games, perfects
+        )
+        SELECT player_id, COUNT(*), SUM(won),
+               COALESCE(SUM(attempts_used), 0), COUNT(attempts_used),
+               COALESCE(SUM(duration_sec), 0), COUNT(duration_sec),
+               COUNT(CASE WHEN won = 1 AND wrong_guesses = 0 THEN 1 END)
+        FROM {_games_source(conn, after_id)} WHERE player_id IS NOT NULL
+        GROUP BY player_id
+        ON CONFLICT (player_id) DO UPDATE SET
+            games = games + excluded.games,
+            wins = wins + excluded.wins,
+            attempts_sum = attempts_sum + excluded.attempts_sum,
+            attempts_games = attempts_games + excluded.attempts_games,
+            duration_sum = duration_sum + excluded.duration_sum,
+            duration_games = duration_games + excluded.duration_games,
+            perfects = perfects + excluded.perfects
+        """
+    )
+    counts = {}
+    for stats in conn.execute(f"SELECT {', '.join(PLAYER_STATS_COLUMNS)} FROM player_stats"):
+        for metric, value in player_metrics(stats).items():
+            if value is not None:
+                key = (metric, quantile_bucket(metric, value))
+                counts[key] = counts.get(key, 0) + 1
+    conn.executemany(
+        "INSERT INTO quantile_buckets (metric, bucket, players) VALUES (?, ?, ?)",
+        ((metric, bucket, n) for (metric, bucket), n in counts.items()),
+    )
+
+
+@metrics.timed("storage.rebuild_sketches")
+def rebuild_sketches():
+    """
+    Redraw the game sample and recompute the player HyperLogLog, per-player
+    sums and percentile buckets from games, hot and cold.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn)
+        conn.execute("BEGIN")
+        _rebuild_sketches(conn)
+        _rebuild_percentiles(conn)
+        conn.commit()
+
+
+def _update_percentiles(conn, game: dict):
+    if game["player_id"] is None:
+        return
+    row = conn.execute(
+        f"SELECT {', '.join(PLAYER_STATS_COLUMNS)}, perfects FROM player_stats WHERE player_id = ?",
+        (game["player_id"],),
+    ).fetchone()
+    old, perfects = (row[:-1], row[-1]) if row else (None, 0)
+    games, wins, attempts_sum, attempts_games, duration_sum, duration_games = old or (0, 0, 0, 0, 0.0, 0)
+    new = (
+        games + 1,
+        wins + game["won"],
+        attempts_sum + (game["attempts_used"] or 0),
+        attempts_games + (game["attempts_used"] is not None),
+        duration_sum + (game["duration_sec"] or 0.0),
+        duration_games + (game["duration_sec"] is not None),
+    )
+    perfects += game["won"] == 1 and game["wrong_guesses"] == 0
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO player_stats (player_id, {', '.join(PLAYER_STATS_COLUMNS)}, perfects)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (game["player_id"], *new, perfects),
+    )
+
+    before, after = player_metrics(old), player_metrics(new)
+    for metric in PERCENTILE_METRICS:
+        old_bucket = quantile_bucket(metric, before[metric]) if before[metric] is not None else None
+        new_bucket = quantile_bucket(metric, after[metric]) if after[metric] is not None else None
+        if old_bucket == new_bucket:
+            continue
+        if old_bucket is not None:
+            conn.execute(
+                "UPDATE quantile_buckets SET players = players - 1 WHERE metric = ? AND bucket = ?",
+                (metric, old_bucket),
             )
-            """
+        if new_bucket is not None:
+            conn.execute(
+                """
+                INSERT INTO quantile_buckets (metric, bucket, players) VALUES (?, ?, 1)
+                ON CONFLICT (metric, bucket) DO UPDATE SET players = players + 1
+                """,
+                (metric, new_bucket),
+            )
+
+
+def _update_sketches(conn, game: dict):
+    # Algorithm R: the n-th game replaces a random slot with probability k/n.
+    seen = conn.execute("UPDATE sample_state SET seen = seen + 1 RETURNING seen").fetchone()[0]
+    slot = seen - 1 if seen <= RESERVOIR_SIZE else random.randrange(seen)
+    if slot < RESERVOIR_SIZE:
+        conn.execute(
+            f"INSERT OR REPLACE INTO sample_games (slot, {', '.join(SAMPLE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (slot, game["id"], *(game[c] for c in SAMPLE_COLUMNS[1:])),
         )
+
+    if game["player_id"] is None:
+        return
+    name = conn.execute("SELECT name FROM players WHERE id = ?", (game["player_id"],)).fetchone()[0]
+    conn.execute(
+        """
+        INSERT INTO hll_players (register, rank) VALUES (?, ?)
+        ON CONFLICT (register) DO UPDATE SET rank = max(rank, excluded.rank)
+        """,
+        hll_register(name),
+    )
+
+
+def rate_game(player: tuple, word: tuple, won: int, max_lives) -> tuple[float, float]:
+    """
+    New (player rating, word rating) after one game, given (rating, games)
+    for each side. Fewer lives than BASELINE_LIVES count as a stronger word.
+    """
+    (player_rating, player_games), (word_rating, word_games) = player, word
+    handicap = RATING_PER_LIFE * (BASELINE_LIVES - (max_lives or BASELINE_LIVES))
+    expected = 1 / (1 + 10 ** ((word_rating + handicap - player_rating) / 400))
+    surprise = won - expected
+    player_k = PROVISIONAL_K if player_games < PROVISIONAL_GAMES else RATING_K
+    word_k = PROVISIONAL_K if word_games < PROVISIONAL_GAMES else RATING_K
+    return player_rating + player_k * surprise, word_rating - word_k * surprise
+
+
+def _rebuild_ratings(conn, after_id: int | None = None):
+    if after_id is None:
+        conn.execute("DELETE FROM player_ratings")
+        conn.execute("DELETE FROM word_ratings")
+    players = {row[0]: row[1:] for row in conn.execute("SELECT player_id, rating, games FROM player_ratings")}
+    words = {row[0]: row[1:] for row in conn.execute("SELECT word_id, rating, games FROM word_ratings")}
+    games = conn.execute(
+        f"SELECT player_id, word_id, won, max_lives FROM {_games_source(conn, after_id)} ORDER BY timestamp, id"
+    )
+    for player_id, word_id, won, max_lives in games:
+        if player_id is None or word_id is None:
+            continue
+        player = players.get(player_id, (INITIAL_RATING, 0))
+        word = words.get(word_id, (INITIAL_RATING, 0))
+        player_rating, word_rating = rate_game(player, word, won, max_lives)
+        players[player_id] = (player_rating, player[1] + 1)
+        words[word_id] = (word_rating, word[1] + 1)
+    conn.executemany(
+        "INSERT OR REPLACE INTO player_ratings (player_id, rating, games) VALUES (?, ?, ?)",
+        ((k, *v) for k, v in players.items()),
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO word_ratings (word_id, rating, games) VALUES (?, ?, ?)",
+        ((k, *v) for k, v in words.items()),
+    )
+
+
+@metrics.timed("storage.rebuild_ratings")
+def rebuild_ratings():
+    """Replay every game (hot and cold) in play order, oldest first, into fresh player and word ratings."""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn)
+        conn.execute("BEGIN")
+        _rebuild_ratings(conn)
         conn.commit()
 
 
+def _update_ratings(conn, game: dict):
+    if game["player_id"] is None or game["word_id"] is None:
+        return
+    row = conn.execute("SELECT rating, games FROM player_ratings WHERE player_id = ?", (game["player_id"],))
+    player = row.fetchone() or (INITIAL_RATING, 0)
+    row = conn.execute("SELECT rating, games FROM word_ratings WHERE word_id = ?", (game["word_id"],))
+    word = row.fetchone() or (INITIAL_RATING, 0)
+    player_rating, word_rating = rate_game(player, word, game["won"], game["max_lives"])
+    conn.execute(
+        "INSERT OR REPLACE INTO player_ratings (player_id, rating, games) VALUES (?, ?, ?)",
+        (game["player_id"], player_rating, player[1] + 1),
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO word_ratings (word_id, rating, games) VALUES (?, ?, ?)",
+        (game["word_id"], word_rating, word[1] + 1),
+    )
+
+
+def _update_word_stats(conn, game: dict):
+    if game["word_id"] is None:
+        return
+    conn.execute(
+        """
+        INSERT INTO word_stats (word_id, plays, wins, wrong_sum, wrong_games, duration_sum, duration_games)
+        VALUES (:word_id, 1, :won, COALESCE(:wrong_guesses, 0), :wrong_guesses IS NOT NULL,
+                COALESCE(:duration_sec, 0), :duration_sec IS NOT NULL)
+        ON CONFLICT (word_id) DO UPDATE SET
+            plays = plays + 1,
+            wins = wins + excluded.wins,
+            wrong_sum = wrong_sum + excluded.wrong_sum,
+            wrong_games = wrong_games + excluded.wrong_games,
+            duration_sum = duration_sum + excluded.duration_sum,
+            duration_games = duration_games + excluded.duration_games
+        """,
+        game,
+    )
+
+
+def _update_user_features(conn, game: dict):
+    if game["player_id"] is None or game["word_id"] is None:
+        return
+    word = conn.execute("SELECT word FROM words WHERE id = ?", (game["word_id"],)).fetchone()[0]
+    row = conn.execute("SELECT features FROM user_features WHERE player_id = ?", (game["player_id"],)).fetchone()
+    features = np.frombuffer(row[0], dtype=FEATURE_DTYPE) if row else 0
+    conn.execute(
+        "INSERT OR REPLACE INTO user_features (player_id, features) VALUES (?, ?)",
+        (game["player_id"], (features + user_feature_delta(word, game["won"])).tobytes()),
+    )
+
+
+# Called with (conn, game) inside log_game's transaction; `game` holds the
+# inserted games row (ids, not strings) plus its new "id".
+WRITE_HOOKS = [
+    _update_rollups,
+    _update_word_stats,
+    _update_user_features,
+    _update_sketches,
+    _update_percentiles,
+    _update_ratings,
+]
+
+
+@metrics.timed("storage.log_game")
 def log_game(
     username: str,
     word: str,
@@ -42,102 +1050,864 @@ def log_game(
     remaining_lives: int,
     duration_sec: float | None = None,
     category: str | None = None,
-):
+    game_uuid: str | None = None,
+) -> int | None:
     """
-    Insert a finished game into the database.
+    Insert a finished game and update everything derived from it; returns
+    the new games.id.
 
-    Handles different schemas gracefully:
-    - with word_length + category
-    - with word_length only
-    - with neither (oldest schema)
+    `game_uuid` makes the write idempotent: logging a UUID that is already
+    stored is a no-op that returns None, so retries and racing reruns never
+    count a game twice. Without one the game gets a random UUID.
     """
-    timestamp = datetime.datetime.utcnow().isoformat()
-    word_length = len(word) if word else 0
+    game_uuid = uuid.UUID(game_uuid) if game_uuid else uuid.uuid4()
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        # Take the write lock up front: the lookups read before they insert,
+        # and two racing writers must not both see a new name as missing.
+        conn.execute("BEGIN IMMEDIATE")
+        game = {
+            "player_id": _lookup_id(conn, "players", "name", username),
+            "word_id": _lookup_id(conn, "words", "word", word, length=len(word or "")),
+            "category_id": _lookup_id(conn, "categories", "name", category),
+            "won": 1 if won else 0,
+            "attempts_used": attempts_used,
+            "wrong_guesses": wrong_guesses,
+            "max_lives": max_lives,
+            "remaining_lives": remaining_lives,
+            "duration_sec": duration_sec,
+            "timestamp": now_ms(),
+            "uuid": game_uuid.bytes,
+        }
+        cur = conn.execute(
+            f"""
+            INSERT INTO games ({', '.join(game)}) VALUES ({', '.join('?' * len(game))})
+            ON CONFLICT (uuid) DO NOTHING
+            """,
+            tuple(game.values()),
+        )
+        if cur.rowcount == 0:
+            conn.rollback()  # drops any lookup rows inserted above
+            return None
+        game["id"] = cur.lastrowid
+        for hook in WRITE_HOOKS:
+            hook(conn, game)
+        conn.commit()
+        return game["id"]
+
+
+# Games as import_games takes them: strings instead of lookup ids, epoch-ms
+# timestamp and the 16-byte UUID (None when the source has none).
+IMPORT_COLUMNS = (
+    "username", "word", "category", "won", "attempts_used", "wrong_guesses",
+    "max_lives", "remaining_lives", "duration_sec", "timestamp", "uuid",
+)
+# Recreated from INDEXES_DDL after a bulk insert; idx_games_uuid stays, it
+# is what deduplicates.
+DEFERRED_INDEXES = ("idx_games_timestamp", "idx_games_player_timestamp")
+IMPORT_CACHE_KIB = 256 * 1024  # page cache for the import's sorts and index builds
+
 
+@metrics.timed("storage.import_games")
+def import_games(chunks, defer_indexes: bool = True) -> dict:
+    """
+    Bulk-load games from an iterable of row lists (IMPORT_COLUMNS order) and
+    return {"read", "inserted", "duplicates"}. A game whose UUID is already
+    stored, hot or cold, or repeated in the input, is skipped, so importing
+    the same file twice adds nothing. Rows without a UUID get content_uuid()
+    and are also skipped when a stored game has the same player, word and
+    timestamp (a file's rounded durations need not hash like the stored game).
+
+    Rows are staged in a temp table with chunked executemany before the
+    write lock is taken; the merge into games is then one transaction with
+    the timestamp indexes dropped and rebuilt afterwards (`defer_indexes`),
+    and the new games are added to every derived table with one set-based
+    pass per table instead of WRITE_HOOKS per game. Ratings are replayed
+    from scratch when the file holds games older than the newest stored
+    one, so they match rebuild_ratings().
+    """
+    placeholders = ", ".join("?" * len(IMPORT_COLUMNS))
     with closing(sqlite3.connect(DB_PATH)) as conn:
-        cur = conn.cursor()
+        conn.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KIB}")
+        has_cold = _attach_cold(conn)
+        conn.execute(f"CREATE TEMP TABLE staging ({', '.join(IMPORT_COLUMNS)}, derived)")
+        read = 0
+        for chunk in chunks:
+            conn.executemany(
+                f"INSERT INTO temp.staging VALUES ({placeholders}, ?)",
+                ((*row, 0) if row[-1] else (*row[:-1], content_uuid(*row[:-1]).bytes, 1) for row in chunk),
+            )
+            read += len(chunk)
+        conn.commit()
 
-        # 1) Try full modern schema: word_length + category
-        try:
-            cur.execute(
-                """
-                INSERT INTO games (
-                    username, word, word_length, category, won,
-                    attempts_used, wrong_guesses,
-                    max_lives, remaining_lives, duration_sec, timestamp
+        conn.execute("BEGIN IMMEDIATE")
+        for tier in ("main", "cold") if has_cold else ("main",):
+            conn.execute(f"DELETE FROM temp.staging WHERE uuid IN (SELECT uuid FROM {tier}.games)")
+            conn.execute(
+                f"""
+                DELETE FROM temp.staging WHERE derived AND EXISTS (
+                    SELECT 1 FROM {tier}.games g
+                    WHERE g.player_id = (SELECT id FROM players WHERE name = staging.username)
+                      AND g.timestamp = staging.timestamp
+                      AND g.word_id IS (SELECT id FROM words WHERE word = staging.word)
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    username,
-                    word,
-                    word_length,
-                    category,
-                    won,
-                    attempts_used,
-                    wrong_guesses,
-                    max_lives,
-                    remaining_lives,
-                    duration_sec,
-                    timestamp,
-                ),
+                """
             )
-        except Exception:
-            # 2) Try schema with word_length but no category
-            try:
-                cur.execute(
-                    """
-                    INSERT INTO games (
-                        username, word, word_length, won,
-                        attempts_used, wrong_guesses,
-                        max_lives, remaining_lives, duration_sec, timestamp
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    ,
-                    (
-                        username,
-                        word,
-                        word_length,
-                        won,
-                        attempts_used,
-                        wrong_guesses,
-                        max_lives,
-                        remaining_lives,
-                        duration_sec,
-                        timestamp,
-                    ),
-                )
-            except Exception:
-                # 3) Oldest schema: no word_length, no category
-                cur.execute(
-                    """
-                    INSERT INTO games (
-                        username, word, won,
-                        attempts_used, wrong_guesses,
-                        max_lives, remaining_lives, duration_sec, timestamp
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        username,
-                        word,
-                        won,
-                        attempts_used,
-                        wrong_guesses,
-                        max_lives,
-                        remaining_lives,
-                        duration_sec,
-                        timestamp,
-                    ),
-                )
+        conn.execute("INSERT OR IGNORE INTO players (name) SELECT DISTINCT username FROM temp.staging WHERE username IS NOT NULL")
+        conn.execute(
+            "INSERT OR IGNORE INTO words (word, length) "
+            "SELECT word, LENGTH(word) FROM temp.staging WHERE word IS NOT NULL GROUP BY word"
+        )
+        conn.execute("INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM temp.staging WHERE category IS NOT NULL")
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'games'").fetchone()
+        last_id = row[0] if row else 0
+        tiers = ("main", "cold") if has_cold else ("main",)
+        newest = conn.execute(
+            "SELECT MAX(timestamp) FROM ("
+            + " UNION ALL ".join(f"SELECT MAX(timestamp) AS timestamp FROM {tier}.games" for tier in tiers)
+            + ")"
+        ).fetchone()[0]
+
+        if defer_indexes:
+            for index in DEFERRED_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS main.{index}")
+        # Oldest first, so ids follow play order like logged games.
+        inserted = conn.execute(
+            f"""
+            INSERT INTO games ({', '.join(GAME_COLUMNS[1:])})
+            SELECT p.id, w.id, c.id, s.won, s.attempts_used, s.wrong_guesses,
+                   s.max_lives, s.remaining_lives, s.duration_sec, s.timestamp, s.uuid
+            FROM temp.staging s
+            LEFT JOIN players p ON p.name = s.username
+            LEFT JOIN words w ON w.word = s.word
+            LEFT JOIN categories c ON c.name = s.category
+            WHERE true
+            ORDER BY s.timestamp
+            ON CONFLICT (uuid) DO NOTHING
+            """
+        ).rowcount
+        if defer_indexes:
+            _execute_statements(conn, INDEXES_DDL)
 
+        if inserted:
+            for merge in (_rebuild_rollups, _rebuild_word_stats, _rebuild_user_features,
+                          _rebuild_sketches, _rebuild_percentiles):
+                merge(conn, after_id=last_id)
+            # Ratings depend on play order: games older than the newest stored
+            # one mean replaying everything, as rebuild_ratings() would.
+            oldest_new = conn.execute("SELECT MIN(timestamp) FROM games WHERE id > ?", (last_id,)).fetchone()[0]
+            _rebuild_ratings(conn, after_id=last_id if newest is None or oldest_new >= newest else None)
         conn.commit()
+    return {"read": read, "inserted": inserted, "duplicates": read - inserted}
 
 
-def fetch_all_games():
-    """Return all games as a list of dicts."""
+def _games_filter(username, start_ms, end_ms, after_id=None, prefix="", schema="main"):
+    """WHERE clause + params shared by the game queries (`schema`: whose players table)."""
+    clauses, params = [], []
+    if after_id is not None:
+        clauses.append(f"{prefix}id > ?")
+        params.append(after_id)
+    if username is not None:
+        clauses.append(f"{prefix}player_id = (SELECT id FROM {schema}.players WHERE name = ?)")
+        params.append(username)
+    if start_ms is not None:
+        clauses.append(f"{prefix}timestamp >= ?")
+        params.append(start_ms)
+    if end_ms is not None:
+        clauses.append(f"{prefix}timestamp < ?")
+        params.append(end_ms)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+@metrics.timed("storage.fetch_games")
+def fetch_games(
+    username: str | None = None,
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+):
+    """
+    Return games as a list of dicts, oldest first.
+
+    `start_ms` is inclusive and `end_ms` exclusive; both filters (and the
+    username filter) are answered from the timestamp indexes.
+    """
+    where, params = _games_filter(username, start_ms, end_ms, prefix="g.")
     with closing(sqlite3.connect(DB_PATH)) as conn:
         conn.row_factory = sqlite3.Row
-        rows = conn.execute("SELECT * FROM games ORDER BY timestamp ASC").fetchall()
+        rows = conn.execute(f"{NAMED_SELECT} {where} ORDER BY g.timestamp ASC", params).fetchall()
         return [dict(r) for r in rows]
+
+
+def iter_games(after_id: int = 0, through_id: int | None = None, chunk_size: int = 50_000):
+    """
+    Yield lists of decoded game tuples (NAMED_COLUMNS order) with ids in
+    (after_id, through_id], `chunk_size` rows at a time, in id order. Reads
+    both tiers, so games moved cold before the Parquet compaction reached
+    them are still compacted.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn)
+        named_select = NAMED_SELECT.replace("FROM games g", f"FROM {_all_games(conn)} g")
+        cur = conn.execute(
+            f"{named_select} WHERE g.id > ? AND g.id <= ? ORDER BY g.id ASC",
+            (after_id, through_id if through_id is not None else 2**63 - 1),
+        )
+        while chunk := cur.fetchmany(chunk_size):
+            yield chunk
+
+
+def last_id_before(until_ms: int, after_id: int = 0) -> int:
+    """Largest id such that every game in (after_id, id] is older than `until_ms`."""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn)
+        source = _all_games(conn)
+        first_new = conn.execute(
+            f"SELECT MIN(id) FROM {source} WHERE id > ? AND timestamp >= ?", (after_id, until_ms)
+        ).fetchone()[0]
+        if first_new is not None:
+            return first_new - 1
+        return conn.execute(f"SELECT MAX(id) FROM {source}").fetchone()[0] or after_id
+
+
+@metrics.timed("storage.fetch_games_encoded")
+def fetch_games_encoded(
+    username: str | None = None,
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+    after_id: int | None = None,
+    include_cold: bool = False,
+):
+    """
+    Return (rows, dictionaries) without decoding any strings.
+
+    `rows` are tuples in ENCODED_COLUMNS order, oldest first. `dictionaries`
+    maps "players" / "categories" to (id, name) pairs and "words" to
+    (id, word, length) triples, each sorted by name. `after_id` keeps only
+    games with a larger id (e.g. those not yet in the Parquet archive).
+    Only hot games are read unless `include_cold`.
+    """
+    where, params = _games_filter(username, start_ms, end_ms, after_id=after_id)
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        source = _all_games(conn) if include_cold and _attach_cold(conn) else "games"
+        rows = conn.execute(
+            f"SELECT {', '.join(ENCODED_COLUMNS)} FROM {source} {where} ORDER BY timestamp ASC",
+            params,
+        ).fetchall()
+        dictionaries = {
+            "players": conn.execute("SELECT id, name FROM players ORDER BY name").fetchall(),
+            "words": conn.execute("SELECT id, word, length FROM words ORDER BY word").fetchall(),
+            "categories": conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall(),
+        }
+        return rows, dictionaries
+
+
+@metrics.timed("storage.fetch_all_games")
+def fetch_all_games():
+    """Return all games as a list of dicts."""
+    return fetch_games()
+
+
+def latest_game_id(username: str | None = None) -> int:
+    """
+    Id of the newest game (0 when empty); changes whenever a game is logged.
+    With `username`, the newest of that player's hot games, so a data version
+    for per-player results that other players' games leave alone.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        if username is not None:
+            # Covered by idx_games_player_timestamp: a scan of this player's index entries.
+            row = conn.execute(
+                "SELECT MAX(id) FROM games WHERE player_id = (SELECT id FROM players WHERE name = ?)", (username,)
+            ).fetchone()
+            return row[0] or 0
+        # The AUTOINCREMENT counter, which survives moving every game cold.
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'games'").fetchone()
+        return row[0] if row else 0
+
+
+@metrics.timed("storage.player_names")
+def player_names(federated: bool = False):
+    """Names of every player with at least one game (hot or cold; on any node if `federated`), sorted."""
+    with _nodes(federated) as (conn, nodes):
+        branches = " UNION ".join(
+            f"SELECT name FROM {schema}.players WHERE id IN (SELECT player_id FROM {schema}.player_stats)"
+            for schema, _ in nodes
+        )
+        return [name for (name,) in conn.execute(f"{branches} ORDER BY name")]
+
+
+@metrics.timed("storage.games_time_range")
+def games_time_range(include_cold: bool = False, federated: bool = False):
+    """
+    (min, max) game timestamp in epoch ms, or (None, None) when empty.
+    `federated` covers the hot games of every node (`include_cold` is ignored).
+    """
+    if federated:
+        with _nodes(True) as (conn, nodes):
+            branches = " UNION ALL ".join(
+                f"SELECT MIN(timestamp) AS lo, MAX(timestamp) AS hi FROM {schema}.games" for schema, _ in nodes
+            )
+            return conn.execute(f"SELECT MIN(lo), MAX(hi) FROM ({branches})").fetchone()
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        source = _all_games(conn) if include_cold and _attach_cold(conn) else "games"
+        return conn.execute(f"SELECT MIN(timestamp), MAX(timestamp) FROM {source}").fetchone()
+
+
+@metrics.timed("storage.fetch_game_uuids")
+def fetch_game_uuids(ids) -> dict:
+    """{games.id: 16-byte UUID} for the given game ids, hot and cold."""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn)
+        # A temp table of just these ids: the IN reaches both tiers' primary keys.
+        conn.execute("CREATE TEMP TABLE wanted_ids (id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT OR IGNORE INTO temp.wanted_ids VALUES (?)", ((int(i),) for i in ids))
+        return dict(conn.execute(f"SELECT id, uuid FROM {_all_games(conn)} WHERE id IN temp.wanted_ids"))
+
+
+@metrics.timed("storage.fetch_hourly_rollup")
+def fetch_hourly_rollup(username: str):
+    """[(hour, games, wins)] for a player, by UTC hour of day."""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        return conn.execute(
+            """
+            SELECT r.hour, r.games, r.wins FROM rollup_user_hour r
+            JOIN players p ON p.id = r.player_id
+            WHERE p.name = ? ORDER BY r.hour
+            """,
+            (username,),
+        ).fetchall()
+
+
+@metrics.timed("storage.fetch_daily_rollup")
+def fetch_daily_rollup(username: str):
+    """[(day, games, wins)] for a player, oldest day first (day = epoch ms // MS_PER_DAY)."""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        return conn.execute(
+            """
+            SELECT r.day, r.games, r.wins FROM rollup_user_day r
+            JOIN players p ON p.id = r.player_id
+            WHERE p.name = ? ORDER BY r.day
+            """,
+            (username,),
+        ).fetchall()
+
+
+@metrics.timed("storage.fetch_sketches")
+def fetch_sketches():
+    """
+    (seen, sample, registers): games logged so far, the reservoir sample as
+    (username, *SAMPLE_COLUMNS[2:]) tuples and the HLL {register: rank}.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        seen = conn.execute("SELECT seen FROM sample_state").fetchone()[0]
+        sample = conn.execute(
+            f"""
+            SELECT p.name, {', '.join('s.' + c for c in SAMPLE_COLUMNS[2:])}
+            FROM sample_games s LEFT JOIN players p ON p.id = s.player_id
+            """
+        ).fetchall()
+        registers = dict(conn.execute("SELECT register, rank FROM hll_players"))
+        return seen, sample, registers
+
+
+@metrics.timed("storage.fetch_percentile_counts")
+def fetch_percentile_counts(username: str):
+    """
+    {metric: (value, below, same, total)} for a ranked player: their value
+    and how many ranked players fall in lower buckets, the same bucket and
+    overall. Empty when the player is not ranked yet.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        stats = conn.execute(
+            f"""
+            SELECT {', '.join('s.' + c for c in PLAYER_STATS_COLUMNS)} FROM player_stats s
+            JOIN players p ON p.id = s.player_id WHERE p.name = ?
+            """,
+            (username,),
+        ).fetchone()
+        counts = {}
+        for metric, value in player_metrics(stats).items():
+            if value is None:
+                continue
+            bucket = quantile_bucket(metric, value)
+            below, same, total = conn.execute(
+                """
+                SELECT
+                    COALESCE(SUM(CASE WHEN bucket < ? THEN players END), 0),
+                    COALESCE(SUM(CASE WHEN bucket = ? THEN players END), 0),
+                    COALESCE(SUM(players), 0)
+                FROM quantile_buckets WHERE metric = ?
+                """,
+                (bucket, bucket, metric),
+            ).fetchone()
+            counts[metric] = (value, below, same, total)
+        return counts
+
+
+@metrics.timed("storage.fetch_rating_leaderboard")
+def fetch_rating_leaderboard(limit: int | None = None, min_games: int = 1):
+    """
+    [(username, rating, games)] from the highest rating down. Ratings are
+    this node's only: Elo ratings kept on separate nodes do not combine, so
+    ratings over every node's games come from merge-shards, which replays
+    the merged games into this node's ratings.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        return conn.execute(
+            """
+            SELECT p.name, r.rating, r.games FROM player_ratings r
+            JOIN players p ON p.id = r.player_id
+            WHERE r.games >= ?
+            ORDER BY r.rating DESC
+            LIMIT ?
+            """,
+            (min_games, -1 if limit is None else limit),
+        ).fetchall()
+
+
+WORD_STATS_SELECT = """
+SELECT
+    w.word, s.plays, s.wins,
+    CAST(s.wrong_sum AS REAL) / NULLIF(s.wrong_games, 0) AS mean_wrong,
+    s.duration_sum / NULLIF(s.duration_games, 0) AS mean_duration,
+    r.rating
+FROM word_stats s
+JOIN words w ON w.id = s.word_id
+LEFT JOIN word_ratings r ON r.word_id = s.word_id
+"""
+
+# Columns returned by fetch_hardest_words() / fetch_word_stats(), in order.
+WORD_STATS_COLUMNS = ("word", "plays", "wins", "mean_wrong", "mean_duration", "rating")
+
+
+@metrics.timed("storage.fetch_hardest_words")
+def fetch_hardest_words(limit: int = 20, min_plays: int = 1):
+    """Top `limit` words by loss rate (WORD_STATS_COLUMNS tuples), walked off the loss-rate index."""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        return conn.execute(
+            f"""
+            {WORD_STATS_SELECT}
+            WHERE s.plays >= ?
+            ORDER BY (s.plays - s.wins) * 1.0 / s.plays DESC, s.plays DESC
+            LIMIT ?
+            """,
+            (min_plays, limit),
+        ).fetchall()
+
+
+@metrics.timed("storage.fetch_word_stats")
+def fetch_word_stats(words: list[str]):
+    """
+    {word: (plays, wins, mean_wrong, mean_duration, rating)} for the given
+    words that have been played, by primary-key lookups only.
+    """
+    stats = {}
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        # Stay under SQLite's bound-parameter limit.
+        for start in range(0, len(words), 500):
+            chunk = words[start:start + 500]
+            rows = conn.execute(
+                f"{WORD_STATS_SELECT} WHERE w.word IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            stats.update((row[0], row[1:]) for row in rows)
+    return stats
+
+
+@metrics.timed("storage.fetch_user_features")
+def fetch_user_features(username: str) -> np.ndarray:
+    """A player's USER_FEATURE_SIZE loss / play counts (zeros for a new player)."""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        row = conn.execute(
+            """
+            SELECT f.features FROM user_features f
+            JOIN players p ON p.id = f.player_id WHERE p.name = ?
+            """,
+            (username,),
+        ).fetchone()
+    if row is None:
+        return np.zeros(USER_FEATURE_SIZE, dtype=FEATURE_DTYPE)
+    return np.frombuffer(row[0], dtype=FEATURE_DTYPE)
+
+
+def encode_events(events: np.ndarray) -> bytes:
+    """EVENT_DTYPE records -> compressed column-by-column bytes."""
+    return zlib.compress(b"".join(events[name].tobytes() for name in EVENT_DTYPE.names), 6)
+
+
+def decode_events(data: bytes, count: int) -> np.ndarray:
+    raw = zlib.decompress(data)
+    events = np.empty(count, dtype=EVENT_DTYPE)
+    pos = 0
+    for name in EVENT_DTYPE.names:
+        size = EVENT_DTYPE[name].itemsize * count
+        events[name] = np.frombuffer(raw, dtype=EVENT_DTYPE[name], count=count, offset=pos)
+        pos += size
+    return events
+
+
+@metrics.timed("storage.append_events")
+def append_events(rows: list[tuple]) -> int:
+    """
+    Append one batch of events, given as (game, ts, username, word, kind,
+    letter, hit, lives) tuples with the letter as a character or None.
+    Returns the number written.
+    """
+    if not rows:
+        return 0
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute("BEGIN IMMEDIATE")  # see log_game
+        players = {"": 0, None: 0, **_lookup_ids(conn, "players", "name", {row[2] for row in rows} - {"", None})}
+        words = {"": 0, None: 0, **_lookup_ids(conn, "words", "word", {row[3] for row in rows} - {"", None})}
+        letters = {c: i for i, c in enumerate(LETTERS)}
+        events = np.array(
+            [
+                (game, ts, players[username], words[word], kind, letters.get(letter, NO_LETTER), hit, lives)
+                for game, ts, username, word, kind, letter, hit, lives in rows
+            ],
+            dtype=EVENT_DTYPE,
+        )
+        batch_id = conn.execute(
+            "INSERT INTO event_batches (first_ts, last_ts, events, data) VALUES (?, ?, ?, ?)",
+            (int(events["ts"].min()), int(events["ts"].max()), len(events), encode_events(events)),
+        ).lastrowid
+        _index_event_batch(conn, batch_id, events)
+        conn.commit()
+    return len(events)
+
+
+def _index_event_batch(conn, batch_id: int, events: np.ndarray):
+    conn.executemany(
+        "INSERT OR IGNORE INTO event_batch_players (player_id, batch_id) VALUES (?, ?)",
+        [(player_id, batch_id) for player_id in np.unique(events["player"]).tolist()],
+    )
+
+
+@metrics.timed("storage.fetch_events")
+def fetch_events(
+    username: str | None = None, start_ms: int | None = None, end_ms: int | None = None, after_batch: int = 0
+) -> tuple[int, np.ndarray]:
+    """
+    (last batch id, events): logged events as one EVENT_DTYPE array in
+    write order, optionally for one player and a [start_ms, end_ms) window,
+    from batches after `after_batch`. For one player only the batches
+    holding their events are decoded (event_batch_players), and whole
+    batches outside the window are skipped through their first / last
+    timestamps. The batch id lets a caller keep the array and later fetch
+    just the newer batches.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        # Bounded by the newest batch read first, so a batch written meanwhile is left for the next call.
+        last_batch = max(after_batch, conn.execute("SELECT COALESCE(MAX(id), 0) FROM event_batches").fetchone()[0])
+        clauses, params = ["id > ?", "id <= ?"], [after_batch, last_batch]
+        player_id = None
+        if username is not None:
+            row = conn.execute("SELECT id FROM players WHERE name = ?", (username,)).fetchone()
+            player_id = row[0] if row else -1
+            clauses.append("id IN (SELECT batch_id FROM event_batch_players WHERE player_id = ? AND batch_id > ?)")
+            params += [player_id, after_batch]
+        if start_ms is not None:
+            clauses.append("last_ts >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            clauses.append("first_ts < ?")
+            params.append(end_ms)
+        rows = conn.execute(
+            f"SELECT id, events, data FROM event_batches WHERE {' AND '.join(clauses)} ORDER BY id", params
+        ).fetchall()
+    batches = [decode_events(data, count) for _, count, data in rows]
+    events = np.concatenate(batches) if batches else np.empty(0, dtype=EVENT_DTYPE)
+    keep = np.ones(len(events), dtype=bool)
+    if player_id is not None:
+        keep &= events["player"] == player_id
+    if start_ms is not None:
+        keep &= events["ts"] >= start_ms
+    if end_ms is not None:
+        keep &= events["ts"] < end_ms
+    return last_batch, events if keep.all() else events[keep]
+
+
+@metrics.timed("storage.word_names")
+def word_names(ids) -> dict:
+    """{words.id: word} for the given ids."""
+    ids = sorted({int(i) for i in ids})
+    names = {}
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            names.update(conn.execute(f"SELECT id, word FROM words WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+    return names
+
+
+# Columns returned by fetch_player_totals(), in order.
+PLAYER_TOTALS_COLUMNS = ("username", "games", "wins", "perfects", "avg_attempts", "avg_duration", "win_rate")
+
+
+@metrics.timed("storage.fetch_player_totals")
+def fetch_player_totals(username: str | None = None, federated: bool = False):
+    """
+    Lifetime per-player totals (PLAYER_TOTALS_COLUMNS) from the player_stats
+    rollup, which keeps counting games after they move to the cold tier.
+    With `federated`, each shard adds the games (hot and cold) whose UUID is
+    not already stored here or on an earlier shard, so games copied between
+    nodes, e.g. by merge-shards, count once.
+    """
+    where, params = ("WHERE p.name = ?", [username]) if username is not None else ("", [])
+    with _nodes(federated, cold=federated) as (conn, nodes):
+        branches = [
+            f"""
+            SELECT p.name, s.games, s.wins, s.perfects, s.attempts_sum, s.attempts_games,
+                   s.duration_sum, s.duration_games
+            FROM player_stats s
+            JOIN players p ON p.id = s.player_id
+            {where}
+            """
+        ]
+        attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+        seen = [f"{schema}.games" for schema in ("main", "cold") if schema in attached]
+        for schema, _ in nodes[1:]:
+            tiers = [f"{name}.games" for name in (schema, f"{schema}_cold") if name in attached]
+            games = " UNION ALL ".join(
+                f"SELECT player_id, won, attempts_used, wrong_guesses, duration_sec, uuid FROM {table}"
+                for table in tiers
+            )
+            unseen = " AND ".join(f"NOT EXISTS (SELECT 1 FROM {table} WHERE uuid = g.uuid)" for table in seen)
+            branches.append(
+                f"""
+                SELECT p.name, COUNT(*), SUM(g.won),
+                       COUNT(CASE WHEN g.won = 1 AND g.wrong_guesses = 0 THEN 1 END),
+                       COALESCE(SUM(g.attempts_used), 0), COUNT(g.attempts_used),
+                       COALESCE(SUM(g.duration_sec), 0), COUNT(g.duration_sec)
+                FROM ({games}) g
+                JOIN {schema}.players p ON p.id = g.player_id
+                WHERE {unseen} {where.replace("WHERE", "AND")}
+                GROUP BY p.name
+                """
+            )
+            seen += tiers
+        return conn.execute(
+            f"""
+            SELECT name, SUM(games), SUM(wins), SUM(perfects),
+                   CAST(SUM(attempts_sum) AS REAL) / NULLIF(SUM(attempts_games), 0),
+                   SUM(duration_sum) / NULLIF(SUM(duration_games), 0),
+                   SUM(wins) * 100.0 / SUM(games)
+            FROM ({" UNION ALL ".join(branches)})
+            GROUP BY name
+            ORDER BY name
+            """,
+            params * len(branches),
+        ).fetchall()
+
+
+# --------------------------
+# Federation across nodes
+# --------------------------
+def shard_paths() -> list[Path]:
+    """Configured shard files that exist, except this node's own database."""
+    own = Path(DB_PATH).resolve()
+    return [path for path in SHARD_PATHS if path.exists() and path.resolve() != own]
+
+
+def _file_uri(path, **params) -> str:
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    return f"file:{quote(str(Path(path).resolve()))}" + (f"?{query}" if query else "")
+
+
+def _attach_shards(conn, cold: bool = False) -> list[tuple[str, str]]:
+    """
+    ATTACH every shard read-only as shard0, shard1, ... and return
+    [(schema, node)] for this database ("main", "local") and each shard on
+    the current schema version. An older shard is left out until its own
+    node migrates it, since a read-only attach cannot. With `cold`, each
+    shard's cold tier is attached too, as shard0_cold, ...; a shard whose
+    tiers no longer fit under SQLite's attach limit is left out whole.
+    """
+    nodes = [("main", "local")]
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    for i, path in enumerate(shard_paths()[:MAX_SHARDS]):
+        schema = f"shard{i}"
+        cold_path = path.with_name(path.stem + "_cold.db")
+        tiers = [(schema, path)] + ([(f"{schema}_cold", cold_path)] if cold and cold_path.exists() else [])
+        attached = sum(1 for row in conn.execute("PRAGMA database_list") if row[0] >= 2)
+        if attached + len(tiers) > limit:
+            break
+        for name, tier in tiers:
+            conn.execute(f"ATTACH DATABASE ? AS {name}", (_file_uri(tier, mode="ro"),))
+        if conn.execute(f"PRAGMA {schema}.user_version").fetchone()[0] < SCHEMA_VERSION:
+            for name, _ in tiers:
+                conn.execute(f"DETACH DATABASE {name}")
+            continue
+        nodes.append((schema, str(path)))
+    return nodes
+
+
+@contextmanager
+def _nodes(federated: bool, cold: bool = False):
+    """
+    (conn, [(schema, node)]): this database alone, or with every readable
+    shard attached. `cold` also attaches the cold tiers (`cold`, shardN_cold).
+    """
+    if not federated:
+        with closing(sqlite3.connect(DB_PATH)) as conn:
+            if cold:
+                _attach_cold(conn)
+            yield conn, [("main", "local")]
+        return
+    # URI filenames, so ATTACH can pass mode=ro.
+    with closing(sqlite3.connect(_file_uri(DB_PATH), uri=True)) as conn:
+        if cold:
+            _attach_cold(conn)
+        yield conn, _attach_shards(conn, cold)
+
+
+def federated_nodes() -> list[str]:
+    """The nodes federated reads cover: "local" plus each readable shard's path."""
+    with _nodes(True) as (_, nodes):
+        return [node for _, node in nodes]
+
+
+# NAMED_COLUMNS plus the game UUID and the node it came from; ids are per node.
+FEDERATED_COLUMNS = (*NAMED_COLUMNS, "uuid", "node")
+
+
+@metrics.timed("storage.fetch_games_federated")
+def fetch_games_federated(username: str | None = None, start_ms: int | None = None, end_ms: int | None = None):
+    """
+    Hot games of every node as FEDERATED_COLUMNS tuples, oldest first. The
+    filters run inside each node's branch of the UNION ALL, on its own
+    indexes; a game stored on several nodes (same UUID) is returned once.
+    """
+    with _nodes(True) as (conn, nodes):
+        branches, params = [], []
+        for schema, node in nodes:
+            where, branch_params = _games_filter(username, start_ms, end_ms, prefix="g.", schema=schema)
+            branches.append(
+                f"""
+                SELECT g.id, p.name, w.word, COALESCE(w.length, 0), c.name, g.won, g.attempts_used,
+                       g.wrong_guesses, g.max_lives, g.remaining_lives, g.duration_sec, g.timestamp,
+                       g.uuid, ?
+                FROM {schema}.games g
+                LEFT JOIN {schema}.players p ON p.id = g.player_id
+                LEFT JOIN {schema}.words w ON w.id = g.word_id
+                LEFT JOIN {schema}.categories c ON c.id = g.category_id
+                {where}
+                """
+            )
+            params += [node, *branch_params]
+        rows = conn.execute(f"{' UNION ALL '.join(branches)} ORDER BY 12", params).fetchall()
+    seen = set()
+    uuid_index = FEDERATED_COLUMNS.index("uuid")
+    unique = []
+    for row in rows:
+        key = row[uuid_index]
+        if key is None or key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+
+def iter_shard_games(path, chunk_size: int = 50_000):
+    """
+    Yield lists of IMPORT_COLUMNS tuples with every game in another node's
+    database and its cold tier (<stem>_cold.db next to it, if present),
+    opened read-only. Shards from before game UUIDs yield None for the UUID.
+    """
+    path = Path(path)
+    with closing(sqlite3.connect(_file_uri(path, mode="ro"), uri=True)) as conn:
+        schemas = ["main"]
+        cold = path.with_name(path.stem + "_cold.db")
+        if cold.exists():
+            conn.execute("ATTACH DATABASE ? AS cold", (_file_uri(cold, mode="ro"),))
+            schemas.append("cold")
+        has_uuid = "uuid" in {row[1] for row in conn.execute("PRAGMA main.table_info(games)")}
+        branches = " UNION ALL ".join(
+            f"""
+            SELECT p.name, w.word, c.name, g.won, g.attempts_used, g.wrong_guesses, g.max_lives,
+                   g.remaining_lives, g.duration_sec, g.timestamp, {'g.uuid' if has_uuid else 'NULL'}
+            FROM {schema}.games g
+            LEFT JOIN main.players p ON p.id = g.player_id
+            LEFT JOIN main.words w ON w.id = g.word_id
+            LEFT JOIN main.categories c ON c.id = g.category_id
+            """
+            for schema in schemas
+        )
+        cur = conn.execute(branches)
+        while chunk := cur.fetchmany(chunk_size):
+            yield chunk
+
+
+@metrics.timed("storage.merge_shards")
+def merge_shards(paths=None) -> list[dict]:
+    """
+    Copy every game of each shard (default: the configured ones) into this
+    database through import_games, so games already here, or merged from
+    another shard, are skipped. Returns one import_games result per shard,
+    with its "shard" path.
+    """
+    results = []
+    for path in shard_paths() if paths is None else [Path(p) for p in paths]:
+        result = import_games(iter_shard_games(path))
+        result["shard"] = str(path)
+        results.append(result)
+    return results
+
+
+@metrics.timed("storage.move_cold_games")
+def move_cold_games(older_than_ms: int, batch_size: int = 20_000, vacuum_pages: int = 2000) -> int:
+    """
+    Move games older than `older_than_ms` from games into the cold tier,
+    `batch_size` per transaction so writers wait at most one batch, and
+    return how many moved. Rollups are left alone (they keep counting the
+    moved games); afterwards up to `vacuum_pages` freed pages per batch
+    are returned to the filesystem with incremental vacuum.
+    """
+    moved = 0
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn, create=True)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS moving (id INTEGER PRIMARY KEY)")
+        columns = ", ".join(GAME_COLUMNS)
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM temp.moving")
+            count = conn.execute(
+                "INSERT INTO temp.moving SELECT id FROM main.games WHERE timestamp < ? ORDER BY timestamp LIMIT ?",
+                (older_than_ms, batch_size),
+            ).rowcount
+            if count == 0:
+                conn.rollback()
+                break
+            # Copy and delete commit together, so a game is never in both tiers. A
+            # game whose id or uuid the cold tier already has stops the move
+            # rather than being dropped from the hot table unseen.
+            try:
+                copied = conn.execute(
+                    f"INSERT INTO cold.games ({columns}) "
+                    f"SELECT {columns} FROM main.games WHERE id IN (SELECT id FROM temp.moving)"
+                ).rowcount
+            except sqlite3.IntegrityError as exc:
+                conn.rollback()
+                raise sqlite3.IntegrityError(f"cold tier already holds a game of this batch: {exc}") from exc
+            if copied != count:
+                conn.rollback()
+                raise RuntimeError(f"copied {copied} of {count} games to the cold tier; nothing moved")
+            conn.execute("DELETE FROM main.games WHERE id IN (SELECT id FROM temp.moving)")
+            conn.commit()
+            moved += count
+            conn.execute(f"PRAGMA main.incremental_vacuum({vacuum_pages})")
+    return moved
+
+
+@metrics.timed("storage.tier_sizes")
+def tier_sizes() -> dict:
+    """Games, file size and free pages of each tier."""
+    sizes = {}
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        _attach_cold(conn)
+        for _, name, path in conn.execute("PRAGMA database_list").fetchall():
+            if name == "temp":
+                continue
+            sizes[name] = {
+                "games": conn.execute(f"SELECT COUNT(*) FROM {name}.games").fetchone()[0],
+                "bytes": Path(path).stat().st_size,
+                "free_pages": conn.execute(f"PRAGMA {name}.freelist_count").fetchone()[0],
+            }
+    return sizes
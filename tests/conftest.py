@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import storage  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh hangman_scores.db (cold tier next to it, no shards) for one test."""
+    monkeypatch.setattr(storage, "DB_PATH", tmp_path / "hangman_scores.db")
+    monkeypatch.setattr(storage, "COLD_DB_PATH", None)
+    monkeypatch.setattr(storage, "SHARD_PATHS", [])
+    storage.init_db()
+    return storage.DB_PATH
+
+
+def hot_games(db_path) -> int:
+    import sqlite3
+
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
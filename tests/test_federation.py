@@ -0,0 +1,45 @@
+import uuid
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def shard(db, tmp_path, monkeypatch):
+    """A second node's database, configured as a shard of `db`."""
+    path = tmp_path / "node2.db"
+    monkeypatch.setattr(storage, "DB_PATH", path)
+    storage.init_db()
+    monkeypatch.setattr(storage, "SHARD_PATHS", [path])
+    monkeypatch.setattr(storage, "DB_PATH", db)
+    return path
+
+
+def log_on(path, monkeypatch, username, won, game_uuid=None):
+    monkeypatch.setattr(storage, "DB_PATH", path)
+    storage.log_game(username, "apple", won, 3, 1, 6, 5, 10.0, game_uuid=game_uuid)
+
+
+def test_federated_totals_count_a_game_stored_on_two_nodes_once(db, shard, monkeypatch):
+    copied = str(uuid.uuid4())
+    log_on(db, monkeypatch, "ann", True, copied)
+    log_on(db, monkeypatch, "ann", False)
+    log_on(shard, monkeypatch, "ann", True, copied)  # the same game, copied to the other node
+    log_on(shard, monkeypatch, "ann", True)
+    log_on(shard, monkeypatch, "bob", False)
+
+    monkeypatch.setattr(storage, "DB_PATH", db)
+    totals = {row[0]: row[1:3] for row in storage.fetch_player_totals(federated=True)}
+    assert totals == {"ann": (3, 2), "bob": (1, 0)}
+    assert {row[0]: row[1] for row in storage.fetch_player_totals()} == {"ann": 2}
+
+
+def test_federated_totals_skip_copies_in_the_cold_tier(db, shard, monkeypatch):
+    copied = str(uuid.uuid4())
+    log_on(db, monkeypatch, "ann", True, copied)
+    storage.move_cold_games(storage.now_ms() + 1)
+    log_on(shard, monkeypatch, "ann", True, copied)
+
+    monkeypatch.setattr(storage, "DB_PATH", db)
+    assert storage.fetch_player_totals(federated=True)[0][1] == 1
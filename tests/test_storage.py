@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+
+import storage
+from conftest import hot_games
+
+
+def log(username="ann", word="apple", won=True, **kwargs):
+    return storage.log_game(username, word, won, 3, 1, 6, 5, 12.5, **kwargs)
+
+
+def test_log_game_is_idempotent_on_its_uuid(db):
+    game_uuid = str(uuid.uuid4())
+    assert log(game_uuid=game_uuid) is not None
+    assert log(game_uuid=game_uuid) is None
+    assert hot_games(db) == 1
+    assert storage.fetch_player_totals("ann")[0][1] == 1
+
+
+def test_games_without_a_uuid_get_distinct_ones(db):
+    first, second = log(), log()
+    assert first != second
+    assert hot_games(db) == 2
+
+
+def test_move_cold_games_keeps_lifetime_totals(db):
+    for won in (True, False, True):
+        log(won=won)
+    assert storage.move_cold_games(storage.now_ms() + 1) == 3
+    assert storage.tier_sizes()["cold"]["games"] == 3
+    assert hot_games(db) == 0
+    assert storage.fetch_player_totals("ann")[0][1:3] == (3, 2)
+
+
+def test_move_cold_games_rolls_back_a_batch_whose_uuid_is_already_cold(db):
+    import sqlite3
+
+    log()
+    storage.move_cold_games(storage.now_ms() + 1)
+    log(word="zebra")
+    # The cold tier already holds a game with the new hot game's UUID (under another id).
+    with sqlite3.connect(db) as conn:
+        conn.execute("ATTACH DATABASE ? AS cold", (str(storage.cold_db_path()),))
+        clash = conn.execute("SELECT uuid FROM main.games").fetchone()[0]
+        conn.execute("UPDATE cold.games SET uuid = ?", (clash,))
+
+    with pytest.raises(sqlite3.IntegrityError):
+        storage.move_cold_games(storage.now_ms() + 1)
+    assert hot_games(db) == 1
+    assert storage.tier_sizes()["cold"]["games"] == 1
@@ -0,0 +1,70 @@
+import io
+
+import pytest
+
+import analytics
+import storage
+import transfer
+from conftest import hot_games
+
+WRITERS = {
+    ".csv": lambda df: transfer.to_csv(df).encode(),
+    ".jsonl": lambda df: transfer.to_jsonl(df).encode(),
+    ".parquet": transfer.to_parquet,
+}
+
+
+@pytest.fixture
+def exported(db):
+    """The games of a small database as Data Export writes them."""
+    for username, word, won in (("ann", "apple", True), ("bob", "zebra", False), ("ann", "mango", False)):
+        storage.log_game(username, word, won, 4, 2, 6, 4, 30.0, category="Fruits")
+    return transfer.with_uuids(analytics.load_games_df())
+
+
+@pytest.mark.parametrize("suffix", list(WRITERS))
+def test_export_round_trip_and_dedup(exported, db, tmp_path, monkeypatch, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    data = WRITERS[suffix](exported)
+
+    # Into an empty node: every game comes back, with its UUID.
+    monkeypatch.setattr(storage, "DB_PATH", tmp_path / "other.db")
+    storage.init_db()
+    result = transfer.import_file(io.BytesIO(data), f"games{suffix}")
+    assert result == {"read": 3, "inserted": 3, "duplicates": 0}
+    back = transfer.with_uuids(analytics.load_games_df())
+    assert sorted(back["uuid"]) == sorted(exported["uuid"])
+    assert storage.fetch_player_totals("ann")[0][1:3] == (2, 1)
+
+    # A second import, and one back into the source node, add nothing.
+    assert transfer.import_file(io.BytesIO(data), f"games{suffix}")["inserted"] == 0
+    monkeypatch.setattr(storage, "DB_PATH", db)
+    assert transfer.import_file(io.BytesIO(data), f"games{suffix}")["duplicates"] == 3
+    assert hot_games(db) == 3
+
+
+def test_csv_without_uuids_dedups_on_contents(exported, tmp_path, monkeypatch):
+    data = transfer.to_csv(exported.drop(columns=["uuid"])).encode()
+    monkeypatch.setattr(storage, "DB_PATH", tmp_path / "other.db")
+    storage.init_db()
+    assert transfer.import_file(io.BytesIO(data), "games.csv")["inserted"] == 3
+    assert transfer.import_file(io.BytesIO(data), "games.csv")["inserted"] == 0
+
+
+def test_importing_older_games_rates_them_in_play_order(exported, db, tmp_path, monkeypatch):
+    import sqlite3
+
+    def ratings():
+        with sqlite3.connect(storage.DB_PATH) as conn:
+            rows = conn.execute("SELECT player_id, rating, games FROM player_ratings ORDER BY player_id")
+            return [(player, round(rating, 6), games) for player, rating, games in rows]
+
+    data = transfer.to_csv(exported).encode()
+    monkeypatch.setattr(storage, "DB_PATH", tmp_path / "other.db")
+    storage.init_db()
+    storage.log_game("ann", "kiwi", True, 2, 0, 6, 6, 5.0)  # newer than every exported game
+    transfer.import_file(io.BytesIO(data), "games.csv")
+    incremental = ratings()
+    storage.rebuild_ratings()
+    assert ratings() == incremental
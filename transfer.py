@@ -0,0 +1,122 @@
+# transfer.py
+#
+# Moving games between instances. The Data Export page writes games as CSV,
+# JSONL or Parquet (the load_games_df columns plus each game's UUID), and
+# read_chunks() streams any of those files back CHUNK_ROWS at a time for
+# storage.import_games, which skips games that are already stored. Files
+# without a uuid column (older CSV exports) are deduplicated on their
+# contents instead. Parquet needs the optional `pyarrow` package.
+
+import io
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+import storage
+
+FORMATS = (".csv", ".jsonl", ".parquet")
+CHUNK_ROWS = 100_000
+REQUIRED_COLUMNS = ("username", "word", "won", "timestamp")  # the others import as NULL when missing
+
+TEXT_COLUMNS = ("username", "word", "category")
+INT_COLUMNS = ("attempts_used", "wrong_guesses", "max_lives", "remaining_lives")
+
+
+def with_uuids(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` (load_games_df columns) with each game's UUID added as a string column."""
+    if df.empty:
+        return df.assign(uuid=pd.Series(dtype=object))
+    ids = df["id"].tolist()
+    uuids = storage.fetch_game_uuids(ids)
+    return df.assign(uuid=[str(uuid.UUID(bytes=uuids[i])) if uuids.get(i) else None for i in ids])
+
+
+def to_csv(df: pd.DataFrame) -> str:
+    return df.to_csv(index=False)
+
+
+def to_jsonl(df: pd.DataFrame) -> str:
+    """One JSON object per game; the timestamp is epoch milliseconds."""
+    return df.to_json(orient="records", lines=True, date_unit="ms")
+
+
+def to_parquet(df: pd.DataFrame) -> bytes:
+    if pq is None:
+        raise RuntimeError("Parquet export needs the optional 'pyarrow' package.")
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def read_chunks(source, name: str | None = None):
+    """
+    Yield DataFrames of up to CHUNK_ROWS games from an exported file: a
+    path or a binary file object (then `name` gives the format by suffix).
+    """
+    suffix = Path(name or str(source)).suffix.lower()
+    if suffix == ".csv":
+        # Only empty fields are missing; a player called "NA" stays a player.
+        yield from pd.read_csv(
+            source, chunksize=CHUNK_ROWS, keep_default_na=False, na_values=[""],
+            dtype={column: str for column in (*TEXT_COLUMNS, "uuid")},
+        )
+    elif suffix == ".jsonl":
+        yield from pd.read_json(source, lines=True, chunksize=CHUNK_ROWS, dtype=False, convert_dates=False)
+    elif suffix == ".parquet":
+        if pq is None:
+            raise RuntimeError("Importing Parquet needs the optional 'pyarrow' package.")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=CHUNK_ROWS):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported file type {suffix or '(none)'}; expected one of {', '.join(FORMATS)}")
+
+
+def _values(series: pd.Series) -> list:
+    """Column values as Python objects, with None for missing ones."""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _timestamps_ms(series: pd.Series) -> list:
+    if pd.api.types.is_numeric_dtype(series):
+        ms = series
+    else:
+        ms = pd.to_datetime(series).astype("datetime64[ms]").astype("int64")
+    if ms.isna().any():
+        raise ValueError("Every game needs a timestamp")
+    return ms.astype("int64").tolist()
+
+
+def rows(chunk: pd.DataFrame) -> list[tuple]:
+    """storage.IMPORT_COLUMNS tuples for one chunk of an exported file."""
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    n = len(chunk)
+    absent = [None] * n
+    text = {c: _values(chunk[c].astype(object)) if c in chunk else absent for c in TEXT_COLUMNS}
+    ints = {c: _values(pd.to_numeric(chunk[c]).astype("Int64")) if c in chunk else absent for c in INT_COLUMNS}
+    won = pd.to_numeric(chunk["won"]).astype("Int64")
+    if not won.isin([0, 1]).all():
+        raise ValueError("won must be 0 or 1 for every game")
+    won = won.tolist()
+    duration = _values(pd.to_numeric(chunk["duration_sec"]).astype("float64")) if "duration_sec" in chunk else absent
+    timestamp = _timestamps_ms(chunk["timestamp"])
+
+    fields = list(zip(
+        text["username"], text["word"], text["category"], won, ints["attempts_used"], ints["wrong_guesses"],
+        ints["max_lives"], ints["remaining_lives"], duration, timestamp,
+    ))
+    given = _values(chunk["uuid"]) if "uuid" in chunk else absent
+    # bytes.fromhex is several times faster than uuid.UUID for the canonical form.
+    return [(*f, bytes.fromhex(g.replace("-", "")) if g else None) for f, g in zip(fields, given)]
+
+
+def import_file(source, name: str | None = None, defer_indexes: bool = True) -> dict:
+    """Stream an exported file into games; see storage.import_games for the result."""
+    return storage.import_games((rows(chunk) for chunk in read_chunks(source, name)), defer_indexes)
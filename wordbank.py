@@ -0,0 +1,227 @@
+# wordbank.py
+#
+# Versioned, immutable snapshots of the word packs (and *.hints.tsv hint
+# files, see wordmeta.load_hint_file) in wordpack.PACK_DIR.
+# A daemon thread polls the directory; when a pack is added, removed or
+# rewritten it builds the next snapshot off the script thread and swaps it
+# in atomically. New games take current(); a running game keeps the snapshot
+# it started with (its mappings stay valid even after the file is replaced).
+# Each snapshot carries the word metadata (wordmeta) of its words, built
+# with it, so drawing a word is a lookup.
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import metrics
+import wordmeta
+import wordpack
+
+POLL_INTERVAL_SEC = float(os.environ.get("HANGMAN_WORD_PACK_POLL", "2"))
+HISTORY = 10  # versions kept in history() for the debug panel
+HINTS_SUFFIX = ".hints.tsv"
+
+
+class Snapshot:
+    """One immutable version of the word bank."""
+
+    def __init__(
+        self, version: int, signature: tuple, packs: dict, hints: dict, build_sec: float,
+        reserved: frozenset = frozenset(), builtin: tuple = ((), {}), meta: dict | None = None,
+        pack_meta: dict | None = None,
+    ):
+        self.version = version
+        self.signature = signature
+        self.reserved = reserved
+        self.builtin = builtin  # (built-in words, their hints), see set_builtin_words()
+        self.packs = packs  # (path, mtime_ns) -> WordPack
+        self.hints = hints  # word -> curated hint, from the hint files
+        self.all_hints = builtin[1] | hints
+        self.meta = meta if meta is not None else {}  # built-in word -> WordMeta
+        self.pack_meta = pack_meta if pack_meta is not None else {}  # pack key -> wordmeta.pack_columns
+        self.built_at = time.time()
+        self.build_sec = build_sec
+        self.mapped_bytes = sum(pack.path.stat().st_size for pack in packs.values() if pack.path.exists())
+        # Heap held by the metadata: the packs' column arrays and the built-in words' table.
+        self.meta_bytes = sum(a.nbytes for columns in self.pack_meta.values() for a in columns.values()) + (
+            sys.getsizeof(self.meta) + sum(sys.getsizeof(m) for m in self.meta.values())
+        )
+
+        # label -> (pack, category); a name clashing with another pack's or a
+        # reserved (built-in) category gets its pack's stem appended. Empty
+        # categories (packs from before build() skipped them) are left out.
+        self.categories = {}
+        for pack in packs.values():
+            for name, (start, end) in pack.categories.items():
+                if end <= start:
+                    continue
+                clash = name in self.categories or name in reserved
+                label = f"{name} ({pack.path.stem})" if clash else name
+                self.categories[label] = (pack, name)
+
+    @property
+    def words(self) -> int:
+        return sum(len(pack) for pack in self.packs.values())
+
+    def random_word(self, label: str, exclude=()) -> str:
+        pack, category = self.categories[label]
+        return pack.random_word(category, exclude=exclude)
+
+    def draw(self, label: str, exclude=()) -> wordmeta.WordMeta:
+        """The metadata of a random word of a pack category (its `word` is the word)."""
+        pack, category = self.categories[label]
+        i = pack.random_index(category, exclude=exclude)
+        word = pack.word(i)
+        columns = self.pack_meta[next(key for key, p in self.packs.items() if p is pack)]
+        return wordmeta.from_columns(word, columns, i, self.all_hints.get(word))
+
+    def word_meta(self, word: str) -> wordmeta.WordMeta:
+        """Metadata of a built-in word from the table (computed on the spot for any other word)."""
+        word = word.lower()
+        meta = self.meta.get(word)
+        return meta if meta is not None else wordmeta.WordMeta(word, self.all_hints.get(word))
+
+    def summary(self) -> dict:
+        return {
+            "version": self.version,
+            "built": time.strftime("%H:%M:%S", time.localtime(self.built_at)),
+            "build_ms": self.build_sec * 1000,
+            "packs": len(self.packs),
+            "words": self.words,
+            "hints": len(self.hints),
+            "mapped_mib": self.mapped_bytes / 2**20,
+            "meta_kib": self.meta_bytes / 2**10,
+        }
+
+
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()  # one build at a time
+_current: Snapshot | None = None
+_history: list[dict] = []
+_watcher: threading.Thread | None = None
+_reserved: frozenset = frozenset()  # category names packs must not take, see reserve()
+_NO_BUILTIN: tuple = ((), {})
+_builtin: tuple = _NO_BUILTIN  # (words, {word: hint}) of the app's own lists, see set_builtin_words()
+last_error: str | None = None  # why the watcher's latest refresh failed, if it did
+
+
+def _signature(directory: Path) -> tuple:
+    if not directory.is_dir():
+        return ()
+    paths = [*directory.glob("*" + wordpack.SUFFIX), *directory.glob("*" + HINTS_SUFFIX)]
+    return tuple(sorted((path, path.stat().st_mtime_ns) for path in paths))
+
+
+def reserve(names):
+    """
+    Keep pack categories from taking `names` (the app's built-in categories):
+    a pack category of the same name is labelled "name (pack stem)" instead.
+    """
+    global _reserved
+    with _lock:
+        _reserved = _reserved | frozenset(names)
+
+
+def set_builtin_words(words, hints: dict):
+    """
+    The app's built-in words and curated hints, described in every snapshot's
+    metadata table. They are fixed for the life of the process, so only the
+    first call counts (app.py runs on every rerun); the next refresh() then
+    rebuilds the current snapshot with them.
+    """
+    global _builtin
+    with _lock:
+        if not has_builtin_words():
+            _builtin = (tuple(words), dict(hints))
+
+
+def has_builtin_words() -> bool:
+    """Whether set_builtin_words() has been called; cheap, for a guard on every rerun."""
+    return _builtin is not _NO_BUILTIN
+
+
+def _build(signature: tuple, previous: Snapshot | None) -> Snapshot:
+    """Map the packs in `signature`, reusing the previous version's unchanged ones."""
+    start = time.perf_counter()
+    reuse = previous.packs if previous is not None else {}
+    packs, hints = {}, {}
+    for key in signature:
+        try:
+            if key[0].name.endswith(HINTS_SUFFIX):
+                hints.update(wordmeta.load_hint_file(key[0]))
+            else:
+                packs[key] = reuse.get(key) or wordpack.WordPack(key[0])
+        except (OSError, ValueError):
+            continue  # half-copied or foreign file; picked up once it changes again
+
+    # Metadata: a table of the built-in words (hint files may change their
+    # hints) and column arrays per pack, reused while the pack is unchanged.
+    builtin = _builtin
+    all_hints = builtin[1] | hints
+    if previous is not None and previous.builtin is builtin and previous.hints == hints:
+        meta = previous.meta
+    else:
+        meta = wordmeta.table(builtin[0], all_hints)
+    pack_meta = {
+        key: previous.pack_meta[key] if previous is not None and key in previous.pack_meta
+        else wordmeta.pack_columns(pack)
+        for key, pack in packs.items()
+    }
+
+    build_sec = time.perf_counter() - start
+    metrics.observe("wordbank.build", build_sec)
+    return Snapshot(
+        (previous.version if previous else 0) + 1, signature, packs, hints, build_sec,
+        _reserved, builtin, meta, pack_meta,
+    )
+
+
+def refresh(directory: Path | None = None) -> bool:
+    """Build and swap in a new snapshot if the pack directory changed. Returns True on a swap."""
+    global _current
+    with _refresh_lock:
+        signature = _signature(Path(directory or wordpack.PACK_DIR))
+        previous = _current
+        if (
+            previous is not None and previous.signature == signature
+            and previous.reserved == _reserved and previous.builtin is _builtin
+        ):
+            return False
+        snapshot = _build(signature, previous)
+        with _lock:
+            _current = snapshot
+            _history.append(snapshot.summary())
+            del _history[:-HISTORY]
+        return True
+
+
+def _watch():
+    global last_error
+    while True:
+        time.sleep(POLL_INTERVAL_SEC)
+        try:
+            refresh()
+            last_error = None
+        except Exception as exc:  # keep watching; the current snapshot stays in service
+            last_error = f"{type(exc).__name__}: {exc}"
+
+
+def current() -> Snapshot:
+    """The newest snapshot; the first call builds it and starts the watcher."""
+    global _watcher
+    if _current is None:
+        with _lock:
+            if _watcher is None:
+                _watcher = threading.Thread(target=_watch, name="wordbank-watcher", daemon=True)
+                _watcher.start()
+        if _current is None:
+            refresh()
+    return _current
+
+
+def history() -> list[dict]:
+    """Summaries of recent versions (build time, words, mapped and metadata memory), oldest first."""
+    with _lock:
+        return list(_history)
@@ -0,0 +1,103 @@
+# wordmeta.py
+#
+# Per-word metadata (vowels, first / last letter, unique letters, letter
+# bitmask, curated hint) computed once per word bank instead of on every
+# rerun, and the hint choice that start_new_game pins to the game. The
+# tables are built by wordbank._build: WordMeta objects for the built-in
+# words, and column arrays (pack_columns) for the much larger word packs.
+
+import random
+from pathlib import Path
+
+import numpy as np
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+VOWELS = set("aeiou")
+
+
+class WordMeta:
+    __slots__ = ("word", "length", "vowels", "first", "last", "unique_letters", "letter_mask", "hint")
+
+    def __init__(self, word: str, hint: str | None = None):
+        w = word.lower()
+        self.word = w
+        self.length = len(w)
+        self.vowels = sum(1 for c in w if c in VOWELS)
+        self.first = w[:1].upper()
+        self.last = w[-1:].upper()
+        letters = {c for c in w if c in LETTERS}
+        self.unique_letters = len(letters)
+        # Bit i set when LETTERS[i] occurs in the word.
+        self.letter_mask = sum(1 << LETTERS.index(c) for c in letters)
+        self.hint = hint
+
+    @classmethod
+    def from_fields(cls, word: str, vowels: int, unique_letters: int, letter_mask: int, hint: str | None = None):
+        """A WordMeta from precomputed fields (see pack_columns); `word` is lower-case a-z."""
+        meta = cls.__new__(cls)
+        meta.word = word
+        meta.length = len(word)
+        meta.vowels = vowels
+        meta.first = word[:1].upper()
+        meta.last = word[-1:].upper()
+        meta.unique_letters = unique_letters
+        meta.letter_mask = letter_mask
+        meta.hint = hint
+        return meta
+
+    def hints(self) -> list[str]:
+        """The curated hint if there is one, otherwise the generic clues."""
+        if self.hint:
+            return [self.hint]
+        return [
+            f"Starts with {self.first}",
+            f"Ends with {self.last}",
+            f"Contains {self.vowels} vowel(s)",
+        ]
+
+    def pick_hint(self, rng=random) -> str:
+        return rng.choice(self.hints())
+
+
+def table(words, hints: dict) -> dict:
+    """{word: WordMeta} for a list of words, with the curated hints of {word: hint}."""
+    return {w.lower(): WordMeta(w, hints.get(w.lower())) for w in words}
+
+
+def pack_columns(pack) -> dict:
+    """
+    {"vowels", "unique_letters", "letter_mask"} arrays indexed like the
+    pack's words, computed over the whole mapping at once (pack words are
+    plain a-z, see wordpack.build).
+    """
+    starts = pack.offsets[:-1].astype(np.int64)
+    if not len(starts):
+        empty = np.zeros(0, dtype=np.uint32)
+        return {"vowels": empty, "unique_letters": empty, "letter_mask": empty}
+    codes = pack.letters() - ord("a")
+    mask = np.bitwise_or.reduceat(np.left_shift(np.uint32(1), codes.astype(np.uint32)), starts)
+    is_vowel = np.isin(codes, [LETTERS.index(v) for v in sorted(VOWELS)])
+    vowels = np.add.reduceat(is_vowel.astype(np.uint16), starts, dtype=np.uint16)
+    unique = np.zeros(len(starts), dtype=np.uint8)
+    for i in range(len(LETTERS)):
+        unique += ((mask >> np.uint32(i)) & np.uint32(1)).astype(np.uint8)
+    return {"vowels": vowels, "unique_letters": unique, "letter_mask": mask}
+
+
+def from_columns(word: str, columns: dict, i: int, hint: str | None = None) -> WordMeta:
+    """The WordMeta of word `i` of a pack, from its pack_columns."""
+    return WordMeta.from_fields(
+        word, int(columns["vowels"][i]), int(columns["unique_letters"][i]), int(columns["letter_mask"][i]), hint
+    )
+
+
+def load_hint_file(path) -> dict:
+    """{word: hint} from a tab-separated `word<TAB>hint` file; blank and # lines are skipped."""
+    hints = {}
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        word, _, hint = line.partition("\t")
+        if hint.strip():
+            hints[word.strip().lower()] = hint.strip()
+    return hints
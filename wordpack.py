@@ -0,0 +1,188 @@
+"""
+Word packs: large word lists in a single memory-mapped file.
+
+A pack is built once from text files (one word per line, optionally
+followed by tab-separated numeric metadata) and loaded with mmap, so every
+Streamlit process shares the same pages and startup only parses a small
+header. Words stay bytes in the mapping until one is actually chosen.
+Packs in PACK_DIR are picked up while the app runs (see wordbank.py).
+
+    python wordpack.py build wordpacks/big.wordpack Animals=animals.txt science.txt
+    python wordpack.py build wordpacks/freq.wordpack --columns frequency Common=common.tsv
+    python wordpack.py info wordpacks/big.wordpack
+
+Layout (little-endian, sections 8-byte aligned):
+
+    header   magic "HWPK", version u16, reserved u16, words u32, meta bytes u32
+    meta     JSON: categories as [name, start, end) word ranges, column names
+    offsets  u32[words + 1] into the blob
+    columns  f32[words] per metadata column
+    blob     concatenated ASCII words
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+from pathlib import Path
+
+import numpy as np
+
+PACK_DIR = Path(os.environ.get("HANGMAN_WORD_PACKS", Path(__file__).with_name("wordpacks")))
+SUFFIX = ".wordpack"
+
+MAGIC = b"HWPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+
+def _pad(n: int) -> int:
+    return -n % 8
+
+
+class WordPack:
+    """A read-only, memory-mapped word pack."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, words, meta_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} word pack")
+        pos = HEADER.size
+        meta = json.loads(bytes(self._mmap[pos:pos + meta_len]))
+        pos += meta_len + _pad(HEADER.size + meta_len)
+
+        self.categories = {name: (start, end) for name, start, end in meta["categories"]}
+        self.offsets = np.frombuffer(self._mmap, dtype="<u4", count=words + 1, offset=pos)
+        pos += self.offsets.nbytes + _pad(self.offsets.nbytes)
+        self.columns = {}
+        for name in meta["columns"]:
+            self.columns[name] = np.frombuffer(self._mmap, dtype="<f4", count=words, offset=pos)
+            pos += 4 * words + _pad(4 * words)
+        self._blob = pos
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def word(self, i: int) -> str:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self._mmap[self._blob + start:self._blob + end].decode("ascii")
+
+    def words(self, category: str | None = None):
+        """Iterate over the words of one category (or all); decodes every word."""
+        start, end = self.categories[category] if category else (0, len(self))
+        return (self.word(i) for i in range(start, end))
+
+    def letters(self) -> np.ndarray:
+        """Every word's ASCII bytes back to back, as a uint8 view of the mapping (split by `offsets`)."""
+        return np.frombuffer(self._mmap, dtype=np.uint8, count=int(self.offsets[-1]), offset=self._blob)
+
+    def random_index(self, category: str | None = None, exclude=(), rng=random) -> int:
+        """Index of a uniformly random word from `category` (or the whole pack), avoiding `exclude` when possible."""
+        start, end = self.categories[category] if category else (0, len(self))
+        if end <= start:
+            raise ValueError(f"{self.path}: {'category ' + repr(category) if category else 'pack'} has no words")
+        i = rng.randrange(start, end)
+        for _ in range(8):
+            if self.word(i) not in exclude or end - start <= 1:
+                break
+            i = rng.randrange(start, end)
+        return i
+
+    def random_word(self, category: str | None = None, exclude=(), rng=random) -> str:
+        return self.word(self.random_index(category, exclude, rng))
+
+
+def build(out, sources: dict, columns: list[str] = ()) -> int:
+    """
+    Write a pack to `out` from {category: [text file, ...]} and return the
+    number of words. Words are lower-cased; lines that are not plain a-z
+    words are skipped, as are repeats within a category, and a category left
+    without words is not written. Each line may carry len(columns)
+    tab-separated numbers after the word (missing ones are NaN).
+    """
+    words, values, categories = [], [], []
+    for category, paths in sources.items():
+        start, seen = len(words), set()
+        for path in paths:
+            for lineno, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+                fields = line.strip().split("\t")
+                word = fields[0].strip().lower()
+                if not (word.isascii() and word.isalpha()) or word in seen:
+                    continue
+                try:
+                    extra = [float(v) for v in fields[1:1 + len(columns)]]
+                except ValueError as exc:
+                    raise ValueError(f"{path}:{lineno}: metadata after {word!r} is not numeric ({exc})") from None
+                seen.add(word)
+                words.append(word.encode("ascii"))
+                values.append(extra + [float("nan")] * (len(columns) - len(extra)))
+        if len(words) > start:
+            categories.append([category, start, len(words)])
+
+    meta = json.dumps({"categories": categories, "columns": list(columns)}).encode()
+    offsets = np.zeros(len(words) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(w) for w in words])
+    table = np.array(values, dtype="<f4").reshape(len(words), len(columns))
+
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(words), len(meta)))
+        f.write(meta + b"\0" * _pad(HEADER.size + len(meta)))
+        f.write(offsets.tobytes() + b"\0" * _pad(offsets.nbytes))
+        for i in range(len(columns)):
+            column = np.ascontiguousarray(table[:, i]).tobytes()
+            f.write(column + b"\0" * _pad(len(column)))
+        f.write(b"".join(words))
+    # Readers that already mapped the old file keep their pages.
+    tmp.replace(out)
+    return len(words)
+
+
+def _parse_sources(specs: list[str]) -> dict:
+    sources = {}
+    for spec in specs:
+        category, _, path = spec.rpartition("=")
+        sources.setdefault(category or Path(path).stem.replace("_", " ").title(), []).append(path)
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="Build a pack from text files")
+    build_parser.add_argument("out", help=f"output file (conventionally {PACK_DIR.name}/NAME{SUFFIX})")
+    build_parser.add_argument("sources", nargs="+", help="[CATEGORY=]FILE; the category defaults to the file name")
+    build_parser.add_argument("--columns", default="", help="comma-separated names of numeric columns after each word")
+    info_parser = sub.add_parser("info", help="Show a pack's categories and columns")
+    info_parser.add_argument("pack")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        columns = [c for c in args.columns.split(",") if c]
+        sources = _parse_sources(args.sources)
+        try:
+            count = build(args.out, sources, columns)
+        except ValueError as exc:
+            parser.error(str(exc))
+        written = WordPack(args.out).categories
+        for category in sources:
+            if category not in written:
+                print(f"Skipped category {category!r}: no plain a-z words")
+        print(f"Wrote {count:,} words to {args.out} ({Path(args.out).stat().st_size / 2**20:.1f} MiB)")
+    else:
+        pack = WordPack(args.pack)
+        print(f"{pack.path}: {len(pack):,} words, columns: {', '.join(pack.columns) or '-'}")
+        for name, (start, end) in pack.categories.items():
+            print(f"  {name:<24} {end - start:>10,}")
+
+
+if __name__ == "__main__":
+    main()